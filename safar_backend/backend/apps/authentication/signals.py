@@ -1,5 +1,5 @@
 import logging
-from django.db.models.signals import post_save, pre_save, post_delete
+from django.db.models.signals import post_save, pre_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
@@ -62,6 +62,37 @@ def update_location_data(sender, instance, **kwargs):
         except Exception as e:
             logger.error(f"Failed to geocode location for user {instance.user.id}: {str(e)}")
 
+@receiver(pre_save, sender=UserProfile)
+def track_travel_interest_changes(sender, instance, **kwargs):
+    """
+    Invalidate cached recommendations when the user's travel interests change.
+    """
+    if not instance.pk:
+        return
+    try:
+        previous = UserProfile.objects.filter(pk=instance.pk).values_list('travel_interests', flat=True).first()
+        if sorted(previous or []) != sorted(instance.travel_interests or []):
+            from apps.core_apps.algorithms_engines.recommendation_cache import RecommendationCache
+            RecommendationCache.invalidate_user(instance.user_id)
+    except Exception as e:
+        logger.error(f"Failed to track travel interest changes: {str(e)}")
+
+@receiver(m2m_changed, sender=UserProfile.preferred_countries.through)
+def handle_preferred_countries_change(sender, instance, action, **kwargs):
+    """
+    Invalidate cached recommendations when the user's preferred countries change.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    from apps.core_apps.algorithms_engines.recommendation_cache import RecommendationCache
+    if isinstance(instance, UserProfile):
+        RecommendationCache.invalidate_user(instance.user_id)
+    else:
+        # Reverse side: a country was added to or removed from several profiles
+        user_ids = UserProfile.objects.filter(pk__in=kwargs.get('pk_set') or []).values_list('user_id', flat=True)
+        for user_id in user_ids:
+            RecommendationCache.invalidate_user(user_id)
+
 @receiver(post_save, sender=UserProfile)
 def notify_profile_update(sender, instance, created, **kwargs):
     """
@@ -253,6 +284,16 @@ def handle_user_interaction(sender, instance, created, **kwargs):
             # Award points based on the interaction
             PointsManager.award_points_for_interaction(instance)
             
+            # Fold the interaction into the user's recommendation vector
+            from apps.core_apps.algorithms_engines.user_factors import UserFactorStore
+            from apps.core_apps.algorithms_engines.recommendation_cache import RecommendationCache
+            from apps.core_apps.algorithms_engines.popularity import PopularityCounter
+            UserFactorStore.record_interaction(instance)
+            RecommendationCache.invalidate_user(instance.user_id)
+            
+            # Count it towards the object's rolling popularity
+            PopularityCounter.record_interaction(instance)
+            
             logger.debug(f"Processed interaction {instance.interaction_type} for user {instance.user.id}")
         except Exception as e:
             logger.error(f"Error processing user interaction: {str(e)}", exc_info=True)
@@ -562,29 +603,37 @@ def send_inactivity_reminder(user_id, days_inactive):
         logger.error(f"Failed to send inactivity reminder to user {user_id}: {str(e)}")
         return False
 
-def send_travel_preference_suggestions(user_id):
+def send_travel_preference_suggestions(user_id, user=None, suggested_places=None, suggested_experiences=None):
     """
     Send personalized travel suggestions based on user preferences
     using the advanced RecommendationEngine.
+    
+    Bulk jobs pass a preloaded ``user`` and the suggestions they computed
+    with ``RecommendationEngine.recommend_batch``; otherwise they are
+    computed here for the single user.
     """
     try:
         from apps.authentication.models import User
         from apps.safar.models import Place, Experience
         from apps.core_apps.algorithms_engines.recommendation_engine import RecommendationEngine
         
-        user = User.objects.get(id=user_id)
+        if user is None:
+            user = User.objects.get(id=user_id)
         
         # Skip if user has no preferences
         if not hasattr(user, 'profile') or not user.profile.travel_interests:
             logger.info(f"User {user.email} has no travel preferences set, skipping suggestions")
             return False
         
-        # Initialize the recommendation engine
-        recommendation_engine = RecommendationEngine(user)
-        
-        # Get personalized recommendations using the engine
-        suggested_places = recommendation_engine.recommend_places(limit=3)
-        suggested_experiences = recommendation_engine.recommend_experiences(limit=3)
+        if suggested_places is None or suggested_experiences is None:
+            # Initialize the recommendation engine
+            recommendation_engine = RecommendationEngine(user)
+            
+            # Get personalized recommendations using the engine
+            if suggested_places is None:
+                suggested_places = recommendation_engine.recommend_places(limit=3)
+            if suggested_experiences is None:
+                suggested_experiences = recommendation_engine.recommend_experiences(limit=3)
         
         # Skip if no matches found
         if not suggested_places and not suggested_experiences:
@@ -99,10 +99,14 @@ def check_account_anniversaries():
         return 0
 
 @shared_task
-def send_personalized_recommendations():
+def send_personalized_recommendations(batch_size=1000):
     """
     Weekly task to send personalized travel recommendations based on user preferences
     using the advanced RecommendationEngine.
+    
+    Covers the whole active user base: users are processed in batches, each
+    scored with one matrix multiply per item type by ``recommend_batch``,
+    and the recommended items are loaded once per batch.
     """
     try:
         # Find active users with travel preferences set
@@ -113,18 +117,70 @@ def send_personalized_recommendations():
             # Exclude users who received recommendations in the last 14 days
             notifications__type="Personalized Recommendations",
             notifications__created_at__gt=timezone.now() - timedelta(days=14)
-        )[:100]  # Process in batches
+        ).select_related('profile').order_by('id')
         
-        for user in users_with_preferences:
-            from apps.authentication.signals import send_travel_preference_suggestions
-            send_travel_preference_suggestions(user.id)
+        processed = 0
+        batch = []
+        for user in users_with_preferences.iterator(chunk_size=batch_size):
+            batch.append(user)
+            if len(batch) >= batch_size:
+                processed += _send_recommendation_batch(batch)
+                batch = []
+        if batch:
+            processed += _send_recommendation_batch(batch)
             
-        logger.info(f"Processed {users_with_preferences.count()} personalized recommendations")
-        return users_with_preferences.count()
+        logger.info(f"Processed {processed} personalized recommendations")
+        return processed
     except Exception as e:
         logger.error(f"Failed to process personalized recommendations: {str(e)}")
         return 0
 
+def _send_recommendation_batch(users, limit=3):
+    """Score a batch of users in bulk and send each their suggestions"""
+    from apps.authentication.signals import send_travel_preference_suggestions
+    from apps.core_apps.algorithms_engines.recommendation_engine import RecommendationEngine
+    from apps.safar.models import Place, Experience
+    
+    user_ids = [user.id for user in users]
+    place_ids = RecommendationEngine.recommend_batch(user_ids, 'place', k=limit)
+    experience_ids = RecommendationEngine.recommend_batch(user_ids, 'experience', k=limit)
+    
+    # Load every recommended item for the batch once
+    places = {
+        str(pk): place for pk, place in Place.objects.select_related(
+            'city', 'country'
+        ).prefetch_related('media').in_bulk(
+            {item_id for ids in place_ids.values() for item_id in ids}
+        ).items()
+    }
+    experiences = {
+        str(pk): experience for pk, experience in Experience.objects.select_related(
+            'place'
+        ).prefetch_related('media').in_bulk(
+            {item_id for ids in experience_ids.values() for item_id in ids}
+        ).items()
+    }
+    
+    sent = 0
+    for user in users:
+        user_key = str(user.id)
+        # Users the batch could not score (no trained model) fall back to the per-user engine
+        suggested_places = [
+            places[item_id] for item_id in place_ids[user_key] if item_id in places
+        ] if user_key in place_ids else None
+        suggested_experiences = [
+            experiences[item_id] for item_id in experience_ids[user_key] if item_id in experiences
+        ] if user_key in experience_ids else None
+        
+        if send_travel_preference_suggestions(
+            user.id,
+            user=user,
+            suggested_places=suggested_places,
+            suggested_experiences=suggested_experiences
+        ):
+            sent += 1
+    return sent
+
 @shared_task
 def check_points_milestones():
     """
@@ -0,0 +1,137 @@
+import logging
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+from apps.core_apps.algorithms_engines.ranking import top_k_indices
+
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index for cosine similarity.
+
+    Vectors are L2-normalised and partitioned into ``n_lists`` cells by
+    k-means. A query is only compared with the vectors in its ``nprobe``
+    closest cells, so lookups touch roughly ``nprobe / n_lists`` of the data
+    instead of all of it.
+
+    The index is plain NumPy arrays, so it is built during model training,
+    published alongside the factors and memory-mapped by request handlers.
+    """
+
+    DEFAULT_NPROBE = 8
+
+    def __init__(self, vectors, centroids, offsets, members, nprobe=None):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.offsets = offsets
+        self.members = members
+        self.nprobe = nprobe or self.DEFAULT_NPROBE
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @classmethod
+    def build(cls, vectors, n_lists=None, random_state=42):
+        """
+        Build an index over the rows of ``vectors``.
+
+        Args:
+            vectors (numpy.ndarray): n x d matrix
+            n_lists (int): Number of cells; defaults to about sqrt(n)
+        """
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        n = len(vectors)
+        n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+
+        if n_lists == 1:
+            centroids = normalize(vectors.mean(axis=0, keepdims=True))
+            assignments = np.zeros(n, dtype=np.int64)
+        else:
+            kmeans = MiniBatchKMeans(
+                n_clusters=n_lists,
+                random_state=random_state,
+                batch_size=max(1024, n_lists * 4),
+                n_init=3
+            )
+            assignments = kmeans.fit_predict(vectors)
+            centroids = normalize(kmeans.cluster_centers_.astype(np.float32))
+
+        # Inverted lists in CSR form: members[offsets[c]:offsets[c + 1]] are in cell c
+        members = np.argsort(assignments, kind='stable').astype(np.int32)
+        counts = np.bincount(assignments, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        return cls(vectors, centroids, offsets, members)
+
+    def to_arrays(self, prefix):
+        """Return the arrays to publish in a model artifact"""
+        return {
+            f"{prefix}__vectors": self.vectors,
+            f"{prefix}__centroids": self.centroids,
+            f"{prefix}__offsets": self.offsets,
+            f"{prefix}__members": self.members,
+        }
+
+    @classmethod
+    def from_artifact(cls, artifact, prefix):
+        """Load an index published under ``prefix``, or None if the artifact has none"""
+        if f"{prefix}__vectors" not in artifact:
+            return None
+        return cls(
+            artifact[f"{prefix}__vectors"],
+            artifact[f"{prefix}__centroids"],
+            artifact[f"{prefix}__offsets"],
+            artifact[f"{prefix}__members"],
+        )
+
+    def search(self, query, k=10, nprobe=None, exclude=None):
+        """
+        Find the approximate ``k`` nearest rows to ``query``.
+
+        Args:
+            query (numpy.ndarray): d-dimensional query vector
+            k (int): Number of neighbours
+            nprobe (int): Number of cells to scan
+            exclude (iterable): Row indices to leave out of the results
+
+        Returns:
+            tuple: (indices, similarities), best first
+        """
+        query = normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+
+        cell_scores = self.centroids @ query
+        cells = top_k_indices(cell_scores, nprobe)
+
+        candidates = np.concatenate([
+            self.members[self.offsets[cell]:self.offsets[cell + 1]] for cell in cells
+        ])
+        if exclude is not None:
+            candidates = candidates[~np.isin(candidates, np.fromiter(exclude, dtype=np.int64))]
+        if not len(candidates):
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+        similarities = self.vectors[candidates] @ query
+        top = top_k_indices(similarities, k)
+        return candidates[top].astype(np.int64), similarities[top]
+
+    def brute_force(self, query, k=10, exclude=None):
+        """Exact search over every row, used to measure recall"""
+        query = normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        similarities = self.vectors @ query
+        if exclude is not None:
+            similarities = similarities.copy()
+            similarities[np.fromiter(exclude, dtype=np.int64)] = -np.inf
+        top = top_k_indices(similarities, k)
+        top = top[np.isfinite(similarities[top])]
+        return top.astype(np.int64), similarities[top]
+
+
+def normalize(vectors):
+    """L2-normalise rows, leaving zero rows as zeros"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
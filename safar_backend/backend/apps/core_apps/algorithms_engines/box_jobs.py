@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import uuid
+from contextlib import nullcontext
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class BoxGenerationJob:
+    """
+    State of one asynchronous box generation, kept in the cache.
+
+    ``submit`` coalesces identical requests: while a job for the same user
+    and parameters is pending or running, its id is returned instead of
+    enqueuing another one. Progress is written to the job entry, for
+    polling, and pushed to the user's ``SafariConsumer`` general group as
+    ``box_generation_progress`` events.
+    """
+
+    KEY_PATTERN = 'box:jobs:{job_id}'
+    ACTIVE_KEY_PATTERN = 'box:jobs:active:{user_id}:{digest}'
+    TIMEOUT = 60 * 60 * 24  # Results stay pollable for a day
+    ACTIVE_TIMEOUT = 60 * 10  # Lets a job lost with its worker be resubmitted
+    LOCK_TIMEOUT = 5
+    GROUP_PREFIX = 'safar_'  # SafariConsumer.GENERAL_GROUP
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    def __init__(self, job_id, state=None):
+        self.job_id = str(job_id)
+        self.state = state or {}
+
+    @property
+    def user_id(self):
+        return self.state.get('user_id')
+
+    @property
+    def params(self):
+        return self.state.get('params', {})
+
+    @classmethod
+    def _active_key(cls, user_id, params):
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return cls.ACTIVE_KEY_PATTERN.format(user_id=user_id, digest=digest)
+
+    @classmethod
+    def submit(cls, user_id, params):
+        """
+        Enqueue a generation, or join the identical one already in flight.
+
+        Args:
+            user_id: Owner of the box
+            params (dict): JSON-serialisable ``generate_box`` arguments
+
+        Returns:
+            tuple: (BoxGenerationJob, created)
+        """
+        from apps.core_apps.tasks import generate_box
+
+        user_id = str(user_id)
+        active_key = cls._active_key(user_id, params)
+        job_id = str(uuid.uuid4())
+
+        # SET NX, so two racing submissions can't both win
+        while not cache.add(active_key, job_id, timeout=cls.ACTIVE_TIMEOUT):
+            existing_id = cache.get(active_key)
+            existing = cls.get(existing_id)
+            if existing is None and existing_id:
+                # Its submitter hasn't written the job entry yet
+                return cls(existing_id, {'job_id': existing_id, 'user_id': user_id, 'status': cls.PENDING}), False
+            if existing is not None and existing.state.get('status') in (cls.PENDING, cls.RUNNING):
+                return existing, False
+            # The job is finished: drop its key, unless a racing submission already
+            # replaced it, and compete for the slot again
+            if existing_id:
+                cls._discard_active(active_key, existing_id)
+
+        job = cls(job_id, {
+            'job_id': job_id,
+            'user_id': user_id,
+            'params': params,
+            'status': cls.PENDING,
+            'stage': 'queued',
+            'progress': 0,
+            'created_at': timezone.now().isoformat(),
+            'active_key': active_key,
+        })
+        job._save()
+        try:
+            generate_box.apply_async(args=[job_id], task_id=job_id)
+        except Exception as e:
+            job.fail(f"Could not enqueue box generation: {str(e)}")
+            raise
+        return job, True
+
+    @classmethod
+    def get(cls, job_id):
+        if not job_id:
+            return None
+        state = cache.get(cls.KEY_PATTERN.format(job_id=job_id))
+        return None if state is None else cls(job_id, state)
+
+    def _save(self):
+        self.state['updated_at'] = timezone.now().isoformat()
+        cache.set(self.KEY_PATTERN.format(job_id=self.job_id), self.state, timeout=self.TIMEOUT)
+
+    def report(self, stage, progress, **extra):
+        """Record a stage and notify the user's WebSocket connections"""
+        self.state.update(stage=stage, progress=int(progress), **extra)
+        if self.state['status'] == self.PENDING:
+            self.state['status'] = self.RUNNING
+        self._save()
+        self._publish()
+
+    def complete(self, box_id):
+        self.state['status'] = self.COMPLETED
+        self.report('done', 100, box_id=str(box_id))
+        self._release()
+
+    def fail(self, error):
+        self.state['status'] = self.FAILED
+        self.report('failed', self.state.get('progress', 0), error=error)
+        self._release()
+
+    def _release(self):
+        active_key = self.state.get('active_key')
+        if active_key:
+            self._discard_active(active_key, self.job_id)
+
+    @classmethod
+    def _discard_active(cls, active_key, job_id):
+        """Delete the coalescing key only if it still points at ``job_id``"""
+        lock = cache.lock(f"{active_key}:lock", timeout=cls.LOCK_TIMEOUT) if hasattr(cache, 'lock') else nullcontext()
+        with lock:
+            if cache.get(active_key) == job_id:
+                cache.delete(active_key)
+
+    def _publish(self):
+        try:
+            async_to_sync(get_channel_layer().group_send)(
+                f"{self.GROUP_PREFIX}{self.user_id}",
+                {'type': 'box_generation_progress', 'data': self.public_state()}
+            )
+        except Exception as e:
+            logger.error(f"Error publishing progress of box job {self.job_id}: {str(e)}")
+
+    def public_state(self):
+        """The job as exposed to clients"""
+        return {
+            key: self.state.get(key)
+            for key in ('job_id', 'status', 'stage', 'progress', 'day', 'box_id', 'error', 'created_at', 'updated_at')
+            if self.state.get(key) is not None
+        }
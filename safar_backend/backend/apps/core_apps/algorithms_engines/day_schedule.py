@@ -0,0 +1,74 @@
+from datetime import time
+
+
+class DaySchedule:
+    """
+    Free/busy state of one itinerary day as an integer bitmask.
+
+    Bit ``i`` stands for the slot covering minutes
+    ``[i * SLOT_MINUTES, (i + 1) * SLOT_MINUTES)`` after midnight. Opening
+    hours and times of day are masks of the same shape, so finding the
+    earliest free window of ``n`` slots inside all of them is an AND of the
+    masks, ``log2(n)`` shift-ANDs and a lowest-set-bit lookup.
+    """
+
+    SLOT_MINUTES = 15
+    SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+    def __init__(self, start_minute, end_minute):
+        self.free = self.window(start_minute, end_minute)
+
+    @classmethod
+    def window(cls, start_minute, end_minute):
+        """Mask of the slots lying entirely within ``[start_minute, end_minute)``"""
+        first = -(-max(0, start_minute) // cls.SLOT_MINUTES)
+        last = min(cls.SLOTS_PER_DAY, end_minute // cls.SLOT_MINUTES)
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    @classmethod
+    def slots_for(cls, minutes):
+        """Number of slots needed to cover ``minutes``"""
+        return max(1, -(-int(minutes) // cls.SLOT_MINUTES))
+
+    @staticmethod
+    def runs(mask, length):
+        """Mask of the bits that start ``length`` consecutive set bits of ``mask``"""
+        span = 1
+        while span < length and mask:
+            step = min(span, length - span)
+            mask &= mask >> step
+            span += step
+        return mask
+
+    def find(self, minutes, allowed=None):
+        """Start minute of the earliest free window of ``minutes`` within ``allowed``, or None"""
+        candidates = self.free if allowed is None else self.free & allowed
+        starts = self.runs(candidates, self.slots_for(minutes))
+        if not starts:
+            return None
+        return ((starts & -starts).bit_length() - 1) * self.SLOT_MINUTES
+
+    def reserve(self, start_minute, minutes):
+        first = start_minute // self.SLOT_MINUTES
+        self.free &= ~(((1 << self.slots_for(minutes)) - 1) << first)
+
+    def book(self, minutes, allowed=None):
+        """
+        Reserve the earliest free window of ``minutes`` within ``allowed``.
+
+        Returns:
+            tuple | None: (start minute, end minute) rounded out to whole slots
+        """
+        start = self.find(minutes, allowed)
+        if start is None:
+            return None
+        self.reserve(start, minutes)
+        return start, start + self.slots_for(minutes) * self.SLOT_MINUTES
+
+    @staticmethod
+    def to_time(minute):
+        """Minute of the day as a ``time``; the end of the day is clamped to 23:59"""
+        minute = min(minute, 24 * 60 - 1)
+        return time(minute // 60, minute % 60)
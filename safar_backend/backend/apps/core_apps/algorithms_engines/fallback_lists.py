@@ -0,0 +1,166 @@
+import logging
+import uuid
+from itertools import zip_longest
+
+import numpy as np
+from django.core.cache import cache
+
+from apps.safar.models import Place, Experience
+from apps.core_apps.algorithms_engines.popularity import PopularityCounter
+
+logger = logging.getLogger(__name__)
+
+
+class FallbackLists:
+    """
+    Precomputed best-item lists per destination and category.
+
+    A nightly job ranks the whole catalog once by a blend of rating and
+    rolling popularity and stores the top ``LIST_SIZE`` ids for every
+    country, region, city and category, plus a global list. Cold-start and
+    fallback recommendations are then one cache read and one primary key
+    lookup, and need neither a user nor a trained model.
+
+    Ids are stored packed as 16-byte UUIDs, like ``RecommendationCache``.
+    """
+
+    KEY_PATTERN = 'recs:fallback:{item_type}:{scope}:{scope_id}'
+    TIMEOUT = 60 * 60 * 48  # 2 days, so one failed nightly build is survivable
+    LIST_SIZE = 100
+    RATING_WEIGHT = 0.6
+    POPULARITY_WEIGHT = 0.4
+
+    ITEM_MODELS = {
+        'place': Place,
+        'experience': Experience,
+    }
+    # Scope -> column holding the item's value for it
+    SCOPE_COLUMNS = {
+        'place': {
+            'country': 'country_id',
+            'region': 'region_id',
+            'city': 'city_id',
+            'category': 'category_id',
+        },
+        'experience': {
+            'country': 'place__country_id',
+            'region': 'place__region_id',
+            'city': 'place__city_id',
+            'category': 'category_id',
+        },
+    }
+    GLOBAL = 'global'
+
+    def __init__(self, item_type):
+        if item_type not in self.ITEM_MODELS:
+            raise ValueError(f"Unsupported item type: {item_type}")
+        self.item_type = item_type
+
+    def _key(self, scope, scope_id=None):
+        return self.KEY_PATTERN.format(item_type=self.item_type, scope=scope, scope_id=scope_id or '')
+
+    def get(self, scope=GLOBAL, scope_id=None):
+        """
+        Return the precomputed list for a scope.
+
+        Returns:
+            list | None: Item ids (str), best first, or None if not built
+        """
+        return self.get_many([(scope, scope_id)]).get((scope, scope_id))
+
+    def get_many(self, scopes):
+        """Return {(scope, scope_id): [item_id, ...]} for the scopes that are built, in one round trip"""
+        keys = {self._key(scope, scope_id): (scope, scope_id) for scope, scope_id in scopes}
+        try:
+            found = cache.get_many(list(keys))
+        except Exception as e:
+            logger.error(f"Error reading fallback lists: {str(e)}")
+            return {}
+        return {
+            keys[key]: [str(uuid.UUID(bytes=data[i:i + 16])) for i in range(0, len(data), 16)]
+            for key, data in found.items()
+        }
+
+    def ids_for_filters(self, filters=None, preferred_countries=None):
+        """
+        Pick the precomputed list matching catalog filters.
+
+        Only filters on a single scope (country, region, city or category,
+        as an instance or id, optionally through ``place__``) are covered;
+        without filters the user's preferred countries are interleaved,
+        then the global list.
+
+        Returns:
+            list | None: Item ids, or None when the filters have no precomputed list
+        """
+        # The lists only hold available, non-deleted items already
+        filters = {
+            name: value for name, value in (filters or {}).items()
+            if (name, value) not in (('is_available', True), ('is_deleted', False))
+        }
+        if len(filters) > 1:
+            return None
+
+        if filters:
+            name, value = next(iter(filters.items()))
+            scope = name[len('place__'):] if name.startswith('place__') else name
+            if scope not in self.SCOPE_COLUMNS[self.item_type]:
+                return None
+            return self.get(scope, getattr(value, 'pk', value))
+
+        scopes = [('country', country_id) for country_id in (preferred_countries or [])]
+        lists = self.get_many(scopes + [(self.GLOBAL, None)])
+        preferred = [lists[scope] for scope in scopes if scope in lists]
+        if not preferred:
+            return lists.get((self.GLOBAL, None))
+
+        # Round-robin across preferred countries, then top up from the global list
+        item_ids = [item_id for group in zip_longest(*preferred) for item_id in group if item_id is not None]
+        item_ids.extend(lists.get((self.GLOBAL, None), []))
+        return list(dict.fromkeys(item_ids))
+
+    def rebuild(self):
+        """
+        Rank the available catalog once and store the top list of every scope.
+
+        Returns:
+            int: Number of lists written
+        """
+        scope_columns = self.SCOPE_COLUMNS[self.item_type]
+        rows = list(self.ITEM_MODELS[self.item_type].objects.filter(
+            is_available=True,
+            is_deleted=False
+        ).values_list('id', 'rating', *scope_columns.values()))
+        if not rows:
+            return 0
+
+        item_ids = [str(row[0]) for row in rows]
+        ratings = np.array([row[1] or 0.0 for row in rows], dtype=np.float64) / 5.0
+        popularity = PopularityCounter(self.item_type).scores(item_ids)
+        popularity = np.array([popularity.get(item_id, 0.0) for item_id in item_ids], dtype=np.float64)
+        if popularity.max() > 0:
+            popularity /= popularity.max()
+
+        scores = self.RATING_WEIGHT * ratings + self.POPULARITY_WEIGHT * popularity
+        order = np.argsort(-scores, kind='stable')
+
+        # One pass in score order fills every scope's list, best first
+        lists = {(self.GLOBAL, None): []}
+        for idx in order.tolist():
+            row = rows[idx]
+            targets = [(self.GLOBAL, None)] + [
+                (scope, row[2 + position])
+                for position, scope in enumerate(scope_columns)
+                if row[2 + position] is not None
+            ]
+            for target in targets:
+                item_list = lists.setdefault(target, [])
+                if len(item_list) < self.LIST_SIZE:
+                    item_list.append(row[0])
+
+        cache.set_many({
+            self._key(scope, scope_id): b''.join(uuid.UUID(str(item_id)).bytes for item_id in item_ids)
+            for (scope, scope_id), item_ids in lists.items()
+        }, timeout=self.TIMEOUT)
+        logger.info(f"Built {len(lists)} {self.item_type} fallback lists")
+        return len(lists)
@@ -1,12 +1,20 @@
+import json
 import logging
 from datetime import timedelta, datetime, time
 from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.gis.geos import Point
 from apps.authentication.models import User
-from apps.safar.models import (Notification,Box, BoxItineraryDay, BoxItineraryItem)
+from apps.safar.models import (Notification,Box, BoxItineraryDay, BoxItineraryItem, Place, Experience, Category)
 from apps.geographic_data.models import City, Region, Country
 from apps.core_apps.algorithms_engines.recommendation_engine import RecommendationEngine
-from sklearn.cluster import DBSCAN
+from apps.core_apps.algorithms_engines.geo_clustering import to_radians, cluster_labels, spherical_centroids
+from apps.core_apps.algorithms_engines.travel_time import TravelTimeService, activity_key
+from apps.core_apps.algorithms_engines.day_schedule import DaySchedule
+from apps.core_apps.algorithms_engines.itinerary_optimizer import ItineraryOptimizer
+from apps.core_apps.algorithms_engines.itinerary_skeleton import ItinerarySkeleton
+from apps.core_apps.algorithms_engines.user_preferences import UserPreferenceVector
 import numpy as np
 
 logger = logging.getLogger(__name__)
@@ -47,7 +55,17 @@ class BoxGenerator:
         },
         'min_activity_spacing_minutes': 60,  # Minimum time between activities
         'avoid_peak_hours': True,        # Try to avoid peak hours at popular places
+        'travel_speed_model': None,      # (max km, km/h) tiers; None uses TravelTimeService.SPEED_MODEL
+        'planner': 'greedy',             # 'greedy' per day, or 'optimizer' for a whole-trip search
+        'optimizer_time_budget_ms': 200, # Wall-clock budget of the optimizer
+        'use_itinerary_skeleton': True,  # Share candidates, clusters and travel times per destination
     }
+    
+    BOX_CATEGORY = 'Package'  # Category of generated boxes, as for curated ones
+    SKELETON_POOL_PER_SLOT = 3  # Skeleton candidates per schedulable slot of the trip
+    MODEL_SCORE_WEIGHT = 0.5  # Share of the model score when re-ranking skeleton candidates
+    BULK_BATCH_SIZE = 500  # Rows per INSERT when persisting itineraries
+    BATCH_CHUNK_SIZE = 200  # Users scored and saved together by batch generation
 
     # Time of day definitions (hour ranges)
     TIME_OF_DAY = {
@@ -71,9 +89,13 @@ class BoxGenerator:
         self.user = user
         self.recommendation_engine = recommendation_engine or RecommendationEngine(user)
         self.constraints = {**self.DEFAULT_CONSTRAINTS, **(constraints or {})}
+        self.travel_times = TravelTimeService(speed_model=self.constraints['travel_speed_model'])
+        self.progress = None
+        self.personalization_scores = {}
+        self.skeleton = None
+        self.box_category = None
         
-    @transaction.atomic
-    def generate_box(self, destination, duration_days, budget=None, start_date=None, theme=None):
+    def generate_box(self, destination, duration_days, budget=None, start_date=None, theme=None, progress=None):
         """
         Generate a complete travel box with itinerary.
         
@@ -83,6 +105,7 @@ class BoxGenerator:
             budget (float): Optional total budget for the trip
             start_date (date): Optional start date for the trip
             theme (str): Optional theme (e.g., 'adventure', 'relaxation')
+            progress (callable): Optional ``progress(stage, percent, **details)`` callback
             
         Returns:
             Box: The generated travel box
@@ -91,51 +114,19 @@ class BoxGenerator:
             ValueError: For invalid inputs
             RuntimeError: If box generation fails
         """
+        self.progress = progress
+        self.personalization_scores = {}
+        self.skeleton = None
         try:
             # Validate inputs
             self._validate_inputs(destination, duration_days, budget)
             
-            # Adjust constraints based on theme
-            self._apply_theme_constraints(theme)
-            
-            # Calculate daily budget if total budget provided
-            daily_budget = budget / duration_days if budget else None
-            
-            # Create base box
-            box = self._create_base_box(
-                destination=destination,
-                duration_days=duration_days,
-                start_date=start_date,
-                theme=theme
+            # Build box and itinerary in memory, then save them together
+            box, itinerary_days, itinerary_items = self._plan_box(
+                destination, duration_days, budget, start_date, theme
             )
-            
-            # Get recommendations for this box
-            recommendations = self.recommendation_engine.recommend_for_box(
-                destination=destination,
-                duration_days=duration_days
-            )
-            
-            # Generate optimized itinerary
-            itinerary = self._generate_itinerary(
-                box=box,
-                places=recommendations['places'],
-                experiences=recommendations['experiences'],
-                daily_budget=daily_budget
-            )
-            
-            # Calculate and set total price
-            box.total_price = self._calculate_total_price(itinerary)
-            box.save()
-            
-            # Add metadata about generation
-            box.metadata.update({
-                'generated': True,
-                'algorithm_version': '2.0',
-                'constraints_used': self.constraints,
-                'theme': theme,
-                'generation_date': datetime.now().isoformat()
-            })
-            box.save()
+            self._report_progress('saving', 95)
+            self._save_itinerary(box, itinerary_days, itinerary_items)
             
             # Create notification for the user
             self._create_box_notification(box)
@@ -150,29 +141,209 @@ class BoxGenerator:
             logger.error(f"Unexpected error generating box: {str(e)}", exc_info=True)
             raise RuntimeError("Could not generate box at this time")
 
+    @classmethod
+    def generate_boxes_for_users(cls, users, destination, duration_days, budget=None, start_date=None,
+                                 theme=None, constraints=None, progress=None):
+        """
+        Generate one box per user for the same destination, duration and
+        theme, e.g. for "your personalised weekend in X" campaigns.
+        
+        The destination's itinerary skeleton (candidate pool, clusters,
+        travel matrix and opening-hour masks) is loaded once and each chunk of
+        users is scored against the pool in one vectorised pass, then blended
+        with each user's model scores; only that and the scheduling run per
+        user. Each chunk is saved in one transaction with
+        one bulk INSERT each for boxes, days, items and notifications. Bulk
+        inserted notifications are not pushed over the WebSocket.
+        
+        Args:
+            users (list): Users to generate for, with their profiles loaded
+            destination (City|Region|Country): The travel destination
+            duration_days (int): Trip duration in days
+            budget (float): Optional total budget of each trip
+            start_date (date): Optional start date of the trips
+            theme (str): Optional theme (e.g., 'adventure', 'relaxation')
+            constraints (dict): Override default scheduling constraints
+            progress (callable): Optional ``progress(user, box=None, error=None)``
+                callback, called once per user when their box is saved or fails
+            
+        Returns:
+            dict: {'boxes': {user_id: box_id}, 'failures': {user_id: error}}
+            
+        Raises:
+            ValueError: For invalid inputs
+        """
+        users = list(users)
+        results = {'boxes': {}, 'failures': {}}
+        if not users:
+            return results
+        constraints = {**(constraints or {}), 'use_itinerary_skeleton': True}
+        
+        def report(user, box=None, error=None):
+            if box is not None:
+                results['boxes'][str(user.id)] = str(box.id)
+            else:
+                results['failures'][str(user.id)] = error
+            if progress is not None:
+                try:
+                    progress(user, box=box, error=error)
+                except Exception as e:
+                    logger.warning(f"Batch progress callback failed for user {user.id}: {str(e)}")
+        
+        # Everything shared by the batch is loaded once; boxes are built per
+        # user below, so one that can't be built only fails its own user
+        first = cls(users[0], constraints=constraints)
+        first._validate_inputs(destination, duration_days, budget)
+        first._apply_theme_constraints(theme)
+        skeleton = first._get_skeleton(destination, duration_days, theme)
+        box_category = first._get_box_category()
+        pool = list(skeleton.places) + list(skeleton.experiences)
+        vectors = UserPreferenceVector.for_profiles([user.profile for user in users])
+        
+        for offset in range(0, len(users), cls.BATCH_CHUNK_SIZE):
+            chunk = users[offset:offset + cls.BATCH_CHUNK_SIZE]
+            scores = UserPreferenceVector.score_matrix(vectors[offset:offset + cls.BATCH_CHUNK_SIZE], pool)
+            
+            planned = []
+            for user, user_scores in zip(chunk, scores):
+                try:
+                    generator = cls(user, constraints=constraints)
+                    generator.skeleton = skeleton
+                    generator.box_category = box_category
+                    generator._rerank_skeleton_pool(destination, preference_scores=user_scores)
+                    planned.append((user, generator, generator._plan_box(
+                        destination, duration_days, budget, start_date, theme
+                    )))
+                except Exception as e:
+                    logger.error(f"Error generating batch box for user {user.id}: {str(e)}", exc_info=True)
+                    report(user, error=str(e) if isinstance(e, ValueError) else "Could not generate box")
+            
+            try:
+                with transaction.atomic():
+                    Box.objects.bulk_create([box for _, _, (box, _, _) in planned], batch_size=cls.BULK_BATCH_SIZE)
+                    BoxItineraryDay.objects.bulk_create(
+                        [day for _, _, (_, days, _) in planned for day in days], batch_size=cls.BULK_BATCH_SIZE
+                    )
+                    BoxItineraryItem.objects.bulk_create(
+                        [item for _, _, (_, _, items) in planned for item in items], batch_size=cls.BULK_BATCH_SIZE
+                    )
+                    Notification.objects.bulk_create(
+                        [generator._box_notification(box) for _, generator, (box, _, _) in planned],
+                        batch_size=cls.BULK_BATCH_SIZE
+                    )
+            except Exception as e:
+                # Fall back to one transaction per user, so only the boxes
+                # that can't be saved fail
+                logger.error(f"Error saving batch boxes for {len(planned)} users: {str(e)}", exc_info=True)
+                for user, generator, (box, days, items) in planned:
+                    try:
+                        generator._save_itinerary(box, days, items)
+                        generator._create_box_notification(box)
+                    except Exception as e:
+                        logger.error(f"Error saving batch box for user {user.id}: {str(e)}", exc_info=True)
+                        report(user, error="Could not save box")
+                    else:
+                        report(user, box=box)
+                continue
+            
+            for user, _, (box, _, _) in planned:
+                report(user, box=box)
+        
+        logger.info(
+            f"Batch box generation: {len(results['boxes'])} generated, {len(results['failures'])} failed"
+        )
+        return results
+
+    def _plan_box(self, destination, duration_days, budget, start_date, theme):
+        """
+        Build a box and its itinerary in memory, without saving anything.
+        
+        Returns:
+            tuple: (box, itinerary days, itinerary items), all unsaved
+        """
+        # Adjust constraints based on theme
+        self._apply_theme_constraints(theme)
+        
+        # Calculate daily budget if total budget provided
+        daily_budget = budget / duration_days if budget else None
+        
+        box = self._create_base_box(
+            destination=destination,
+            duration_days=duration_days,
+            start_date=start_date,
+            theme=theme
+        )
+        
+        # Get candidates for this box: the shared destination skeleton,
+        # re-ranked for the user later, or per-user recommendations
+        self._report_progress('recommendations', 10)
+        if self.skeleton is None and self.constraints['use_itinerary_skeleton']:
+            self.skeleton = self._get_skeleton(destination, duration_days, theme)
+        if self.skeleton is not None:
+            if not self.personalization_scores:
+                self._rerank_skeleton_pool(destination)
+            recommendations = {'places': self.skeleton.places, 'experiences': self.skeleton.experiences}
+        else:
+            recommendations = self.recommendation_engine.recommend_for_box(
+                destination=destination,
+                duration_days=duration_days
+            )
+        
+        # Generate optimized itinerary in memory
+        itinerary_days, itinerary_items = self._generate_itinerary(
+            box=box,
+            places=recommendations['places'],
+            experiences=recommendations['experiences'],
+            daily_budget=daily_budget
+        )
+        
+        # Calculate and set total price
+        box.total_price = self._calculate_total_price(itinerary_items)
+        
+        # Add metadata about generation
+        box.metadata.update({
+            'generated': True,
+            'algorithm_version': '2.0',
+            'constraints_used': self.constraints,
+            'theme': theme,
+            'generation_date': datetime.now().isoformat()
+        })
+        return box, itinerary_days, itinerary_items
+
+    @staticmethod
+    def get_destination(destination_type, destination_id):
+        """Resolve a destination type ('city', 'region' or 'country') and id to its instance"""
+        model_map = {
+            'city': City,
+            'region': Region,
+            'country': Country
+        }
+        
+        if destination_type not in model_map:
+            raise ValueError("Invalid destination type")
+            
+        model = model_map[destination_type]
+        try:
+            return model.objects.get(id=destination_id, is_deleted=False)
+        except (model.DoesNotExist, ValidationError):
+            raise ValueError(f"{destination_type.capitalize()} not found")
+
+    def _report_progress(self, stage, percent, **details):
+        """Forward a generation stage to the progress callback, if any"""
+        if self.progress is None:
+            return
+        try:
+            self.progress(stage, percent, **details)
+        except Exception as e:
+            logger.warning(f"Progress callback failed at {stage}: {str(e)}")
+
     def _create_box_notification(self, box):
         """
         Create a notification for the user about their new generated box.
         Includes a deep link to the box in the metadata.
         """
         try:
-            # Generate deep link URL (assuming you have a URL named 'box-detail')
-            absolute_deep_link = f"http://localhost:3000/box/{box.id}"
-            
-            Notification.objects.create(
-                user=self.user,
-                type="Personalized Box",
-                message=f"Your personalized {box.name} is ready!",
-                metadata={
-                    "box_id": str(box.id),
-                    "deep_link": absolute_deep_link,
-                    "box_name": box.name,
-                    "generated_at": box.created_at.isoformat(),
-                    "duration_days": box.duration_days,
-                    "total_price": box.total_price
-                },
-                channels=["app", "email"]
-            )
+            self._box_notification(box).save()
             
             logger.info(f"Created notification for box {box.id} for user {self.user.id}")
             
@@ -181,6 +352,26 @@ class BoxGenerator:
             # Don't fail the whole operation if notification fails
             pass
 
+    def _box_notification(self, box):
+        """The unsaved notification announcing a saved box to the user"""
+        # Generate deep link URL (assuming you have a URL named 'box-detail')
+        absolute_deep_link = f"http://localhost:3000/box/{box.id}"
+        
+        return Notification(
+            user=self.user,
+            type="Personalized Box",
+            message=f"Your personalized {box.name} is ready!",
+            metadata={
+                "box_id": str(box.id),
+                "deep_link": absolute_deep_link,
+                "box_name": box.name,
+                "generated_at": box.created_at.isoformat(),
+                "duration_days": box.duration_days,
+                "total_price": box.total_price
+            },
+            channels=["app", "email"]
+        )
+
     def _validate_inputs(self, destination, duration_days, budget):
         """Validate all generation parameters"""
         if not isinstance(destination, (City, Region, Country)):
@@ -247,11 +438,13 @@ class BoxGenerator:
     def _create_base_box(self, destination, duration_days, start_date, theme):
         """Create the base box object with proper metadata"""
         box_data = {
+            'category': self._get_box_category(),
             'name': self._generate_box_name(destination, duration_days, theme),
             'duration_days': duration_days,
             'is_customizable': True,
-            'owner': self.user,
             'metadata': {
+                # Box has no owner or region columns; both are recorded here
+                'owner_id': str(self.user.pk),
                 'generation_parameters': {
                     'destination': str(destination),
                     'destination_type': type(destination).__name__,
@@ -265,14 +458,13 @@ class BoxGenerator:
         if isinstance(destination, City):
             box_data.update({
                 'city': destination,
-                'region': destination.region,
-                'country': destination.country
+                'country_id': destination.country_id
             })
+            if destination.region_id:
+                box_data['metadata']['region_id'] = str(destination.region_id)
         elif isinstance(destination, Region):
-            box_data.update({
-                'region': destination,
-                'country': destination.country
-            })
+            box_data['country_id'] = destination.country_id
+            box_data['metadata']['region_id'] = str(destination.pk)
         else:
             box_data['country'] = destination
             
@@ -283,7 +475,13 @@ class BoxGenerator:
                 'end_date': start_date + timedelta(days=duration_days - 1)
             })
             
-        return Box.objects.create(**box_data)
+        return Box(**box_data)
+
+    def _get_box_category(self):
+        """The category generated boxes are filed under, created on first use"""
+        if self.box_category is None:
+            self.box_category, _ = Category.objects.get_or_create(name=self.BOX_CATEGORY)
+        return self.box_category
 
     def _generate_box_name(self, destination, duration_days, theme):
         """Generate an attractive name for the box"""
@@ -309,24 +507,43 @@ class BoxGenerator:
         - Budget constraints
         - Time of day preferences
         - Weather considerations (if available)
+        
+        Nothing is written to the database here.
+        
+        Returns:
+            tuple: (unsaved BoxItineraryDay list, unsaved BoxItineraryItem list)
         """
         itinerary_days = []
+        itinerary_items = []
         
         # Combine and prioritize all potential activities
         all_activities = self._combine_and_prioritize_activities(places, experiences)
         
+        if self.constraints['planner'] == 'optimizer':
+            self._report_progress('optimizing', 35)
+            return self._optimize_itinerary(box, all_activities, daily_budget)
+        
         # Group activities by geographic area for efficient routing
-        clustered_activities = self._cluster_activities_by_location_ml(all_activities)
+        self._report_progress('clustering', 35)
+        if self.skeleton is not None:
+            clustered_activities = self.skeleton.clusters_for([activity['object'] for activity in all_activities])
+        else:
+            clustered_activities = self._cluster_activities_by_location_ml(all_activities)
         
         # Check if we have weather data for the destination and dates
         has_weather_data = self._check_weather_data_availability(box)
         
         # Generate each day's itinerary
         for day_num in range(1, box.duration_days + 1):
+            self._report_progress('scheduling', 40 + 50 * (day_num - 1) // box.duration_days, day=day_num)
+            
             # Get weather for this day if available
             weather = self._get_weather_for_day(box, day_num) if has_weather_data else None
             
-            day_itinerary = self._generate_day_itinerary(
+            if weather:
+                box.metadata.setdefault('weather', {})[str(day_num)] = weather
+            
+            day_itinerary, day_items = self._generate_day_itinerary(
                 box=box,
                 day_num=day_num,
                 clustered_activities=clustered_activities,
@@ -334,13 +551,14 @@ class BoxGenerator:
                 weather=weather
             )
             itinerary_days.append(day_itinerary)
+            itinerary_items.extend(day_items)
             
             # Remove scheduled activities from consideration
-            scheduled_ids = [
-                item.place_id or item.experience_id 
-                for item in day_itinerary.items.all() 
+            scheduled_ids = {
+                item.place_id or item.experience_id
+                for item in day_items
                 if item.place_id or item.experience_id
-            ]
+            }
             
             # Update clustered_activities to remove scheduled items
             for cluster in clustered_activities:
@@ -352,7 +570,91 @@ class BoxGenerator:
             # Remove empty clusters
             clustered_activities = [c for c in clustered_activities if c['activities']]
         
-        return itinerary_days
+        return itinerary_days, itinerary_items
+
+    def _optimize_itinerary(self, box, activities, daily_budget):
+        """
+        Plan the whole trip at once with ``ItineraryOptimizer`` within
+        ``optimizer_time_budget_ms``, then book each day's activities in
+        route order, leaving travel time between them.
+        
+        Weather is not considered in this mode.
+        
+        Returns:
+            tuple: (unsaved BoxItineraryDay list, unsaved BoxItineraryItem list)
+        """
+        if not activities:
+            return [], []
+        
+        objects = [activity['object'] for activity in activities]
+        type_weights = self.constraints['activity_weights']
+        type_names = list(dict.fromkeys([*type_weights, *(activity['activity_type'] for activity in activities)]))
+        type_index = {name: position for position, name in enumerate(type_names)}
+        
+        travel = self._travel_matrix(objects, box)
+        start_hour, end_hour = self.constraints['opening_hours']
+        optimizer = ItineraryOptimizer(
+            values=[
+                0.7 * activity['personalization_score'] + 0.3 * float(activity['rating'] or 0) / 5
+                for activity in activities
+            ],
+            durations=[self._get_activity_duration(activity) for activity in objects],
+            costs=[float(self._get_activity_cost(activity) or 0) for activity in objects],
+            types=[type_index[activity['activity_type']] for activity in activities],
+            minutes=travel.submatrix([activity_key(activity) for activity in objects]),
+            days=box.duration_days,
+            max_daily_items=self.constraints['max_daily_items'],
+            max_daily_minutes=min(self.constraints['max_daily_hours'], end_hour - start_hour) * 60,
+            max_hop_minutes=self.constraints['max_travel_time_minutes'],
+            budget=daily_budget * box.duration_days if daily_budget else None,
+            type_targets=[type_weights.get(name, 0.0) for name in type_names],
+            travel_times=self.travel_times
+        )
+        plan = optimizer.optimise(self.constraints['optimizer_time_budget_ms'])
+        
+        itinerary_days, itinerary_items = [], []
+        for day_num, stops in enumerate(plan, start=1):
+            day = BoxItineraryDay(
+                box=box,
+                day_number=day_num,
+                date=box.start_date + timedelta(days=day_num - 1) if box.start_date else None
+            )
+            itinerary_days.append(day)
+            
+            schedule = self._initialize_time_slots(day)
+            day_items = []
+            previous, earliest = None, 0
+            for stop in stops:
+                activity = objects[stop]
+                if previous is not None:
+                    earliest = previous_end + int(np.ceil(optimizer.minutes[previous, stop] / 5) * 5)
+                allowed = DaySchedule.window(earliest, 24 * 60)
+                opening_mask = self._opening_mask(activity)
+                if opening_mask is not None:
+                    allowed &= opening_mask
+                
+                booked = schedule.book(self._get_activity_duration(activity), allowed)
+                if booked is None:
+                    continue
+                day_items.append(self._create_itinerary_item(
+                    day=day,
+                    activity=activity,
+                    start_time=DaySchedule.to_time(booked[0]),
+                    end_time=DaySchedule.to_time(booked[1]),
+                    order=len(day_items) + 1,
+                    cost=self._get_activity_cost(activity)
+                ))
+                previous, previous_end = stop, booked[1]
+            itinerary_items.extend(day_items)
+        
+        return itinerary_days, itinerary_items
+
+    def _save_itinerary(self, box, itinerary_days, itinerary_items):
+        """Persist a box with its whole itinerary in one transaction: the box, then one bulk INSERT each for days and items"""
+        with transaction.atomic():
+            box.save()
+            BoxItineraryDay.objects.bulk_create(itinerary_days)
+            BoxItineraryItem.objects.bulk_create(itinerary_items, batch_size=self.BULK_BATCH_SIZE)
 
     def _combine_and_prioritize_activities(self, places, experiences):
         """
@@ -387,9 +689,18 @@ class BoxGenerator:
                 'indoor': experience.metadata.get('is_indoor', False)
             })
         
-        # Calculate personalization score for each activity
+        # Score the whole pool in one pass, unless the skeleton re-ranking
+        # already did; later sorts read the memoised scores
+        unscored = [
+            activity['object'] for activity in activities
+            if activity_key(activity['object']) not in self.personalization_scores
+        ]
+        if unscored:
+            scores = self.recommendation_engine.preferences.score_many(unscored)
+            for item, score in zip(unscored, scores.tolist()):
+                self.personalization_scores[activity_key(item)] = score
         for activity in activities:
-            activity['personalization_score'] = self.recommendation_engine.calculate_personalization_score(activity['object'])
+            activity['personalization_score'] = self.personalization_scores[activity_key(activity['object'])]
             activity['rating'] = getattr(activity['object'], 'rating', 3.0)
         
         # Sort by personalization score and rating
@@ -403,8 +714,9 @@ class BoxGenerator:
 
     def _cluster_activities_by_location_ml(self, activities, max_distance_km=5):
         """
-        Group activities by geographic proximity using DBSCAN clustering algorithm
-        with Django's GIS functionality for distance calculations
+        Group activities by geographic proximity using DBSCAN over a haversine
+        ball tree, so distances are real great-circle kilometres and the
+        neighbour search runs in compiled code instead of per-pair GEOS calls
         
         Args:
             activities (list): List of activity dicts
@@ -417,7 +729,7 @@ class BoxGenerator:
             return []
             
         # Get only activities with locations
-        located_activities = [a for a in activities if hasattr(a['object'], 'location') and a['object'].location]
+        located_activities = [a for a in activities if getattr(a['object'], 'location', None)]
         
         # If no locations, return one cluster with all activities
         if not located_activities:
@@ -426,65 +738,27 @@ class BoxGenerator:
                 'activities': [a['object'] for a in activities]
             }]
         
-        # Extract coordinates for clustering
-        coordinates = []
-        for activity in located_activities:
-            loc = activity['object'].location
-            coordinates.append([loc.x, loc.y])  # Longitude, Latitude
+        coordinates = to_radians([a['object'].location for a in located_activities])
+        labels = cluster_labels(coordinates, max_distance_km)
+        cluster_ids, centroids = spherical_centroids(coordinates, labels)
         
-        # Convert to numpy array
-        X = np.array(coordinates)
+        # Group activities by cluster, keeping their priority order
+        members = {int(label): [] for label in cluster_ids}
+        for activity, label in zip(located_activities, labels.tolist()):
+            members[label].append(activity['object'])
         
-        if len(X) < 2:
-            # Not enough points for clustering
-            return [{
-                'center': located_activities[0]['object'].location,
-                'activities': [a['object'] for a in located_activities]
-            }]
-        
-        # Calculate epsilon in degrees (approximate conversion from km)
-        # 1 degree latitude ≈ 111 km, but longitude varies with latitude
-        avg_lat = np.mean(X[:, 1])
-        km_per_degree_lon = 111 * np.cos(np.radians(avg_lat))
-        epsilon_lat = max_distance_km / 111.0
-        epsilon_lon = max_distance_km / km_per_degree_lon
-        
-        # Custom distance metric using Django's GIS functionality
-        def gis_distance(p1, p2):
-            """Calculate distance between two points using Django GIS"""
-            point1 = Point(p1[0], p1[1], srid=4326)  # WGS84 SRID
-            point2 = Point(p2[0], p2[1], srid=4326)
-            # Convert to meters and then to kilometers
-            return point1.distance(point2) * 100  # Approximate conversion to km
-        
-        # Use DBSCAN for clustering with our custom GIS distance metric
-        db = DBSCAN(
-            eps=max(epsilon_lat, epsilon_lon),
-            min_samples=1,
-            metric=gis_distance
-        ).fit(X)
-        
-        labels = db.labels_
-        
-        # Group activities by cluster
-        clusters = []
-        for label in set(labels):
-            cluster_indices = np.where(labels == label)[0]
-            cluster_activities = [located_activities[i]['object'] for i in cluster_indices]
-            
-            # Calculate centroid
-            cluster_points = [act.location for act in cluster_activities]
-            centroid = self._calculate_centroid(cluster_points)
-            
-            clusters.append({
-                'center': centroid,
-                'activities': cluster_activities
-            })
+        clusters = [
+            {
+                'center': Point(float(lng), float(lat), srid=4326),
+                'activities': members[int(label)]
+            }
+            for label, (lat, lng) in zip(cluster_ids, centroids)
+        ]
         
         # Add any remaining non-located activities to a separate cluster
         non_located = [
             a['object'] for a in activities 
-            if not (hasattr(a['object'], 'location') and a['object'].location)
+            if not getattr(a['object'], 'location', None)
         ]
         if non_located:
             clusters.append({
@@ -494,15 +768,6 @@ class BoxGenerator:
             
         return clusters
 
-    def _calculate_centroid(self, points):
-        """Calculate geographic centroid of multiple points"""
-        if not points:
-            return None
-            
-        from django.contrib.gis.geos import MultiPoint
-        multipoint = MultiPoint(points)
-        return multipoint.centroid
-
     def _check_weather_data_availability(self, box):
         """Check if weather data is available for this box's location and dates"""
         # This is a placeholder - implement based on your weather data source
@@ -542,18 +807,16 @@ class BoxGenerator:
         - Budget constraints
         - Time of day preferences
         - Weather conditions
+        
+        Returns:
+            tuple: (unsaved BoxItineraryDay, its unsaved BoxItineraryItems)
         """
-        day = BoxItineraryDay.objects.create(
+        day = BoxItineraryDay(
             box=box,
             day_number=day_num,
             date=box.start_date + timedelta(days=day_num - 1) if box.start_date else None
         )
         
-        # Add weather information to day metadata if available
-        if weather:
-            day.metadata = {'weather': weather}
-            day.save()
-        
         # Initialize scheduling parameters
         selected_items = []
         remaining_hours = self.constraints['max_daily_hours']
@@ -585,7 +848,7 @@ class BoxGenerator:
             if not all_activities:
                 # No activities available
                 logger.warning(f"No activities available for day {day_num}")
-                return day
+                return day, []
                 
             # Sort activities by priority
             all_activities.sort(
@@ -594,26 +857,28 @@ class BoxGenerator:
             )
             
             # Schedule activities
-            self._schedule_activities_in_time_slots(
+            items = self._schedule_activities_in_time_slots(
                 day=day,
                 activities=all_activities,
                 time_slots=time_slots,
                 activity_counts=activity_counts,
                 target_counts=target_counts,
-                remaining_budget=remaining_budget
+                remaining_budget=remaining_budget,
+                travel=self._travel_matrix(all_activities, box)
             )
         else:
             # Schedule activities from the selected cluster
-            self._schedule_activities_in_time_slots(
+            items = self._schedule_activities_in_time_slots(
                 day=day,
                 activities=selected_cluster['activities'],
                 time_slots=time_slots,
                 activity_counts=activity_counts,
                 target_counts=target_counts,
-                remaining_budget=remaining_budget
+                remaining_budget=remaining_budget,
+                travel=self._travel_matrix(selected_cluster['activities'], box)
             )
         
-        return day
+        return day, items
 
     def _adjust_for_weather(self, target_counts, weather):
         """Adjust activity targets based on weather conditions"""
@@ -631,35 +896,17 @@ class BoxGenerator:
                 target_counts['cultural'] = max(0, target_counts['cultural'] - 1)
 
     def _initialize_time_slots(self, day):
-        """Initialize time slots for scheduling activities"""
-        # Default day starts at 9:00 and ends at 20:00
+        """Free/busy bitmask of the day's scheduling window"""
         start_hour, end_hour = self.constraints['opening_hours']
-        
-        # Create 30-minute time slots
-        time_slots = []
-        current_time = time(start_hour, 0)  # Start at 9:00
-        
-        while current_time.hour < end_hour:
-            # Create a time slot
-            slot = {
-                'start_time': current_time,
-                'is_available': True,
-                'activity': None
-            }
-            
-            # Calculate end time (30 minutes later)
-            minutes = current_time.minute + 30
-            hour = current_time.hour + minutes // 60
-            minutes = minutes % 60
-            
-            if hour < 24:  # Ensure we don't go past midnight
-                slot['end_time'] = time(hour, minutes)
-                time_slots.append(slot)
-            
-            # Move to next slot
-            current_time = slot['end_time']
-        
-        return time_slots
+        return DaySchedule(start_hour * 60, end_hour * 60)
+
+    def _time_of_day_mask(self, times_of_day):
+        """Slot mask covering the given times of day"""
+        mask = 0
+        for time_of_day in times_of_day:
+            start_hour, end_hour = self.TIME_OF_DAY[time_of_day]
+            mask |= DaySchedule.window(start_hour * 60, end_hour * 60)
+        return mask
 
     def _select_best_cluster_for_day(self, clustered_activities, day_num, total_days):
         """Select the best geographic cluster for a specific day"""
@@ -684,14 +931,22 @@ class BoxGenerator:
         cluster_index = (day_num - 1) % len(sorted_clusters)
         return sorted_clusters[cluster_index]
 
+    def _personalization_score(self, activity):
+        """Personalization score of an activity, memoised for the current generation"""
+        key = activity_key(activity)
+        score = self.personalization_scores.get(key)
+        if score is None:
+            score = self.personalization_scores[key] = self.recommendation_engine.preferences.score(activity)
+        return score
+
     def _get_activity_priority(self, activity):
         """Calculate priority score for an activity"""
-        personalization_score = self.recommendation_engine.calculate_personalization_score(activity)
+        personalization_score = self._personalization_score(activity)
         rating = getattr(activity, 'rating', 3.0)
         return (personalization_score * 0.7) + (rating * 0.3)
 
-    def _schedule_activities_in_time_slots(self, day, activities, time_slots, activity_counts, target_counts, remaining_budget):
-        """Schedule activities in available time slots"""
+    def _schedule_activities_in_time_slots(self, day, activities, time_slots, activity_counts, target_counts, remaining_budget, travel=None):
+        """Schedule activities in available time slots, then sequence them along a short route; returns the unsaved items"""
         # Sort activities by priority score
         sorted_activities = sorted(
             activities,
@@ -702,6 +957,10 @@ class BoxGenerator:
         # Track scheduled items
         scheduled_items = []
         
+        # Prices are DecimalFields while budgets arrive as floats; keep the arithmetic in float
+        if remaining_budget is not None:
+            remaining_budget = float(remaining_budget)
+        
         # First pass: schedule activities based on time of day preferences
         for activity in sorted_activities:
             if len(scheduled_items) >= self.constraints['max_daily_items']:
@@ -710,6 +969,11 @@ class BoxGenerator:
             activity_type = getattr(activity, 'metadata', {}).get('activity_type', 'cultural')
             preferred_times = self.constraints['time_of_day_preferences'].get(activity_type, ['morning', 'afternoon'])
             
+            # Check budget constraint before booking, so rejected activities don't hold slots
+            cost = float(self._get_activity_cost(activity) or 0)
+            if remaining_budget is not None and cost > remaining_budget:
+                continue
+            
             # Find suitable time slot
             suitable_slot = self._find_suitable_time_slot(
                 activity=activity,
@@ -718,11 +982,6 @@ class BoxGenerator:
             )
             
             if suitable_slot:
-                # Check budget constraint
-                cost = self._get_activity_cost(activity)
-                if remaining_budget is not None and cost > remaining_budget:
-                    continue
-                
                 # Create itinerary item
                 item = self._create_itinerary_item(
                     day=day,
@@ -748,6 +1007,10 @@ class BoxGenerator:
                 if len(scheduled_items) >= self.constraints['max_daily_items']:
                     break
                 
+                cost = float(self._get_activity_cost(activity) or 0)
+                if remaining_budget is not None and cost > remaining_budget:
+                    continue
+                
                 # Find any available time slot
                 suitable_slot = self._find_suitable_time_slot(
                     activity=activity,
@@ -756,11 +1019,6 @@ class BoxGenerator:
                 )
                 
                 if suitable_slot:
-                    # Check budget constraint
-                    cost = self._get_activity_cost(activity)
-                    if remaining_budget is not None and cost > remaining_budget:
-                        continue
-                    
                     # Create itinerary item
                     item = self._create_itinerary_item(
                         day=day,
@@ -778,75 +1036,224 @@ class BoxGenerator:
                     if remaining_budget is not None:
                         remaining_budget -= cost
         
-        # Bulk create items
-        BoxItineraryItem.objects.bulk_create(scheduled_items)
+        if travel is not None:
+            scheduled_items = self._sequence_day_items(scheduled_items, travel)
+        
+        return scheduled_items
 
-    def _find_suitable_time_slot(self, activity, time_slots, preferred_times=None):
-        """Find a suitable time slot for an activity"""
-        duration_minutes = self._get_activity_duration(activity)
-        slots_needed = max(1, duration_minutes // 30)
+    def _travel_matrix(self, activities, box):
+        """Travel matrix covering ``activities``: the skeleton's when it has them all, else the cached per-set one"""
+        if self.skeleton is not None and all(
+            activity_key(activity) in self.skeleton.travel.index for activity in activities
+        ):
+            return self.skeleton.travel
+        return self.travel_times.matrix(activities, scope=self._travel_scope(box))
+
+    def _rerank_skeleton_pool(self, destination, preference_scores=None):
+        """
+        Score the shared skeleton candidates for this user.
         
-        # Get opening hours for the activity
-        opening_hours = self._get_activity_opening_hours(activity)
+        The skeleton's pool is the same for everyone, so the user's trained
+        model scores are blended into the preference scores here, keeping
+        collaborative personalization without per-user candidate queries.
         
-        # Filter time slots by preferred times of day
-        if preferred_times:
-            preferred_slots = []
-            for slot in time_slots:
-                if not slot['is_available']:
-                    continue
-                    
-                hour = slot['start_time'].hour
-                for time_of_day in preferred_times:
-                    start_hour, end_hour = self.TIME_OF_DAY[time_of_day]
-                    if start_hour <= hour < end_hour:
-                        preferred_slots.append(slot)
-                        break
-         
-                        preferred_slots.append(slot)
-                        break
-        else:
-            preferred_slots = [slot for slot in time_slots if slot['is_available']]
+        Args:
+            destination (City|Region|Country): The travel destination
+            preference_scores (array): Preference scores aligned with the
+                skeleton's places then experiences, computed when not given
+        """
+        engine = self.recommendation_engine
+        pools = (
+            ('place', list(self.skeleton.places), ''),
+            ('experience', list(self.skeleton.experiences), 'place__'),
+        )
+        if preference_scores is None:
+            preference_scores = engine.preferences.score_many(
+                [item for _, items, _ in pools for item in items]
+            )
+        preference_scores = np.asarray(preference_scores, dtype=np.float64)
         
-        # Find consecutive available slots
-        for i in range(len(preferred_slots) - slots_needed + 1):
-            consecutive_slots = preferred_slots[i:i+slots_needed]
-            
-            # Check if all slots are available and consecutive
-            if all(slot['is_available'] for slot in consecutive_slots):
-                # Check if slots are within opening hours
-                start_time = consecutive_slots[0]['start_time']
-                end_time = consecutive_slots[-1]['end_time']
-                
-                if opening_hours and not self._is_within_opening_hours(start_time, end_time, opening_hours):
-                    continue
-                
-                # Mark slots as used
-                for slot in consecutive_slots:
-                    slot['is_available'] = False
-                    slot['activity'] = activity
-                
-                return {
-                    'start_time': start_time,
-                    'end_time': end_time
-                }
+        offset = 0
+        for item_type, items, prefix in pools:
+            scores = preference_scores[offset:offset + len(items)]
+            offset += len(items)
+            if not items:
+                continue
+            model_scores = engine.model_item_scores(
+                item_type, items, filters=engine._create_destination_filters(destination, prefix=prefix)
+            )
+            if model_scores is not None:
+                scores = np.where(
+                    np.isnan(model_scores),
+                    scores,
+                    (1 - self.MODEL_SCORE_WEIGHT) * scores + self.MODEL_SCORE_WEIGHT * model_scores
+                )
+            self.personalization_scores.update(zip((activity_key(item) for item in items), scores.tolist()))
+
+    def _get_skeleton(self, destination, duration_days, theme):
+        """The destination's itinerary skeleton, built and cached on a miss"""
+        # The pool is sized from max_daily_items, so constraints with other limits get their own skeleton
+        max_daily_items = self.constraints['max_daily_items']
+        skeleton = ItinerarySkeleton.load(destination, duration_days, theme, max_daily_items)
+        if skeleton is None:
+            skeleton = self._build_skeleton(destination, duration_days)
+            skeleton.save(destination, duration_days, theme, max_daily_items)
+        return skeleton
+
+    def _build_skeleton(self, destination, duration_days):
+        """
+        Build the user-independent parts of a box: the destination's best
+        candidates from the precomputed fallback lists (topped up from the
+        catalog when they run short), their clusters, travel matrix and
+        opening-hour masks
+        """
+        pool_size = duration_days * self.constraints['max_daily_items'] * self.SKELETON_POOL_PER_SLOT
+        engine = self.recommendation_engine
+        places = self._skeleton_candidates(
+            'place',
+            Place.objects.filter(is_available=True, is_deleted=False).select_related('category', 'country', 'city', 'region'),
+            engine._create_destination_filters(destination),
+            pool_size
+        )
+        experiences = self._skeleton_candidates(
+            'experience',
+            Experience.objects.filter(is_available=True, is_deleted=False).select_related('category', 'place'),
+            engine._create_destination_filters(destination, prefix='place__'),
+            pool_size // 2
+        )
         
-        return None
+        objects = list(places) + list(experiences)
+        clusters = [
+            {
+                'center': (cluster['center'].y, cluster['center'].x) if cluster['center'] else None,
+                'keys': [activity_key(activity) for activity in cluster['activities']]
+            }
+            for cluster in self._cluster_activities_by_location_ml([{'object': activity} for activity in objects])
+        ]
+        opening_masks = {}
+        for activity in objects:
+            opening_window = self._opening_window(activity)
+            opening_masks[activity_key(activity)] = DaySchedule.window(*opening_window) if opening_window else None
+        
+        return ItinerarySkeleton(
+            places=list(places),
+            experiences=list(experiences),
+            clusters=clusters,
+            # Same scope as _travel_scope gives boxes for this destination
+            travel=self.travel_times.matrix(objects, scope=ItinerarySkeleton.scope(destination)),
+            opening_masks=opening_masks
+        )
 
-    def _is_within_opening_hours(self, start_time, end_time, opening_hours):
-        """Check if a time range is within opening hours"""
-        if not opening_hours:
-            return True
+    @staticmethod
+    def _skeleton_candidates(item_type, queryset, filters, limit):
+        """
+        The destination's best ``limit`` items: the precomputed list first,
+        then the best rated of the rest of the catalog, since the lists hold
+        at most ``FallbackLists.LIST_SIZE`` items
+        """
+        items = RecommendationEngine.cold_start(item_type, queryset, filters=filters, limit=limit)
+        if len(items) < limit:
+            items += list(
+                queryset.filter(**filters)
+                .exclude(id__in=[item.id for item in items])
+                .order_by('-rating', '-created_at')[:limit - len(items)]
+            )
+        return items
+
+    def _travel_scope(self, box):
+        """Cache scope of travel matrices: the most specific destination of the box"""
+        if box.city_id:
+            return f"city-{box.city_id}"
+        # Box has no region column; region destinations are recorded in metadata
+        region_id = box.metadata.get('region_id')
+        if region_id:
+            return f"region-{region_id}"
+        return f"country-{box.country_id}"
+
+    def _sequence_day_items(self, items, travel):
+        """
+        Reorder a day's items along a short route and retime them so each
+        starts once the previous one has ended and the travel time between
+        them has passed. Items that are only reachable with a hop longer than
+        ``max_travel_time_minutes``, or no longer fit their opening hours or
+        the day, are dropped.
+        """
+        if len(items) < 2:
+            return items
+        
+        # The route starts from the item the scheduler placed earliest
+        items = sorted(items, key=lambda item: item.start_time)
+        keys = [activity_key(item.place or item.experience) for item in items]
+        minutes = travel.submatrix(keys)
+        route, dropped = self.travel_times.order_route(
+            minutes,
+            max_hop_minutes=self.constraints['max_travel_time_minutes']
+        )
+        
+        day_end = self.constraints['opening_hours'][1] * 60
+        sequenced = []
+        previous, current = None, items[0].start_time.hour * 60 + items[0].start_time.minute
+        for stop in route:
+            item = items[stop]
+            activity = item.place or item.experience
+            if previous is not None:
+                # Round travel up to 5 minutes so times stay readable
+                current += int(np.ceil(minutes[previous, stop] / 5) * 5)
             
-        # Parse opening hours
-        try:
-            open_time = time(opening_hours[0], 0)  # e.g., 9:00
-            close_time = time(opening_hours[1], 0)  # e.g., 17:00
+            start, end = current, day_end
+            window = self._opening_window(activity)
+            if window:
+                start, end = max(start, window[0]), min(end, window[1])
+            if start + item.duration_minutes > end:
+                dropped.append(stop)
+                continue
             
-            return open_time <= start_time and end_time <= close_time
-        except (IndexError, TypeError):
-            # If opening hours format is invalid, assume always open
-            return True
+            item.start_time = time(start // 60, start % 60)
+            finish = start + item.duration_minutes
+            item.end_time = time(finish // 60, finish % 60)
+            item.order = len(sequenced) + 1
+            sequenced.append(item)
+            previous, current = stop, finish
+        
+        if dropped:
+            logger.debug(f"Dropped {len(dropped)} unreachable items from day {items[0].itinerary_day.day_number}")
+        return sequenced
+
+    def _opening_mask(self, activity):
+        """Slot mask of an activity's opening hours, from the skeleton when it has one; None if unknown"""
+        if self.skeleton is not None:
+            key = activity_key(activity)
+            if key in self.skeleton.opening_masks:
+                return self.skeleton.opening_masks[key]
+        opening_window = self._opening_window(activity)
+        return DaySchedule.window(*opening_window) if opening_window else None
+
+    def _opening_window(self, activity):
+        """Opening hours of an activity as (open, close) minutes of the day, or None if unknown"""
+        opening_hours = self._get_activity_opening_hours(activity)
+        try:
+            return int(opening_hours[0]) * 60, int(opening_hours[1]) * 60
+        except (IndexError, KeyError, TypeError, ValueError):
+            return None
+
+    def _find_suitable_time_slot(self, activity, time_slots, preferred_times=None):
+        """
+        Book the earliest free window for an activity that lies within its
+        opening hours and, if given, within the preferred times of day
+        """
+        allowed = self._opening_mask(activity)
+        if preferred_times:
+            preferred = self._time_of_day_mask(preferred_times)
+            allowed = preferred if allowed is None else allowed & preferred
+        
+        booked = time_slots.book(self._get_activity_duration(activity), allowed)
+        if booked is None:
+            return None
+        
+        return {
+            'start_time': DaySchedule.to_time(booked[0]),
+            'end_time': DaySchedule.to_time(booked[1])
+        }
 
     def _create_itinerary_item(self, day, activity, start_time, end_time, order, cost):
         """Create an itinerary item for an activity"""
@@ -881,7 +1288,7 @@ class BoxGenerator:
         activity_type = getattr(activity, 'metadata', {}).get('activity_type', 'cultural')
         type_need = max(0, target_counts.get(activity_type, 0) - current_counts.get(activity_type, 0))
         
-        personalization_score = self.recommendation_engine.calculate_personalization_score(activity)
+        personalization_score = self._personalization_score(activity)
         rating = getattr(activity, 'rating', 3.0)  # Default to average if no rating
         
         # Calculate weather compatibility
@@ -929,15 +1336,9 @@ class BoxGenerator:
             
         return "\n".join(notes) if notes else None
 
-    def _calculate_total_price(self, itinerary_days):
-        """Calculate total price of all itinerary items"""
-        total = 0.0
-        
-        for day in itinerary_days:
-            for item in day.items.all():
-                if item.estimated_cost:
-                    total += item.estimated_cost
-                    
+    def _calculate_total_price(self, itinerary_items):
+        """Calculate total price of the in-memory itinerary items"""
+        total = sum(float(item.estimated_cost) for item in itinerary_items if item.estimated_cost)
         return round(total, 2)
 
     def optimize_existing_box(self, box):
@@ -954,11 +1355,13 @@ class BoxGenerator:
                 box.itinerary_days.all().delete()
                 
                 # Regenerate with current recommendations
-                destination = box.city or box.region or box.country
+                region_id = box.metadata.get('region_id')
+                region = Region.objects.filter(pk=region_id).first() if region_id else None
+                destination = box.city or region or box.country
                 return self.generate_box(
                     destination=destination,
                     duration_days=box.duration_days,
-                    budget=box.total_price,
+                    budget=float(box.total_price) if box.total_price else None,
                     start_date=box.start_date,
                     theme=box.metadata.get('theme')
                 )
@@ -979,50 +1382,122 @@ class BoxGenerator:
             Box: The new modified box
         """
         try:
-            with transaction.atomic():
-                # Create new box with modified properties
-                new_box = Box.objects.create(
-                    name=f"{original_box.name} (Modified)",
-                    duration_days=modifications.get('duration_days', original_box.duration_days),
-                    start_date=modifications.get('start_date', original_box.start_date),
-                    end_date=modifications.get('end_date', original_box.end_date),
-                    city=original_box.city,
-                    region=original_box.region,
-                    country=original_box.country,
-                    is_customizable=True,
-                    owner=self.user,
-                    metadata={
-                        **original_box.metadata,
-                        'original_box_id': original_box.id,
-                        'modifications': modifications
-                    }
-                )
-                
-                # Copy itinerary with adjustments
-                for old_day in original_box.itinerary_days.order_by('day_number'):
-                    new_day = BoxItineraryDay.objects.create(
-                        box=new_box,
-                        day_number=old_day.day_number,
-                        date=(new_box.start_date + timedelta(days=old_day.day_number - 1)
-                            if new_box.start_date else None
-                    ))
-                    
-                    for old_item in old_day.items.order_by('order'):
-                        BoxItineraryItem.objects.create(
-                            itinerary_day=new_day,
-                            place=old_item.place,
-                            experience=old_item.experience,
-                            order=old_item.order,
-                            start_time=old_item.start_time,
-                            end_time=old_item.end_time,
-                            duration_minutes=old_item.duration_minutes,
-                            estimated_cost=old_item.estimated_cost,
-                            notes=old_item.notes,
-                            is_optional=old_item.is_optional
-                        )
-                
-                return new_box
-                
+            return self.clone_box_for_users(
+                original_box,
+                [self.user],
+                modifications,
+                name=f"{original_box.name} (Modified)"
+            )[0]
         except Exception as e:
             logger.error(f"Error duplicating box {original_box.id}: {str(e)}")
             raise RuntimeError("Could not duplicate box")
+
+    @classmethod
+    def clone_box_for_users(cls, template_box, users, modifications=None, name=None):
+        """
+        Copy a box with its whole itinerary once per user, e.g. for
+        campaign-driven personalised boxes.
+        
+        The itinerary is read as ``values()`` rows, so no places, experiences
+        or other related objects are loaded, and every copy is written with
+        one bulk INSERT each for boxes, days and items. The number of queries
+        doesn't depend on the itinerary length or the number of users.
+        
+        A shorter ``duration_days`` drops the days past it, with their items;
+        a longer one adds empty days to fill in.
+        
+        Args:
+            template_box (Box): The box to copy
+            users (list): One copy is made for each user
+            modifications (dict): Changes applied to every copy (duration, dates, etc.)
+            name (str): Name of the copies, the template's by default
+            
+        Returns:
+            list: The new boxes, aligned with ``users``
+        """
+        modifications = modifications or {}
+        duration_days = modifications.get('duration_days', template_box.duration_days)
+        start_date = modifications.get('start_date', template_box.start_date)
+        end_date = modifications.get('end_date', template_box.end_date)
+        if 'end_date' not in modifications and start_date and (
+            'duration_days' in modifications or 'start_date' in modifications
+        ):
+            end_date = start_date + timedelta(days=duration_days - 1)
+        metadata = {
+            **template_box.metadata,
+            'original_box_id': str(template_box.id),
+            'modifications': json.loads(json.dumps(modifications, cls=DjangoJSONEncoder))
+        }
+        
+        days = list(
+            BoxItineraryDay.objects.filter(box=template_box, is_deleted=False, day_number__lte=duration_days)
+            .order_by('day_number')
+            .values('id', 'day_number', 'description', 'estimated_hours')
+        )
+        missing_day_numbers = sorted(set(range(1, duration_days + 1)) - {day['day_number'] for day in days})
+        items = list(
+            BoxItineraryItem.objects.filter(itinerary_day__box=template_box, is_deleted=False)
+            .order_by('itinerary_day__day_number', 'order')
+            .values(
+                'itinerary_day_id', 'place_id', 'experience_id', 'order', 'start_time', 'end_time',
+                'duration_minutes', 'estimated_cost', 'notes', 'is_optional'
+            )
+        )
+        
+        boxes, new_days, new_items = [], [], []
+        for user in users:
+            box = Box(
+                category_id=template_box.category_id,
+                name=name or template_box.name,
+                description=template_box.description,
+                total_price=template_box.total_price,
+                currency=template_box.currency,
+                country_id=template_box.country_id,
+                city_id=template_box.city_id,
+                duration_days=duration_days,
+                duration_hours=template_box.duration_hours,
+                start_date=start_date,
+                end_date=end_date,
+                is_customizable=True,
+                max_group_size=template_box.max_group_size,
+                tags=list(template_box.tags or []),
+                # Box has no owner column; the user is recorded with the copy
+                metadata={**metadata, 'owner_id': str(user.pk)}
+            )
+            boxes.append(box)
+            
+            # Primary keys are generated client-side, so rows can reference
+            # each other before anything is inserted
+            day_ids = {}
+            for day in days:
+                new_day = BoxItineraryDay(
+                    box=box,
+                    day_number=day['day_number'],
+                    date=start_date + timedelta(days=day['day_number'] - 1) if start_date else None,
+                    description=day['description'],
+                    estimated_hours=day['estimated_hours']
+                )
+                day_ids[day['id']] = new_day.id
+                new_days.append(new_day)
+            new_days.extend(
+                BoxItineraryDay(
+                    box=box,
+                    day_number=day_number,
+                    date=start_date + timedelta(days=day_number - 1) if start_date else None
+                )
+                for day_number in missing_day_numbers
+            )
+            
+            # Items of deleted or dropped days have no copy to go to
+            new_items.extend(
+                BoxItineraryItem(**{**item, 'itinerary_day_id': day_ids[item['itinerary_day_id']]})
+                for item in items
+                if item['itinerary_day_id'] in day_ids
+            )
+        
+        with transaction.atomic():
+            Box.objects.bulk_create(boxes, batch_size=cls.BULK_BATCH_SIZE)
+            BoxItineraryDay.objects.bulk_create(new_days, batch_size=cls.BULK_BATCH_SIZE)
+            BoxItineraryItem.objects.bulk_create(new_items, batch_size=cls.BULK_BATCH_SIZE)
+        
+        return boxes
@@ -0,0 +1,89 @@
+import logging
+
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088  # Mean Earth radius
+
+
+def to_radians(locations):
+    """
+    Convert geometry points (x=longitude, y=latitude, SRID 4326) to an
+    (n, 2) array of [latitude, longitude] in radians, the layout sklearn's
+    haversine metric expects.
+    """
+    coordinates = np.fromiter(
+        (value for location in locations for value in (location.y, location.x)),
+        dtype=np.float64,
+        count=2 * len(locations)
+    ).reshape(-1, 2)
+    return np.radians(coordinates)
+
+
+def haversine_km(origin, destinations):
+    """
+    Great-circle distances in km from one radian [lat, lng] pair, or from
+    each row of an (n, 2) array, to every row of ``destinations``.
+
+    Returns:
+        numpy.ndarray: shape (len(destinations),) for a single origin,
+        otherwise (len(origin), len(destinations))
+    """
+    origin = np.asarray(origin, dtype=np.float64)
+    destinations = np.asarray(destinations, dtype=np.float64)
+    single = origin.ndim == 1
+    origin = np.atleast_2d(origin)
+
+    lat1, lng1 = origin[:, 0, None], origin[:, 1, None]
+    lat2, lng2 = destinations[None, :, 0], destinations[None, :, 1]
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return distances[0] if single else distances
+
+
+def cluster_labels(coordinates, max_distance_km, min_samples=1):
+    """
+    DBSCAN over radian coordinates with a haversine ball tree.
+
+    ``max_distance_km`` is a real great-circle distance; it is turned into
+    the angle the haversine metric works in. With the default
+    ``min_samples=1`` every point belongs to a cluster and clusters are the
+    groups of points chained together by hops of at most ``max_distance_km``.
+
+    Returns:
+        numpy.ndarray: int cluster label per row (-1 for noise when min_samples > 1)
+    """
+    if len(coordinates) == 0:
+        return np.empty(0, dtype=np.int64)
+    if len(coordinates) == 1:
+        return np.zeros(1, dtype=np.int64)
+    return DBSCAN(
+        eps=max_distance_km / EARTH_RADIUS_KM,
+        min_samples=min_samples,
+        metric='haversine',
+        algorithm='ball_tree'
+    ).fit(coordinates).labels_
+
+
+def spherical_centroids(coordinates, labels):
+    """
+    Centroid of every cluster as the normalised mean of its points' unit
+    vectors, so clusters spanning the antimeridian come out right.
+
+    Returns:
+        tuple: (sorted unique labels, (n_labels, 2) array of [latitude, longitude] in degrees)
+    """
+    unique_labels, positions = np.unique(labels, return_inverse=True)
+    lat, lng = coordinates[:, 0], coordinates[:, 1]
+    vectors = np.column_stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)))
+
+    sums = np.zeros((len(unique_labels), 3), dtype=np.float64)
+    np.add.at(sums, positions, vectors)
+    x, y, z = sums[:, 0], sums[:, 1], sums[:, 2]
+    centroids = np.column_stack((np.arctan2(z, np.hypot(x, y)), np.arctan2(y, x)))
+    return unique_labels, np.degrees(centroids)
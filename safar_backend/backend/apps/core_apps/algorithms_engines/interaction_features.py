@@ -0,0 +1,378 @@
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from django.utils import timezone
+
+from apps.authentication.models import UserInteraction
+
+logger = logging.getLogger(__name__)
+
+INTERACTION_WEIGHTS = {
+    'booking_complete': 1.0,
+    'booking_start': 0.7,
+    'wishlist_add': 0.6,
+    'rating_given': 0.8,
+    'review_added': 0.5,
+    'view_place': 0.3,
+    'view_experience': 0.3,
+    'recommendation_click': 0.4
+}
+
+TEMPORAL_DECAY_RATE = 0.1  # 10% reduction per month
+DECAY_FLOOR = 0.1
+
+# Interaction types are stored as int8 codes into this tuple
+INTERACTION_TYPES = tuple(INTERACTION_WEIGHTS)
+TYPE_CODES = {name: code for code, name in enumerate(INTERACTION_TYPES)}
+TYPE_WEIGHTS = np.array([INTERACTION_WEIGHTS[name] for name in INTERACTION_TYPES], dtype=np.float32)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+MICROSECONDS_PER_DAY = 86400 * 10 ** 6
+
+
+def time_decay(days_old):
+    """Vectorised temporal decay, floored at ``DECAY_FLOOR``"""
+    return np.maximum(DECAY_FLOOR, 1 - (np.asarray(days_old) / 365) * TEMPORAL_DECAY_RATE)
+
+
+def to_epoch(moment=None):
+    """Exact Unix time in microseconds of an aware datetime (default now)"""
+    return ((moment or timezone.now()) - EPOCH) // MICROSECOND
+
+
+def from_epoch(epoch):
+    return EPOCH + timedelta(microseconds=int(epoch))
+
+
+class InteractionColumns:
+    """
+    Interactions as aligned NumPy columns.
+
+    ``users`` and ``items`` are id vocabularies (str); ``user_codes`` and
+    ``item_codes`` index into them, ``type_codes`` index into
+    ``INTERACTION_TYPES`` and ``epochs`` hold ``created_at`` as Unix microseconds.
+    Weights and decay are computed over whole columns, so every scoring stage
+    shares one implementation and none of them loops over rows.
+    """
+
+    FIELDS = ('user_id', 'object_id', 'interaction_type', 'created_at')
+
+    def __init__(self, users, items, user_codes, item_codes, type_codes, epochs):
+        self.users = users
+        self.items = items
+        self.user_codes = user_codes
+        self.item_codes = item_codes
+        self.type_codes = type_codes
+        self.epochs = epochs
+
+    def __len__(self):
+        return len(self.epochs)
+
+    @classmethod
+    def from_queryset(cls, queryset, chunk_size=5000, base=None):
+        """
+        Materialise a ``UserInteraction`` queryset, skipping unweighted types.
+
+        Rows are streamed from a server-side cursor and converted chunk by
+        chunk. With ``base`` the rows are appended to an existing set of
+        columns, extending its vocabularies.
+        """
+        rows = queryset.filter(
+            interaction_type__in=INTERACTION_TYPES
+        ).values_list(*cls.FIELDS).iterator(chunk_size=chunk_size)
+
+        builder = _ColumnBuilder(base)
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                builder.append(chunk)
+                chunk = []
+        if chunk:
+            builder.append(chunk)
+        return builder.build()
+
+    def weights(self, now=None):
+        """Interaction weight times temporal decay as of ``now``, one float32 per row"""
+        days_old = (to_epoch(now) - self.epochs) // MICROSECONDS_PER_DAY
+        return (TYPE_WEIGHTS[self.type_codes] * time_decay(days_old)).astype(np.float32)
+
+    def object_ids(self):
+        """Object id (str) of every row"""
+        return self.items[self.item_codes].tolist()
+
+    def select(self, mask):
+        """Rows where ``mask`` is true, sharing the vocabularies"""
+        return InteractionColumns(
+            self.users, self.items,
+            self.user_codes[mask], self.item_codes[mask], self.type_codes[mask], self.epochs[mask]
+        )
+
+    def for_items(self, item_ids):
+        """Rows on the given items"""
+        keep = np.isin(self.items, np.array([str(item_id) for item_id in item_ids], dtype=str))
+        return self.select(keep[self.item_codes])
+
+    def before(self, moment):
+        """Rows created strictly before ``moment``"""
+        return self.select(self.epochs < to_epoch(moment))
+
+    @property
+    def watermark(self):
+        """The newest ``created_at`` as Unix microseconds, or None when empty"""
+        return int(self.epochs.max()) if len(self) else None
+
+    def to_matrix(self, now=None):
+        """
+        Sum the weighted rows into a users x items CSR matrix.
+
+        Returns:
+            tuple: (csr_matrix, user_ids, item_ids) where the id lists give the
+            row and column order of the matrix; ids without rows are dropped
+        """
+        user_codes, user_rows = np.unique(self.user_codes, return_inverse=True)
+        item_codes, item_cols = np.unique(self.item_codes, return_inverse=True)
+        shape = (len(user_codes), len(item_codes))
+        if not len(self):
+            return sparse.csr_matrix(shape, dtype=np.float32), [], []
+
+        # COO -> CSR sums duplicate (user, item) pairs
+        matrix = sparse.coo_matrix(
+            (self.weights(now), (user_rows.astype(np.int32), item_cols.astype(np.int32))),
+            shape=shape
+        ).tocsr()
+        matrix.sum_duplicates()
+        return matrix, self.users[user_codes].tolist(), self.items[item_codes].tolist()
+
+    def save(self, path, **metadata):
+        """Write the columns atomically as an uncompressed .npz"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    users=self.users,
+                    items=self.items,
+                    user_codes=self.user_codes,
+                    item_codes=self.item_codes,
+                    type_codes=self.type_codes,
+                    epochs=self.epochs,
+                    interaction_types=np.array(INTERACTION_TYPES),
+                    **{key: np.asarray(value) for key, value in metadata.items()}
+                )
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read columns written by ``save``.
+
+        Returns:
+            tuple: (InteractionColumns, metadata dict)
+        """
+        with np.load(path, allow_pickle=False) as data:
+            if tuple(data['interaction_types'].tolist()) != INTERACTION_TYPES:
+                raise ValueError("Interaction types changed since the columns were saved")
+            columns = cls(*(data[name] for name in (
+                'users', 'items', 'user_codes', 'item_codes', 'type_codes', 'epochs'
+            )))
+            metadata = {
+                key: data[key].item() if data[key].ndim == 0 else data[key]
+                for key in data.files
+                if key not in ('users', 'items', 'user_codes', 'item_codes', 'type_codes',
+                               'epochs', 'interaction_types')
+            }
+        return columns, metadata
+
+
+class _ColumnBuilder:
+    """Accumulates interaction rows chunk by chunk into ``InteractionColumns``"""
+
+    def __init__(self, base=None):
+        self.user_positions = {}
+        self.item_positions = {}
+        self.chunks = {'user_codes': [], 'item_codes': [], 'type_codes': [], 'epochs': []}
+        if base is not None:
+            self.user_positions = {user_id: code for code, user_id in enumerate(base.users.tolist())}
+            self.item_positions = {item_id: code for code, item_id in enumerate(base.items.tolist())}
+            for name in self.chunks:
+                self.chunks[name].append(getattr(base, name))
+
+    def append(self, rows):
+        count = len(rows)
+        user_positions, item_positions = self.user_positions, self.item_positions
+        self.chunks['user_codes'].append(np.fromiter(
+            (user_positions.setdefault(str(r[0]), len(user_positions)) for r in rows),
+            dtype=np.int32, count=count
+        ))
+        self.chunks['item_codes'].append(np.fromiter(
+            (item_positions.setdefault(str(r[1]), len(item_positions)) for r in rows),
+            dtype=np.int32, count=count
+        ))
+        self.chunks['type_codes'].append(np.fromiter(
+            (TYPE_CODES[r[2]] for r in rows), dtype=np.int8, count=count
+        ))
+        self.chunks['epochs'].append(np.fromiter(
+            (to_epoch(r[3]) for r in rows), dtype=np.int64, count=count
+        ))
+
+    def build(self):
+        dtypes = {'user_codes': np.int32, 'item_codes': np.int32, 'type_codes': np.int8, 'epochs': np.int64}
+        columns = {
+            name: np.concatenate(chunks) if chunks else np.empty(0, dtype=dtypes[name])
+            for name, chunks in self.chunks.items()
+        }
+        return InteractionColumns(
+            np.array(list(self.user_positions), dtype=str),
+            np.array(list(self.item_positions), dtype=str),
+            **columns
+        )
+
+
+class InteractionFeatureCache:
+    """
+    On-disk cache of the interaction columns of one item type.
+
+    The ORM materialisation is paid once per refresh: later refreshes only
+    fetch rows newer than the cached watermark and append them. Rows can
+    commit after rows with a later ``created_at``, so each refresh re-reads
+    ``LATE_COMMIT_MARGIN`` before the watermark and skips the rows of that
+    window it already holds, by id. A full rebuild, which also drops deleted
+    interactions, happens once the cache is older than ``FULL_REBUILD_AGE``
+    or when asked for.
+
+    Layout::
+
+        <RECOMMENDATION_MODEL_DIR>/interactions/<item_type>.npz
+    """
+
+    FULL_REBUILD_AGE = 60 * 60 * 24  # 1 day
+    LATE_COMMIT_MARGIN = 60 * 10  # Seconds a row may commit after its created_at
+    CHUNK_SIZE = 5000
+
+    def __init__(self, item_type, root=None):
+        self.item_type = item_type
+        root = Path(root or getattr(settings, 'RECOMMENDATION_MODEL_DIR', 'ml_models'))
+        self.path = root / 'interactions' / f'{item_type}.npz'
+
+    def load(self):
+        """
+        Return the cached columns and their metadata, or (None, {}) if there is
+        no usable cache.
+        """
+        if not self.path.exists():
+            return None, {}
+        try:
+            return InteractionColumns.load(self.path)
+        except Exception as e:
+            logger.error(f"Error loading interaction cache {self.path}: {str(e)}", exc_info=True)
+            return None, {}
+
+    def read(self):
+        """
+        Return the cached columns without refreshing them.
+
+        For readers running alongside the single refresher: when there is no
+        cache yet the interactions are materialised in memory, never written.
+        """
+        columns, _ = self.load()
+        if columns is None:
+            columns = InteractionColumns.from_queryset(
+                UserInteraction.objects.filter(content_type__model=self.item_type), chunk_size=self.CHUNK_SIZE
+            )
+        return columns
+
+    def refresh(self, full=False):
+        """
+        Bring the cache up to date with the interaction table and return the columns.
+        """
+        now = timezone.now().timestamp()
+        columns, metadata = (None, {}) if full else self.load()
+        if columns is not None and now - metadata.get('built_at', 0) > self.FULL_REBUILD_AGE:
+            columns = None
+
+        queryset = UserInteraction.objects.filter(content_type__model=self.item_type)
+        recent = {}
+        if columns is None:
+            built_at = now
+        else:
+            built_at = metadata['built_at']
+            watermark = metadata.get('watermark')
+            if watermark is not None:
+                queryset = queryset.filter(created_at__gt=from_epoch(watermark - self.LATE_COMMIT_MARGIN * 10 ** 6))
+                recent = dict(zip(
+                    metadata.get('recent_ids', np.empty(0, dtype=str)).tolist(),
+                    metadata.get('recent_epochs', np.empty(0, dtype=np.int64)).tolist()
+                ))
+
+        columns, recent = self._append(queryset, columns, recent)
+
+        watermark = columns.watermark
+        extra = {}
+        if watermark is not None:
+            extra = {
+                'watermark': watermark,
+                'recent_ids': np.array(list(recent), dtype=str),
+                'recent_epochs': np.array(list(recent.values()), dtype=np.int64),
+            }
+        try:
+            columns.save(self.path, built_at=built_at, **extra)
+        except Exception as e:
+            logger.error(f"Error writing interaction cache {self.path}: {str(e)}", exc_info=True)
+        return columns
+
+    def _append(self, queryset, columns, recent):
+        """
+        Append the queryset's rows to ``columns``, skipping the ids in ``recent``.
+
+        Args:
+            recent (dict): {id: epoch} of the cached rows within
+                ``LATE_COMMIT_MARGIN`` of the watermark
+
+        Returns:
+            tuple: (InteractionColumns, recent) with ``recent`` brought up to
+            the new watermark
+        """
+        margin = self.LATE_COMMIT_MARGIN * 10 ** 6
+        skip = set(recent)
+        newest = columns.watermark if columns is not None else None
+
+        rows = queryset.filter(
+            interaction_type__in=INTERACTION_TYPES
+        ).values_list('id', *InteractionColumns.FIELDS).iterator(chunk_size=self.CHUNK_SIZE)
+
+        builder = _ColumnBuilder(columns)
+        chunk = []
+        for row in rows:
+            row_id = str(row[0])
+            if row_id in skip:
+                continue
+            epoch = to_epoch(row[4])
+            recent[row_id] = epoch
+            if newest is None or epoch > newest:
+                newest = epoch
+            chunk.append(row[1:])
+            if len(chunk) >= self.CHUNK_SIZE:
+                builder.append(chunk)
+                chunk = []
+                # The newest epoch only grows, so pruned ids never re-enter the window
+                recent = {row_id: epoch for row_id, epoch in recent.items() if epoch > newest - margin}
+        if chunk:
+            builder.append(chunk)
+
+        if newest is not None:
+            recent = {row_id: epoch for row_id, epoch in recent.items() if epoch > newest - margin}
+        return builder.build(), recent
@@ -0,0 +1,238 @@
+import logging
+from datetime import datetime
+
+import numpy as np
+from sklearn.cluster import kmeans_plusplus
+
+from apps.core_apps.algorithms_engines.item_embeddings import ItemEmbeddingStore
+from apps.core_apps.algorithms_engines.model_store import ModelStore
+
+logger = logging.getLogger(__name__)
+
+
+class ItemClusters:
+    """
+    Read side of a published item clustering.
+
+    Items are stored sorted by cluster with per-cluster offsets, so listing
+    the members of a cluster is a slice rather than a scan of the catalog.
+    """
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.item_ids = artifact['item_ids']
+        self.assignments = artifact['assignments']
+        self.order = artifact['order']
+        self.offsets = artifact['offsets']
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def cluster_of(self, item_id):
+        """Cluster of an item, or None if it is not clustered"""
+        position = self.artifact.item_index.get(str(item_id))
+        return None if position is None else int(self.assignments[position])
+
+    def items_in(self, cluster, limit=None):
+        """Item ids (str) of a cluster"""
+        start, end = int(self.offsets[cluster]), int(self.offsets[cluster + 1])
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.item_ids[self.order[start:end]].tolist()
+
+    def same_cluster(self, item_id, limit=None):
+        """Item ids (str) sharing ``item_id``'s cluster, excluding the item itself"""
+        cluster = self.cluster_of(item_id)
+        if cluster is None:
+            return []
+        item_id = str(item_id)
+        members = [member for member in self.items_in(cluster, None if limit is None else limit + 1)
+                   if member != item_id]
+        return members if limit is None else members[:limit]
+
+    def top_clusters(self, item_ids, limit=3):
+        """The clusters most of ``item_ids`` fall into, most frequent first"""
+        item_index = self.artifact.item_index
+        positions = [item_index[str(item_id)] for item_id in item_ids if str(item_id) in item_index]
+        if not positions:
+            return []
+        counts = np.bincount(self.assignments[positions], minlength=len(self.offsets) - 1)
+        clusters = np.flatnonzero(counts)
+        return clusters[np.argsort(-counts[clusters], kind='stable')][:limit].tolist()
+
+
+class ItemClusterer:
+    """
+    Mini-batch k-means over the stored item content embeddings.
+
+    Centroids are updated batch by batch with per-centroid learning rates
+    (Sculley, "Web-scale k-means clustering"), so a full fit streams the
+    embedding table in fixed-size chunks and never holds the catalog in
+    memory, and ``partial_fit`` folds newly arrived items into an existing
+    clustering without refitting. Results are published to the model store
+    under ``clusters/<item_type>``.
+    """
+
+    NAMESPACE = 'clusters/{item_type}'
+    MAX_CLUSTERS = 64
+    ITEMS_PER_CLUSTER = 50
+    BATCH_SIZE = 2048
+    EPOCHS = 2
+    INIT_SAMPLE = 10000
+
+    def __init__(self, centroids, counts=None):
+        self.centroids = np.asarray(centroids, dtype=np.float32).copy()
+        self.counts = (
+            np.zeros(len(self.centroids), dtype=np.float64) if counts is None
+            else np.asarray(counts, dtype=np.float64).copy()
+        )
+
+    @classmethod
+    def store(cls, item_type):
+        return ModelStore(cls.NAMESPACE.format(item_type=item_type))
+
+    @classmethod
+    def load(cls, item_type):
+        """
+        Return the published clustering for an item type.
+
+        Returns:
+            ItemClusters | None
+        """
+        try:
+            artifact = cls.store(item_type).load()
+        except Exception as e:
+            logger.error(f"Error loading {item_type} clusters: {str(e)}", exc_info=True)
+            return None
+        if artifact is None:
+            return None
+        return artifact.memoize('clusters', ItemClusters)
+
+    def predict(self, vectors):
+        """Nearest centroid of every row"""
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, and ||x||^2 doesn't change the argmin
+        distances = np.sum(self.centroids ** 2, axis=1) - 2 * (vectors @ self.centroids.T)
+        return np.argmin(distances, axis=1).astype(np.int32)
+
+    def partial_fit(self, vectors):
+        """Move the centroids towards one mini-batch; returns the batch's assignments"""
+        for start in range(0, len(vectors), self.BATCH_SIZE):
+            batch = vectors[start:start + self.BATCH_SIZE]
+            labels = self.predict(batch)
+            batch_counts = np.bincount(labels, minlength=len(self.centroids))
+            sums = np.zeros_like(self.centroids, dtype=np.float64)
+            np.add.at(sums, labels, batch)
+
+            touched = batch_counts > 0
+            new_counts = self.counts + batch_counts
+            # Each centroid is the running mean of every point ever assigned to it
+            self.centroids[touched] = (
+                (self.centroids[touched] * self.counts[touched, None] + sums[touched]) / new_counts[touched, None]
+            ).astype(np.float32)
+            self.counts = new_counts
+        return self.predict(vectors)
+
+    @classmethod
+    def fit(cls, item_type, seed=42):
+        """
+        Fit a fresh clustering over all stored embeddings and publish it.
+
+        Returns:
+            str | None: The published version, or None if there are too few items
+        """
+        embeddings = ItemEmbeddingStore(item_type)
+
+        # Item ids are random UUIDs, so the first chunks in id order are a uniform sample
+        sample = []
+        sampled = 0
+        for _, vectors, _ in embeddings.iter_vectors(chunk_size=cls.BATCH_SIZE):
+            sample.append(vectors)
+            sampled += len(vectors)
+            if sampled >= cls.INIT_SAMPLE:
+                break
+        if not sample:
+            return None
+        sample = np.vstack(sample)
+
+        n_clusters = min(cls.MAX_CLUSTERS, max(2, len(sample) // cls.ITEMS_PER_CLUSTER))
+        if len(sample) < n_clusters * 2:
+            logger.info(f"Not enough {item_type} embeddings to cluster ({len(sample)})")
+            return None
+
+        centroids, _ = kmeans_plusplus(sample, n_clusters, random_state=seed)
+        clusterer = cls(centroids)
+        for _ in range(cls.EPOCHS):
+            for _, vectors, _ in embeddings.iter_vectors(chunk_size=cls.BATCH_SIZE):
+                clusterer.partial_fit(vectors)
+
+        # Final assignment pass with the converged centroids
+        item_ids, assignments, watermark = [], [], None
+        for ids, vectors, newest in embeddings.iter_vectors(chunk_size=cls.BATCH_SIZE):
+            item_ids.extend(ids)
+            assignments.append(clusterer.predict(vectors))
+            watermark = newest if watermark is None else max(watermark, newest)
+
+        return clusterer.publish(item_type, np.array(item_ids), np.concatenate(assignments), watermark)
+
+    @classmethod
+    def update(cls, item_type):
+        """
+        Fold embeddings added or changed since the last publish into the
+        current clustering. Other items keep their cluster until the next
+        full ``fit``.
+
+        Returns:
+            str | None: The published version, or None if nothing changed
+        """
+        current = cls.store(item_type).load()
+        if current is None:
+            return cls.fit(item_type)
+
+        watermark = current.metadata.get('watermark')
+        since = datetime.fromisoformat(watermark) if watermark else None
+        clusterer = cls(current['centroids'], current['counts'])
+
+        changed_ids, changed_assignments = [], []
+        for ids, vectors, newest in ItemEmbeddingStore(item_type).iter_vectors(since=since, chunk_size=cls.BATCH_SIZE):
+            changed_ids.extend(ids)
+            changed_assignments.append(clusterer.partial_fit(vectors))
+            since = newest if since is None else max(since, newest)
+        if not changed_ids:
+            return None
+
+        item_ids = current['item_ids'].tolist()
+        assignments = np.array(current['assignments'])
+        item_index = current.item_index
+        new_ids, new_assignments = [], []
+        for item_id, cluster in zip(changed_ids, np.concatenate(changed_assignments).tolist()):
+            position = item_index.get(item_id)
+            if position is None:
+                new_ids.append(item_id)
+                new_assignments.append(cluster)
+            else:
+                assignments[position] = cluster
+
+        return clusterer.publish(
+            item_type,
+            np.array(item_ids + new_ids),
+            np.concatenate([assignments, np.array(new_assignments, dtype=np.int32)]),
+            since
+        )
+
+    def publish(self, item_type, item_ids, assignments, watermark=None):
+        order = np.argsort(assignments, kind='stable').astype(np.int32)
+        offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignments, minlength=len(self.centroids)))
+        return self.store(item_type).publish({
+            'centroids': self.centroids,
+            'counts': self.counts,
+            'item_ids': item_ids,
+            'assignments': assignments.astype(np.int32),
+            'order': order,
+            'offsets': offsets,
+        }, metadata={
+            'item_type': item_type,
+            'n_items': len(item_ids),
+            'n_clusters': len(self.centroids),
+            'watermark': watermark.isoformat() if watermark is not None else None,
+        })
@@ -0,0 +1,210 @@
+import logging
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.feature_extraction.text import HashingVectorizer
+from django.utils import timezone
+
+from apps.safar.models import Place, Experience, ItemEmbedding
+
+logger = logging.getLogger(__name__)
+
+
+class ItemEmbeddingEncoder:
+    """
+    Encode catalog rows into fixed-size content vectors.
+
+    Categorical attributes (category, country, city, region) are one-hot
+    features and ``metadata['tags']`` is bag-of-words, both hashed into a
+    fixed number of columns. Hashing needs no fitted vocabulary, so a single
+    item can be re-encoded on save and stay comparable with every other
+    stored vector.
+    """
+
+    CATEGORICAL_DIMENSIONS = 128
+    TAG_DIMENSIONS = 128
+    DIMENSIONS = CATEGORICAL_DIMENSIONS + TAG_DIMENSIONS
+
+    FIELDS = {
+        'place': ('id', 'category__name', 'country__name', 'city__name', 'region__name', 'rating', 'metadata'),
+        'experience': ('id', 'category__name', 'place__name', 'place__country__name', 'place__city__name', 'rating'),
+    }
+
+    def __init__(self, item_type):
+        self.item_type = item_type
+        self.fields = self.FIELDS[item_type]
+        self.categorical = FeatureHasher(
+            n_features=self.CATEGORICAL_DIMENSIONS, input_type='dict', alternate_sign=False
+        )
+        self.tags = HashingVectorizer(n_features=self.TAG_DIMENSIONS, alternate_sign=False, norm='l2')
+
+    def encode(self, rows):
+        """
+        Encode ``.values(*fields)`` rows.
+
+        Returns:
+            numpy.ndarray: float32 (len(rows), DIMENSIONS) matrix
+        """
+        records, tags = [], []
+        for row in rows:
+            record = {}
+            for field in self.fields:
+                if field in ('id', 'rating', 'metadata') or not row.get(field):
+                    continue
+                record[f"{field.replace('__name', '')}_{row[field]}"] = 1.0
+            if row.get('rating') is not None:
+                record['rating_scaled'] = float(row['rating']) / 5.0
+            records.append(record)
+
+            metadata = row.get('metadata')
+            tags.append(' '.join(metadata.get('tags', [])) if isinstance(metadata, dict) else '')
+
+        if not records:
+            return np.zeros((0, self.DIMENSIONS), dtype=np.float32)
+        return sparse.hstack(
+            [self.categorical.transform(records), self.tags.transform(tags)], format='csr'
+        ).toarray().astype(np.float32)
+
+
+class ItemEmbeddingStore:
+    """
+    Persistent per-item content vectors for one item type.
+
+    Vectors live in ``ItemEmbedding`` rows so content-based scoring covers
+    every catalog item, including ones nobody has interacted with yet. They
+    are refreshed when a Place or Experience is saved and fully rebuilt
+    nightly by ``rebuild_item_embeddings``.
+    """
+
+    ITEM_MODELS = {
+        'place': Place,
+        'experience': Experience,
+    }
+    CHUNK_SIZE = 2000
+
+    def __init__(self, item_type):
+        if item_type not in self.ITEM_MODELS:
+            raise ValueError(f"Unsupported item type: {item_type}")
+        self.item_type = item_type
+        self.model_class = self.ITEM_MODELS[item_type]
+        self.encoder = ItemEmbeddingEncoder(item_type)
+
+    def refresh(self, item_ids):
+        """
+        Re-encode the given items and upsert their vectors; returns how many were stored.
+        Items that are deleted (or soft-deleted) lose their stored vector.
+        """
+        item_ids = [str(item_id) for item_id in item_ids]
+        stored = 0
+        for start in range(0, len(item_ids), self.CHUNK_SIZE):
+            chunk_ids = item_ids[start:start + self.CHUNK_SIZE]
+            rows = list(self.model_class.objects.filter(
+                id__in=chunk_ids, is_deleted=False
+            ).values(*self.encoder.fields))
+            stored += self._save(rows)
+
+            live_ids = {str(row['id']) for row in rows}
+            gone_ids = [item_id for item_id in chunk_ids if item_id not in live_ids]
+            if gone_ids:
+                ItemEmbedding.objects.filter(item_type=self.item_type, item_id__in=gone_ids).delete()
+        return stored
+
+    def rebuild(self):
+        """Re-encode the whole catalog and drop vectors of deleted items"""
+        started = timezone.now()
+        rows = self.model_class.objects.filter(is_deleted=False).values(*self.encoder.fields)
+
+        stored = 0
+        chunk = []
+        for row in rows.iterator(chunk_size=self.CHUNK_SIZE):
+            chunk.append(row)
+            if len(chunk) >= self.CHUNK_SIZE:
+                stored += self._save(chunk)
+                chunk = []
+        if chunk:
+            stored += self._save(chunk)
+
+        # Anything not rewritten by this run belongs to a deleted item
+        removed, _ = ItemEmbedding.objects.filter(item_type=self.item_type, updated_at__lt=started).delete()
+        logger.info(f"Rebuilt {stored} {self.item_type} embeddings, removed {removed}")
+        return stored
+
+    def _save(self, rows):
+        if not rows:
+            return 0
+        vectors = self.encoder.encode(rows)
+        now = timezone.now()
+        ItemEmbedding.objects.bulk_create(
+            [
+                ItemEmbedding(item_type=self.item_type, item_id=row['id'], vector=vector.tobytes(), updated_at=now)
+                for row, vector in zip(rows, vectors)
+            ],
+            update_conflicts=True,
+            unique_fields=['item_type', 'item_id'],
+            update_fields=['vector', 'updated_at'],
+        )
+        return len(rows)
+
+    def vectors(self, item_ids):
+        """
+        Fetch stored vectors in one query.
+
+        Returns:
+            tuple: (float32 matrix aligned with ``item_ids``, boolean mask of the
+            rows that have a vector; the others are zeros)
+        """
+        item_ids = [str(item_id) for item_id in item_ids]
+        positions = {}
+        for position, item_id in enumerate(item_ids):
+            positions.setdefault(item_id, []).append(position)
+
+        matrix = np.zeros((len(item_ids), ItemEmbeddingEncoder.DIMENSIONS), dtype=np.float32)
+        found = np.zeros(len(item_ids), dtype=bool)
+        rows = ItemEmbedding.objects.filter(
+            item_type=self.item_type, item_id__in=list(positions)
+        ).values_list('item_id', 'vector')
+        for item_id, vector in rows.iterator(chunk_size=self.CHUNK_SIZE):
+            vector = np.frombuffer(vector, dtype=np.float32)
+            if len(vector) != ItemEmbeddingEncoder.DIMENSIONS:
+                continue
+            for position in positions[str(item_id)]:
+                matrix[position] = vector
+                found[position] = True
+        return matrix, found
+
+    def matrix(self, item_ids):
+        """Vectors aligned with ``item_ids``, encoding any item that has none stored yet"""
+        matrix, found = self.vectors(item_ids)
+        if not found.all():
+            missing = [item_id for item_id, has_vector in zip(item_ids, found) if not has_vector]
+            if self.refresh(missing):
+                matrix, found = self.vectors(item_ids)
+        return matrix
+
+    def iter_vectors(self, since=None, chunk_size=None):
+        """
+        Stream stored vectors in item id order, optionally only those updated after ``since``.
+
+        Yields:
+            tuple: (list of item ids (str), float32 matrix, newest updated_at in the chunk)
+        """
+        rows = ItemEmbedding.objects.filter(item_type=self.item_type)
+        if since is not None:
+            rows = rows.filter(updated_at__gt=since)
+        rows = rows.order_by('item_id').values_list('item_id', 'vector', 'updated_at')
+
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        ids, vectors, newest = [], [], None
+        for item_id, vector, updated_at in rows.iterator(chunk_size=chunk_size):
+            vector = np.frombuffer(vector, dtype=np.float32)
+            if len(vector) != ItemEmbeddingEncoder.DIMENSIONS:
+                continue
+            ids.append(str(item_id))
+            vectors.append(vector)
+            newest = updated_at if newest is None else max(newest, updated_at)
+            if len(ids) >= chunk_size:
+                yield ids, np.vstack(vectors), newest
+                ids, vectors, newest = [], [], None
+        if ids:
+            yield ids, np.vstack(vectors), newest
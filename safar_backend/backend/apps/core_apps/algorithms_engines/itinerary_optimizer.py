@@ -0,0 +1,196 @@
+import logging
+import random
+import time
+
+import numpy as np
+
+from apps.core_apps.algorithms_engines.travel_time import TravelTimeService
+
+logger = logging.getLogger(__name__)
+
+
+class ItineraryOptimizer:
+    """
+    Anytime local search over a whole trip.
+
+    A plan assigns candidate activities to days, each day visited in route
+    order. The objective rewards the value (personalization and rating) of
+    what is planned and penalises travel time, spending over budget and
+    drifting from the target mix of activity types across the trip. Day
+    capacity (item count and hours including travel) and the longest
+    allowed hop are hard constraints.
+
+    The search starts from a greedy plan and applies random replace / move /
+    swap / insert / remove moves, keeping any that don't make the plan worse,
+    until the wall-clock budget runs out. The best plan seen is returned, so
+    latency is bounded by the budget whatever the candidate pool size.
+    """
+
+    TRAVEL_WEIGHT = 0.2     # per hour of travel
+    BUDGET_WEIGHT = 2.0     # per 100% of the budget overspent
+    BALANCE_WEIGHT = 0.5    # per unit of L1 distance from the type mix, per planned item
+    CANDIDATES_PER_SLOT = 3  # Pool size as a multiple of the plan's capacity
+
+    def __init__(self, values, durations, costs, types, minutes, days, max_daily_items,
+                 max_daily_minutes, max_hop_minutes=None, budget=None, type_targets=None,
+                 travel_times=None, seed=42):
+        """
+        Args:
+            values (array): Value of each candidate
+            durations (array): Visit duration of each candidate, in minutes
+            costs (array): Cost of each candidate
+            types (array): Activity type index of each candidate, into ``type_targets``
+            minutes (ndarray): Travel-time matrix between candidates
+            days (int): Number of days to plan
+            max_daily_items (int): Most activities per day
+            max_daily_minutes (float): Most minutes per day, visits plus travel
+            max_hop_minutes (float): Longest allowed travel between two activities, or None
+            budget (float): Total budget of the trip, or None
+            type_targets (array): Target share of each activity type
+        """
+        self.values = np.asarray(values, dtype=np.float64)
+        self.durations = np.asarray(durations, dtype=np.float64)
+        self.costs = np.asarray(costs, dtype=np.float64)
+        self.types = np.asarray(types, dtype=np.int64)
+        self.minutes = np.asarray(minutes, dtype=np.float64)
+        self.days = days
+        self.max_daily_items = max_daily_items
+        self.max_daily_minutes = max_daily_minutes
+        self.max_hop_minutes = max_hop_minutes
+        self.budget = budget
+        self.type_targets = (
+            np.asarray(type_targets, dtype=np.float64) if type_targets is not None
+            else np.zeros(int(self.types.max()) + 1 if len(self.types) else 0)
+        )
+        self.travel_times = travel_times or TravelTimeService()
+        self.random = random.Random(seed)
+        self._routes = {}
+
+    def _route(self, stops):
+        """(stops in visiting order, travel minutes, longest hop) for one day, memoised by stop set"""
+        key = frozenset(stops)
+        route = self._routes.get(key)
+        if route is None:
+            stops = sorted(stops)
+            if len(stops) < 2:
+                route = (stops, 0.0, 0.0)
+            else:
+                submatrix = self.minutes[np.ix_(stops, stops)]
+                order, _ = self.travel_times.order_route(submatrix, deadline_ms=1)
+                hops = submatrix[order[:-1], order[1:]]
+                route = ([stops[position] for position in order], float(hops.sum()), float(hops.max()))
+            self._routes[key] = route
+        return route
+
+    def _fits(self, stops):
+        if len(stops) > self.max_daily_items or len(set(stops)) < len(stops):
+            return False
+        _, travel, longest_hop = self._route(stops)
+        if self.max_hop_minutes is not None and longest_hop > self.max_hop_minutes:
+            return False
+        return self.durations[list(stops)].sum() + travel <= self.max_daily_minutes
+
+    def objective(self, plan):
+        planned = [stop for day in plan for stop in day]
+        if not planned:
+            return 0.0
+        score = self.values[planned].sum()
+        score -= self.TRAVEL_WEIGHT * sum(self._route(day)[1] for day in plan) / 60
+
+        if self.budget:
+            overspent = max(0.0, self.costs[planned].sum() - self.budget)
+            score -= self.BUDGET_WEIGHT * overspent / self.budget
+
+        if len(self.type_targets):
+            shares = np.bincount(self.types[planned], minlength=len(self.type_targets)) / len(planned)
+            imbalance = np.abs(shares - self.type_targets).sum()
+            score -= self.BALANCE_WEIGHT * imbalance * len(planned)
+        return float(score)
+
+    def _greedy(self, candidates):
+        """Fill days in candidate order, each activity going to the feasible day with fewest items"""
+        plan = [[] for _ in range(self.days)]
+        spent = 0.0
+        for candidate in candidates:
+            if self.budget and spent + self.costs[candidate] > self.budget:
+                continue
+            for day in sorted(plan, key=len):
+                if self._fits(day + [candidate]):
+                    day.append(candidate)
+                    spent += self.costs[candidate]
+                    break
+        return plan
+
+    def _neighbour(self, plan, unused):
+        """A random modification of ``plan``, or None if the drawn move doesn't apply"""
+        plan = [list(day) for day in plan]
+        filled = [position for position, day in enumerate(plan) if day]
+        move = self.random.random()
+
+        if move < 0.35 and filled and unused:
+            # Replace a planned activity with an unused one
+            day = plan[self.random.choice(filled)]
+            day[self.random.randrange(len(day))] = self.random.choice(unused)
+            changed = [day]
+        elif move < 0.55 and filled and self.days > 1:
+            # Move an activity to another day
+            source = self.random.choice(filled)
+            target = self.random.choice([position for position in range(self.days) if position != source])
+            plan[target].append(plan[source].pop(self.random.randrange(len(plan[source]))))
+            changed = [plan[source], plan[target]]
+        elif move < 0.75 and len(filled) > 1:
+            # Swap activities between two days
+            first, second = self.random.sample(filled, 2)
+            i, j = self.random.randrange(len(plan[first])), self.random.randrange(len(plan[second]))
+            plan[first][i], plan[second][j] = plan[second][j], plan[first][i]
+            changed = [plan[first], plan[second]]
+        elif move < 0.9 and unused:
+            # Insert an unused activity
+            day = plan[self.random.randrange(self.days)]
+            day.append(self.random.choice(unused))
+            changed = [day]
+        elif filled:
+            # Drop an activity
+            day = plan[self.random.choice(filled)]
+            day.pop(self.random.randrange(len(day)))
+            # Removing a stop can lengthen the hop between its neighbours
+            changed = [day]
+        else:
+            return None
+
+        if all(self._fits(day) for day in changed):
+            return plan
+        return None
+
+    def optimise(self, deadline_ms=200):
+        """
+        Search for a good plan within ``deadline_ms`` of wall-clock time.
+
+        Returns:
+            list: One list per day of candidate positions, in visiting order
+        """
+        deadline = time.perf_counter() + deadline_ms / 1000
+        capacity = self.days * self.max_daily_items * self.CANDIDATES_PER_SLOT
+        candidates = np.argsort(-self.values, kind='stable')[:capacity].tolist()
+
+        plan = self._greedy(candidates)
+        score = best_score = self.objective(plan)
+        best = plan
+        iterations = 0
+
+        while time.perf_counter() < deadline:
+            iterations += 1
+            planned = {stop for day in plan for stop in day}
+            unused = [candidate for candidate in candidates if candidate not in planned]
+            neighbour = self._neighbour(plan, unused)
+            if neighbour is None:
+                continue
+            neighbour_score = self.objective(neighbour)
+            # Accept sideways moves too, so the search can cross plateaus
+            if neighbour_score >= score:
+                plan, score = neighbour, neighbour_score
+                if score > best_score:
+                    best, best_score = plan, score
+
+        logger.debug(f"Itinerary search ran {iterations} iterations, objective {best_score:.3f}")
+        return [self._route(day)[0] for day in best]
@@ -0,0 +1,157 @@
+import logging
+import uuid
+
+import numpy as np
+from django.contrib.gis.geos import Point
+from django.core.cache import cache
+
+from apps.safar.models import Place, Experience
+from apps.core_apps.algorithms_engines.travel_time import TravelMatrix, activity_key
+
+logger = logging.getLogger(__name__)
+
+
+class ItinerarySkeleton:
+    """
+    The user-independent groundwork of a generated box.
+
+    For one destination, duration, theme and daily item limit this holds the candidate pool,
+    its geographic clusters, the travel matrix between all candidates and
+    each candidate's opening-hours slot mask. Users generating the same kind
+    of box share one skeleton; ``BoxGenerator`` only re-ranks and schedules
+    on top of it.
+
+    Skeletons are cached under the destination's catalog version, which
+    ``invalidate`` replaces whenever a place or experience in that city,
+    region or country changes, orphaning every skeleton built on it.
+    """
+
+    KEY_PATTERN = 'box:skeleton:{scope}:{duration_days}:{max_daily_items}:{theme}:{version}'
+    VERSION_KEY = 'box:skeleton:version:{scope}'
+    TIMEOUT = 60 * 60 * 6  # 6 hours
+
+    def __init__(self, places, experiences, clusters, travel, opening_masks):
+        """
+        Args:
+            places (list): Candidate places
+            experiences (list): Candidate experiences
+            clusters (list): [{'center': (latitude, longitude) or None, 'keys': [activity_key, ...]}]
+            travel (TravelMatrix): Travel matrix over all candidates
+            opening_masks (dict): {activity_key: DaySchedule mask, or None when always open}
+        """
+        self.places = places
+        self.experiences = experiences
+        self.clusters = clusters
+        self.travel = travel
+        self.opening_masks = opening_masks
+
+    @staticmethod
+    def scope(destination):
+        return f"{type(destination).__name__.lower()}-{destination.pk}"
+
+    @staticmethod
+    def scopes_for(item):
+        """Destination scopes whose skeletons may contain a place or experience"""
+        place = item if isinstance(item, Place) else getattr(item, 'place', None)
+        if place is None:
+            return []
+        return [
+            f"{name}-{value}"
+            for name, value in (('city', place.city_id), ('region', place.region_id), ('country', place.country_id))
+            if value
+        ]
+
+    @classmethod
+    def _version(cls, scope):
+        return cache.get_or_set(cls.VERSION_KEY.format(scope=scope), lambda: uuid.uuid4().hex, timeout=None)
+
+    @classmethod
+    def _key(cls, destination, duration_days, theme, max_daily_items):
+        scope = cls.scope(destination)
+        return cls.KEY_PATTERN.format(
+            scope=scope, duration_days=duration_days, max_daily_items=max_daily_items,
+            theme=theme or 'none', version=cls._version(scope)
+        )
+
+    @classmethod
+    def invalidate(cls, scopes):
+        """Give the scopes a new catalog version; their cached skeletons are never read again"""
+        try:
+            cache.set_many({cls.VERSION_KEY.format(scope=scope): uuid.uuid4().hex for scope in scopes}, timeout=None)
+        except Exception as e:
+            logger.error(f"Error invalidating itinerary skeletons: {str(e)}")
+
+    @classmethod
+    def load(cls, destination, duration_days, theme=None, max_daily_items=None):
+        """
+        Return the cached skeleton, hydrated with two queries, or None on a miss.
+        """
+        try:
+            data = cache.get(cls._key(destination, duration_days, theme, max_daily_items))
+        except Exception as e:
+            logger.error(f"Error reading itinerary skeleton: {str(e)}")
+            return None
+        if data is None:
+            return None
+
+        places = cls._hydrate(
+            Place.objects.select_related('category', 'country', 'city', 'region'), data['place_ids']
+        )
+        experiences = cls._hydrate(
+            Experience.objects.select_related('category', 'place'), data['experience_ids']
+        )
+        size = len(data['travel_keys'])
+        matrices = np.frombuffer(data['travel'], dtype=np.float32).reshape(2, size, size)
+        return cls(
+            places,
+            experiences,
+            data['clusters'],
+            TravelMatrix(data['travel_keys'], matrices[0], matrices[1]),
+            data['opening_masks']
+        )
+
+    def save(self, destination, duration_days, theme=None, max_daily_items=None):
+        data = {
+            'place_ids': [str(place.pk) for place in self.places],
+            'experience_ids': [str(experience.pk) for experience in self.experiences],
+            'clusters': self.clusters,
+            'travel_keys': self.travel.keys,
+            'travel': np.stack([self.travel.distances, self.travel.minutes]).astype(np.float32).tobytes(),
+            'opening_masks': self.opening_masks,
+        }
+        try:
+            cache.set(self._key(destination, duration_days, theme, max_daily_items), data, timeout=self.TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error writing itinerary skeleton: {str(e)}")
+
+    @staticmethod
+    def _hydrate(queryset, item_ids):
+        # Items made unavailable since the skeleton was built are dropped
+        items = queryset.filter(is_available=True, is_deleted=False).in_bulk(item_ids)
+        items = {str(pk): item for pk, item in items.items()}
+        return [items[item_id] for item_id in item_ids if item_id in items]
+
+    def clusters_for(self, activities):
+        """
+        The skeleton's clusters filled with ``activities``, in the order given,
+        in the format of ``BoxGenerator._cluster_activities_by_location_ml``.
+        """
+        positions = {}
+        for cluster_index, cluster in enumerate(self.clusters):
+            for key in cluster['keys']:
+                positions[key] = cluster_index
+
+        members = [[] for _ in self.clusters]
+        for activity in activities:
+            cluster_index = positions.get(activity_key(activity))
+            if cluster_index is not None:
+                members[cluster_index].append(activity)
+
+        return [
+            {
+                'center': Point(cluster['center'][1], cluster['center'][0], srid=4326) if cluster['center'] else None,
+                'activities': activities_in_cluster
+            }
+            for cluster, activities_in_cluster in zip(self.clusters, members)
+            if activities_in_cluster
+        ]
@@ -0,0 +1,301 @@
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ModelArtifact:
+    """
+    A single, read-only version of a trained model.
+
+    Arrays are loaded lazily from their ``.npy`` files and memory-mapped when
+    possible, so every worker process on a host shares the same page cache
+    instead of holding its own copy of the factors.
+    """
+
+    def __init__(self, namespace, version, path, metadata, mmap=True):
+        self.namespace = namespace
+        self.version = version
+        self.path = Path(path)
+        self.metadata = metadata
+        self._mmap_mode = 'r' if mmap else None
+        self._arrays = {}
+        self._sparse = {}
+        self._indexes = {}
+        self._derived = {}
+
+    def __contains__(self, name):
+        return name in self.metadata.get('arrays', [])
+
+    def is_sparse(self, name):
+        return name in self.metadata.get('sparse', [])
+
+    def get(self, name, default=None):
+        """Return the named array, or ``default`` if the artifact does not have it"""
+        if name not in self:
+            return default
+        if name not in self._arrays:
+            self._arrays[name] = np.load(
+                self.path / f"{name}.npy",
+                mmap_mode=self._mmap_mode,
+                allow_pickle=False
+            )
+        return self._arrays[name]
+
+    def __getitem__(self, name):
+        array = self.get(name)
+        if array is None:
+            raise KeyError(f"Artifact {self.namespace}@{self.version} has no array '{name}'")
+        return array
+
+    def sparse(self, name):
+        """
+        Return a stored sparse matrix as CSR.
+
+        The matrix is rebuilt around the memory-mapped ``data``/``indices``/
+        ``indptr`` arrays, so no copy of the non-zeros is made.
+        """
+        if name not in self._sparse:
+            if not self.is_sparse(name):
+                return None
+            self._sparse[name] = sparse.csr_matrix(
+                (self[f"{name}__data"], self[f"{name}__indices"], self[f"{name}__indptr"]),
+                shape=tuple(int(n) for n in self[f"{name}__shape"]),
+                copy=False
+            )
+        return self._sparse[name]
+
+    def matrix(self, name):
+        """Return the named matrix, sparse or dense, whichever way it was stored"""
+        if self.is_sparse(name):
+            return self.sparse(name)
+        return self.get(name)
+
+    def index_for(self, name):
+        """Return a cached {id: position} mapping for an id array"""
+        if name not in self._indexes:
+            ids = self.get(name)
+            self._indexes[name] = {} if ids is None else {
+                str(item_id): idx for idx, item_id in enumerate(ids.tolist())
+            }
+        return self._indexes[name]
+
+    def memoize(self, key, factory):
+        """Cache an object derived from this artifact (e.g. a search index) for its lifetime"""
+        if key not in self._derived:
+            self._derived[key] = factory(self)
+        return self._derived[key]
+
+    @property
+    def user_ids(self):
+        return self.get('user_ids')
+
+    @property
+    def item_ids(self):
+        return self.get('item_ids')
+
+    @property
+    def user_factors(self):
+        return self.get('user_factors')
+
+    @property
+    def item_factors(self):
+        return self.get('item_factors')
+
+    @property
+    def item_features(self):
+        return self.matrix('item_features')
+
+    @property
+    def interactions(self):
+        """Weighted users x items interaction matrix (CSR)"""
+        return self.matrix('interactions')
+
+    @property
+    def user_index(self):
+        return self.index_for('user_ids')
+
+    @property
+    def item_index(self):
+        return self.index_for('item_ids')
+
+    def validate(self):
+        """Touch every array so a truncated or corrupt version fails at load time"""
+        for name in self.metadata.get('arrays', []):
+            self[name]
+        return self
+
+    def __repr__(self):
+        return f"<ModelArtifact {self.namespace}@{self.version}>"
+
+
+class ModelStore:
+    """
+    Versioned on-disk store for trained model artifacts.
+
+    Layout::
+
+        <root>/<namespace>/<version>/<array>.npy
+        <root>/<namespace>/<version>/meta.json
+        <root>/<namespace>/CURRENT
+
+    Versions are written to a hidden temporary directory and renamed into
+    place, then ``CURRENT`` is swapped with ``os.replace`` so readers only ever
+    see complete versions. If the current version cannot be loaded the store
+    falls back to the newest older version that can.
+    """
+
+    CURRENT_FILE = 'CURRENT'
+    META_FILE = 'meta.json'
+    KEEP_VERSIONS = 3
+
+    # Process-wide cache of loaded artifacts: {(root, namespace): ModelArtifact}
+    _loaded = {}
+    # Versions that failed to load, so we do not retry them on every request
+    _broken = set()
+    _lock = threading.Lock()
+
+    def __init__(self, namespace, root=None):
+        self.namespace = namespace.strip('/')
+        self.root = Path(root or getattr(settings, 'RECOMMENDATION_MODEL_DIR', 'ml_models'))
+        self.path = self.root / self.namespace
+
+    def publish(self, arrays, metadata=None):
+        """
+        Write a new version and atomically make it current.
+
+        Args:
+            arrays (dict): Mapping of array name to numpy array or scipy sparse matrix
+            metadata (dict): Extra JSON-serialisable metadata
+
+        Returns:
+            str: The published version identifier
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        tmp_path = self.path / f".tmp-{version}"
+        final_path = self.path / version
+
+        # Sparse matrices are stored as their CSR component arrays
+        flat_arrays = {}
+        sparse_names = []
+        for name, array in arrays.items():
+            if sparse.issparse(array):
+                csr = sparse.csr_matrix(array)
+                flat_arrays[f"{name}__data"] = csr.data
+                flat_arrays[f"{name}__indices"] = csr.indices
+                flat_arrays[f"{name}__indptr"] = csr.indptr
+                flat_arrays[f"{name}__shape"] = np.array(csr.shape, dtype=np.int64)
+                sparse_names.append(name)
+            else:
+                flat_arrays[name] = np.asarray(array)
+
+        try:
+            tmp_path.mkdir()
+            for name, array in flat_arrays.items():
+                np.save(tmp_path / f"{name}.npy", array, allow_pickle=False)
+
+            meta = {
+                **(metadata or {}),
+                'namespace': self.namespace,
+                'version': version,
+                'created_at': datetime.now().isoformat(),
+                'arrays': sorted(flat_arrays.keys()),
+                'sparse': sorted(sparse_names),
+            }
+            with open(tmp_path / self.META_FILE, 'w') as fh:
+                json.dump(meta, fh)
+
+            os.rename(tmp_path, final_path)
+            self._write_pointer(version)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        self._prune()
+        logger.info(f"Published model {self.namespace}@{version}")
+        return version
+
+    def current_version(self):
+        """Return the version named by the CURRENT pointer, if any"""
+        try:
+            return (self.path / self.CURRENT_FILE).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def versions(self):
+        """Return all complete versions, newest first"""
+        if not self.path.exists():
+            return []
+        return sorted(
+            (p.name for p in self.path.iterdir() if p.is_dir() and not p.name.startswith('.')),
+            reverse=True
+        )
+
+    def load(self, mmap=True):
+        """
+        Return the current artifact, reusing the copy already loaded in this
+        process when the CURRENT pointer has not moved.
+
+        Returns:
+            ModelArtifact | None: None when no usable version exists
+        """
+        key = (str(self.root), self.namespace)
+        current = self.current_version()
+        cached = self._loaded.get(key)
+        if cached is not None and (cached.version == current or (key, current) in self._broken):
+            return cached
+
+        with self._lock:
+            cached = self._loaded.get(key)
+            if cached is not None and (cached.version == current or (key, current) in self._broken):
+                return cached
+
+            candidates = [current] if current else []
+            candidates += [v for v in self.versions() if v != current]
+
+            for version in candidates:
+                if (key, version) in self._broken:
+                    continue
+                try:
+                    artifact = self._load_version(version, mmap=mmap)
+                except Exception as e:
+                    logger.error(f"Failed to load model {self.namespace}@{version}: {str(e)}")
+                    self._broken.add((key, version))
+                    continue
+                if version != current:
+                    logger.warning(f"Falling back to previous model {self.namespace}@{version}")
+                self._loaded[key] = artifact
+                return artifact
+
+        # Keep serving a previously loaded version rather than nothing at all
+        return cached
+
+    def _load_version(self, version, mmap=True):
+        path = self.path / version
+        with open(path / self.META_FILE) as fh:
+            metadata = json.load(fh)
+        return ModelArtifact(self.namespace, version, path, metadata, mmap=mmap).validate()
+
+    def _write_pointer(self, version):
+        tmp_pointer = self.path / f".{self.CURRENT_FILE}.{os.getpid()}"
+        tmp_pointer.write_text(version)
+        os.replace(tmp_pointer, self.path / self.CURRENT_FILE)
+
+    def _prune(self):
+        """Remove old versions, always keeping the current one and its predecessors"""
+        current = self.current_version()
+        for version in self.versions()[self.KEEP_VERSIONS:]:
+            if version == current:
+                continue
+            # Files already memory-mapped by other processes stay readable after unlink
+            shutil.rmtree(self.path / version, ignore_errors=True)
@@ -0,0 +1,158 @@
+import logging
+from datetime import datetime
+
+import numpy as np
+from sklearn.decomposition import TruncatedSVD
+
+from apps.core_apps.algorithms_engines.recommendation_engine import RecommendationEngine
+from apps.core_apps.algorithms_engines.ann_index import IVFIndex
+from apps.core_apps.algorithms_engines.interaction_features import InteractionFeatureCache
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationModelTrainer:
+    """
+    Offline trainer for the recommendation engine.
+
+    Fits the SVD factors and ANN indexes for one item type and publishes
+    them as a new version in the model store. Runs from Celery on a
+    schedule so request handlers only ever load artifacts. Item clusters
+    are maintained separately by ``ItemClusterer``.
+
+    Interactions are read as NumPy columns from the incremental on-disk
+    cache and summed into a sparse CSR matrix, so memory grows with the
+    number of interactions rather than users x items.
+
+    With a ``country_id`` only the interactions on that country's items are
+    used and the result is published as an independent shard, so shards and
+    item types can be trained in parallel. Parallel trainers share the item
+    type's interaction cache; it is refreshed once before they start and
+    they only read it (``refresh_interactions=False``).
+    """
+
+    ITEM_MODELS = RecommendationEngine.ITEM_MODELS
+    MAX_COMPONENTS = 50
+    # Countries need at least this many interactions to get their own shard
+    SHARD_MIN_INTERACTIONS = 5000
+    COUNTRY_FIELDS = {
+        'place': 'country_id',
+        'experience': 'place__country_id',
+    }
+
+    def __init__(self, item_type, store=None, until=None, country_id=None, refresh_interactions=True):
+        if item_type not in self.ITEM_MODELS:
+            raise ValueError(f"Unsupported item type: {item_type}")
+        self.item_type = item_type
+        self.model_class = self.ITEM_MODELS[item_type]
+        self.country_id = country_id
+        self.store = store or RecommendationEngine.model_store(item_type, country_id)
+        # Train on interactions before this moment only, e.g. for offline evaluation
+        self.until = until
+        self.refresh_interactions = refresh_interactions
+
+    def train(self):
+        """
+        Train and publish a new model version.
+
+        Returns:
+            str | None: The published version, or None if there was nothing to train on
+        """
+        started = datetime.now()
+        user_item, user_ids, item_ids = self._load_interaction_matrix()
+        if user_item.nnz == 0:
+            logger.info(f"No interactions for {self.item_type}, skipping training")
+            return None
+
+        if min(user_item.shape) < 2:
+            logger.info(f"Not enough data to factorise {self.item_type} interactions {user_item.shape}")
+            return None
+
+        # Matrix factorization, run directly on the sparse matrix
+        svd = TruncatedSVD(n_components=min(self.MAX_COMPONENTS, min(user_item.shape) - 1))
+        user_factors = svd.fit_transform(user_item)
+        item_factors = svd.components_.T
+
+        arrays = {
+            'user_ids': np.array(user_ids),
+            'item_ids': np.array(item_ids),
+            'user_factors': user_factors.astype(np.float32),
+            'item_factors': item_factors.astype(np.float32),
+            'interactions': user_item,
+            # Items x users, for item-to-item co-occurrence lookups
+            'item_users': user_item.T.tocsr(),
+        }
+
+        # ANN indexes over the latent factors for similar user/item lookups
+        arrays.update(IVFIndex.build(user_factors).to_arrays(RecommendationEngine.USER_INDEX))
+        arrays.update(IVFIndex.build(item_factors).to_arrays(RecommendationEngine.ITEM_INDEX))
+
+        version = self.store.publish(arrays, metadata={
+            'item_type': self.item_type,
+            'country_id': str(self.country_id) if self.country_id is not None else None,
+            'n_users': len(user_ids),
+            'n_items': len(item_ids),
+            'n_interactions': int(user_item.nnz),
+            'n_components': int(svd.n_components),
+            'training_seconds': (datetime.now() - started).total_seconds(),
+        })
+        return version
+
+    def _load_interaction_matrix(self):
+        """
+        Build the weighted, time-decayed users x items CSR matrix.
+
+        Interactions come from the on-disk columnar cache, which only fetches
+        rows added since the previous run, and are weighted in one vectorised
+        pass.
+
+        Returns:
+            tuple: (csr_matrix, user_ids, item_ids) where the id lists give the
+            row and column order of the matrix
+        """
+        cache = self.interaction_cache(self.item_type)
+        columns = cache.refresh() if self.refresh_interactions else cache.read()
+        if self.country_id is not None:
+            columns = columns.for_items(
+                self.model_class.objects.filter(
+                    **{self.COUNTRY_FIELDS[self.item_type]: self.country_id}
+                ).values_list('id', flat=True).iterator()
+            )
+        if self.until is not None:
+            columns = columns.before(self.until)
+        return columns.to_matrix(self.until)
+
+    @staticmethod
+    def interaction_cache(item_type):
+        """The interaction cache of an item type, shared by its model and all its country shards"""
+        return InteractionFeatureCache(item_type, root=RecommendationEngine.model_store(item_type).root)
+
+    @classmethod
+    def shard_countries(cls, item_type, min_interactions=None):
+        """
+        Countries with enough interactions on their items to get a shard.
+
+        Also brings the interaction cache up to date, so the shard trainers
+        started afterwards only fetch what arrived in between.
+
+        Returns:
+            list: Country ids (str), busiest first
+        """
+        min_interactions = min_interactions or cls.SHARD_MIN_INTERACTIONS
+        columns = cls.interaction_cache(item_type).refresh()
+        if not len(columns):
+            return []
+
+        country_field = cls.COUNTRY_FIELDS[item_type]
+        item_countries = {
+            str(item_id): str(country_id)
+            for item_id, country_id in cls.ITEM_MODELS[item_type].objects.filter(
+                **{f"{country_field}__isnull": False}
+            ).values_list('id', country_field).iterator()
+        }
+        countries = np.array([item_countries.get(item_id, '') for item_id in columns.items.tolist()])
+        country_ids, country_codes = np.unique(countries, return_inverse=True)
+
+        counts = np.bincount(country_codes[columns.item_codes], minlength=len(country_ids))
+        busy = [idx for idx in np.argsort(-counts).tolist() if counts[idx] >= min_interactions and country_ids[idx]]
+        return [str(country_ids[idx]) for idx in busy]
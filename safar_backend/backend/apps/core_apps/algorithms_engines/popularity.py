@@ -0,0 +1,155 @@
+import logging
+import uuid
+from datetime import timedelta
+
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+
+class PopularityCounter:
+    """
+    Rolling popularity counters per content type, maintained at write time.
+
+    Every interaction increments its object in a Redis sorted set for the
+    current day. Reads use a decay-weighted union of the last 90 daily sets
+    (1.0 for the last 7 days, 0.7 up to 30 days, 0.3 up to 90 days), which
+    is rebuilt at most every ``ROLLUP_TIMEOUT`` seconds, so top-N and score
+    lookups are O(log n) and never touch the interaction table. The rollup
+    itself does not expire; a separate freshness marker does, so readers keep
+    the previous rollup while a new one is built and swapped in.
+    """
+
+    DAY_KEY = 'popularity:{item_type}:{day}'
+    ROLLUP_KEY = 'popularity:{item_type}:rollup'
+    ROLLUP_LOCK_KEY = 'popularity:{item_type}:rollup:lock'
+    ROLLUP_FRESH_KEY = 'popularity:{item_type}:rollup:fresh'
+    WINDOWS = (
+        (7, 1.0),
+        (30, 0.7),
+        (90, 0.3),
+    )
+    RETENTION_DAYS = 91
+    ROLLUP_TIMEOUT = 60 * 10  # 10 minutes
+
+    def __init__(self, item_type):
+        self.item_type = item_type
+
+    @staticmethod
+    def _connection():
+        return get_redis_connection('default')
+
+    def _day_key(self, day):
+        return self.DAY_KEY.format(item_type=self.item_type, day=day.strftime('%Y%m%d'))
+
+    @property
+    def rollup_key(self):
+        return self.ROLLUP_KEY.format(item_type=self.item_type)
+
+    @classmethod
+    def day_weight(cls, days_old):
+        """Decay weight of a daily bucket ``days_old`` days in the past"""
+        for window, weight in cls.WINDOWS:
+            if days_old < window:
+                return weight
+        return 0.0
+
+    def record(self, object_id, amount=1, when=None):
+        """Count an interaction with ``object_id`` in its day bucket"""
+        try:
+            key = self._day_key(when or timezone.now())
+            pipe = self._connection().pipeline()
+            pipe.zincrby(key, amount, str(object_id))
+            pipe.expire(key, self.RETENTION_DAYS * 86400)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error recording popularity for {self.item_type} {object_id}: {str(e)}")
+
+    def load_day(self, day, counts):
+        """Replace a day bucket with exact counts, e.g. when backfilling from the interaction table"""
+        key = self._day_key(day)
+        pipe = self._connection().pipeline()
+        pipe.delete(key)
+        if counts:
+            pipe.zadd(key, {str(object_id): count for object_id, count in counts.items()})
+            pipe.expire(key, self.RETENTION_DAYS * 86400)
+        pipe.execute()
+
+    def top(self, limit=10):
+        """
+        Return the most popular objects.
+
+        Returns:
+            list: [(object_id, score)], most popular first
+        """
+        try:
+            self._ensure_rollup()
+            return [
+                (member.decode() if isinstance(member, bytes) else member, score)
+                for member, score in self._connection().zrevrange(self.rollup_key, 0, limit - 1, withscores=True)
+            ]
+        except Exception as e:
+            logger.error(f"Error reading popularity for {self.item_type}: {str(e)}")
+            return []
+
+    def scores(self, object_ids):
+        """Return {object_id: score} for the given objects (0 when unseen)"""
+        object_ids = [str(object_id) for object_id in object_ids]
+        if not object_ids:
+            return {}
+        try:
+            self._ensure_rollup()
+            pipe = self._connection().pipeline()
+            for object_id in object_ids:
+                pipe.zscore(self.rollup_key, object_id)
+            return {
+                object_id: score or 0.0
+                for object_id, score in zip(object_ids, pipe.execute())
+            }
+        except Exception as e:
+            logger.error(f"Error reading popularity scores for {self.item_type}: {str(e)}")
+            return {}
+
+    def rebuild_rollup(self):
+        """Recompute the decay-weighted union of the daily buckets"""
+        today = timezone.now()
+        weights = {}
+        for days_old in range(self.WINDOWS[-1][0]):
+            weights[self._day_key(today - timedelta(days=days_old))] = self.day_weight(days_old)
+
+        connection = self._connection()
+        # Unique per build so a backfill and a lazy rebuild never share a scratch key
+        tmp_key = f"{self.rollup_key}:tmp:{uuid.uuid4().hex}"
+        pipe = connection.pipeline()
+        pipe.zunionstore(tmp_key, weights)
+        pipe.expire(tmp_key, self.RETENTION_DAYS * 86400)
+        pipe.execute()
+
+        # Swap in atomically; an empty union leaves no key, so keep readers off a stale one
+        if connection.exists(tmp_key):
+            connection.rename(tmp_key, self.rollup_key)
+        else:
+            connection.delete(self.rollup_key)
+        connection.set(
+            self.ROLLUP_FRESH_KEY.format(item_type=self.item_type), 1, ex=self.ROLLUP_TIMEOUT
+        )
+
+    def _ensure_rollup(self):
+        connection = self._connection()
+        if connection.exists(self.ROLLUP_FRESH_KEY.format(item_type=self.item_type)):
+            return
+        # Only one process rebuilds; the others keep reading the previous rollup
+        lock_key = self.ROLLUP_LOCK_KEY.format(item_type=self.item_type)
+        if connection.set(lock_key, 1, nx=True, ex=60):
+            try:
+                self.rebuild_rollup()
+            finally:
+                connection.delete(lock_key)
+
+    @classmethod
+    def record_interaction(cls, interaction):
+        """Count a newly saved ``UserInteraction`` towards its object's popularity"""
+        if not interaction.content_type_id or interaction.object_id is None:
+            return
+        cls(interaction.content_type.model).record(interaction.object_id, when=interaction.created_at)
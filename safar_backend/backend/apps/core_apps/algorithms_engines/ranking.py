@@ -0,0 +1,469 @@
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+from django.utils import timezone
+
+from apps.core_apps.algorithms_engines.item_embeddings import ItemEmbeddingStore
+from apps.core_apps.algorithms_engines.popularity import PopularityCounter
+from apps.core_apps.algorithms_engines.user_preferences import UserPreferenceVector
+
+logger = logging.getLogger(__name__)
+
+
+class RankingContext:
+    """
+    Per-request state shared by candidate sources and scorers.
+
+    Holds the engine (user, profile and loaded model), the item type, the
+    filtered catalog queryset candidates must come from and, optionally, the
+    geographic origin to rank around. Expensive lookups are memoised here so
+    each is done at most once per ranking.
+    """
+
+    # Columns fetched for every candidate, per item type
+    CANDIDATE_COLUMNS = {
+        'place': {
+            'rating': 'rating',
+            'country': 'country_id',
+            'category': 'category__name',
+            'metadata': 'metadata',
+            'price': 'price',
+        },
+        'experience': {
+            'rating': 'rating',
+            'country': 'place__country_id',
+            'category': 'category__name',
+        },
+    }
+
+    def __init__(self, engine, item_type, queryset, origin=None, radius_km=None):
+        self.engine = engine
+        self.item_type = item_type
+        self.origin = origin
+        self.radius_km = radius_km
+        self.queryset = queryset
+        self.model = engine.model
+        self.now = timezone.now()
+        self._cache = {}
+
+    def memoize(self, key, factory):
+        if key not in self._cache:
+            self._cache[key] = factory()
+        return self._cache[key]
+
+    @property
+    def columns(self):
+        return self.CANDIDATE_COLUMNS.get(self.item_type, {'rating': 'rating'})
+
+    @property
+    def predicted_scores(self):
+        """Normalised matrix factorization scores for every item in the model, or None"""
+        return self.memoize('predicted_scores', lambda: self.engine.predict_item_scores(self.item_type))
+
+    @property
+    def collaborative_scores(self):
+        """{item_id: score} from the interactions of similar users"""
+        return self.memoize('collaborative_scores', lambda: self.engine.collaborative_item_scores(self.item_type))
+
+    @property
+    def popularity_scores(self):
+        """{item_id: score} for recently popular items, from the rolling counters"""
+        return self.memoize('popularity_scores', self._load_popularity)
+
+    def _load_popularity(self):
+        return dict(PopularityCounter(self.item_type).top(PopularityCandidateSource.MAX_ITEMS))
+
+
+class Candidates:
+    """
+    A bounded candidate set with its database columns.
+
+    ``ids[i]``, ``columns[name][i]`` and every scorer's output ``[i]`` all
+    refer to the same item.
+    """
+
+    def __init__(self, ids, columns):
+        self.ids = ids
+        self.columns = columns
+        self.positions = {item_id: idx for idx, item_id in enumerate(ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, mapping, default=0.0):
+        """Align a {item_id: value} mapping with the candidates"""
+        return np.fromiter(
+            (mapping.get(item_id, default) for item_id in self.ids),
+            dtype=np.float64, count=len(self.ids)
+        )
+
+
+class CandidateSource:
+    """Base class for candidate sources; returns item ids, best first"""
+
+    name = None
+
+    def get_candidate_ids(self, context, limit):
+        raise NotImplementedError
+
+
+class GeoCandidateSource(CandidateSource):
+    """
+    The nearest available items around the context origin.
+
+    The search is bounded with ``ST_DWithin`` so PostGIS can use the spatial
+    index on ``location`` before ordering by distance.
+    """
+
+    name = 'geo'
+    DEFAULT_RADIUS_KM = 100
+
+    def get_candidate_ids(self, context, limit):
+        if context.origin is None:
+            return []
+        queryset = context.queryset
+        if not context.radius_km:
+            queryset = queryset.filter(location__dwithin=(context.origin, D(km=self.DEFAULT_RADIUS_KM)))
+        return [
+            str(item_id) for item_id in
+            queryset.annotate(
+                distance=Distance('location', context.origin)
+            ).order_by('distance').values_list('id', flat=True)[:limit]
+        ]
+
+
+class ModelCandidateSource(CandidateSource):
+    """Items with the highest matrix factorization scores"""
+
+    name = 'model'
+
+    def get_candidate_ids(self, context, limit):
+        scores = context.predicted_scores
+        if scores is None or not len(scores):
+            return []
+        top = top_k_indices(scores, limit)
+        item_ids = context.model.item_ids
+        return [str(item_ids[idx]) for idx in top]
+
+
+class CollaborativeCandidateSource(CandidateSource):
+    """Items that similar users interacted with"""
+
+    name = 'collaborative'
+
+    def get_candidate_ids(self, context, limit):
+        scores = context.collaborative_scores
+        return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+
+class PopularityCandidateSource(CandidateSource):
+    """Recently popular items"""
+
+    name = 'popularity'
+    MAX_ITEMS = 1000
+
+    def get_candidate_ids(self, context, limit):
+        scores = context.popularity_scores
+        return sorted(scores, key=scores.get, reverse=True)[:limit]
+
+
+class CatalogCandidateSource(CandidateSource):
+    """Best rated catalog items, so there are always candidates for cold starts"""
+
+    name = 'catalog'
+
+    def get_candidate_ids(self, context, limit):
+        return [
+            str(item_id) for item_id in
+            context.queryset.order_by('-rating').values_list('id', flat=True)[:limit]
+        ]
+
+
+class CandidateGenerator:
+    """
+    Merge candidate sources into one bounded, de-duplicated candidate set.
+
+    Source ids are only suggestions: a single query re-applies the catalog
+    filters to them and fetches the columns scorers need.
+    """
+
+    def __init__(self, sources, budget=500):
+        self.sources = sources
+        self.budget = budget
+
+    def generate(self, context):
+        candidate_ids = []
+        seen = set()
+        per_source = max(1, self.budget // max(1, len(self.sources)))
+
+        for source in self.sources:
+            try:
+                source_ids = source.get_candidate_ids(context, per_source)
+            except Exception as e:
+                logger.error(f"Candidate source {source.name} failed: {str(e)}", exc_info=True)
+                continue
+            for item_id in source_ids:
+                if item_id not in seen:
+                    seen.add(item_id)
+                    candidate_ids.append(item_id)
+
+        if not candidate_ids:
+            return Candidates([], {})
+
+        columns = dict(context.columns)
+        queryset = context.queryset.filter(id__in=candidate_ids[:self.budget]).order_by()
+        if context.origin is not None:
+            queryset = queryset.annotate(distance=Distance('location', context.origin))
+            columns['distance'] = 'distance'
+        rows = list(queryset.values_list('id', *columns.values()))
+
+        ids = [str(row[0]) for row in rows]
+        column_values = {
+            name: [row[i + 1] for row in rows]
+            for i, name in enumerate(columns)
+        }
+        return Candidates(ids, column_values)
+
+
+class Scorer:
+    """
+    Base class for score components.
+
+    ``score`` returns a float array aligned with the candidates; the ranker
+    scales each component to 0-1 before weighting.
+    """
+
+    name = None
+
+    def score(self, context, candidates):
+        raise NotImplementedError
+
+
+class MatrixFactorizationScorer(Scorer):
+    name = 'ml_score'
+
+    def score(self, context, candidates):
+        scores = context.predicted_scores
+        if scores is None:
+            return np.zeros(len(candidates))
+        item_index = context.model.item_index
+        positions = np.fromiter(
+            (item_index.get(item_id, -1) for item_id in candidates.ids),
+            dtype=np.int64, count=len(candidates)
+        )
+        known = positions >= 0
+        result = np.zeros(len(candidates))
+        result[known] = scores[positions[known]]
+        return result
+
+
+class ContentScorer(Scorer):
+    """
+    Cosine similarity between candidates and the user's interacted items.
+
+    Uses the stored item embeddings, so items nobody has interacted with
+    (and that the trained model therefore doesn't know) are scored too.
+    """
+
+    name = 'content_similarity'
+
+    def score(self, context, candidates):
+        result = np.zeros(len(candidates))
+        interacted = list(dict.fromkeys(context.engine.get_user_interactions(context.item_type)['object_id']))
+        if not interacted or not len(candidates):
+            return result
+
+        store = ItemEmbeddingStore(context.item_type)
+        vectors, found = store.vectors(interacted + list(candidates.ids))
+        profile_vectors, profile_found = vectors[:len(interacted)], found[:len(interacted)]
+        if not profile_found.any():
+            return result
+
+        user_profile = profile_vectors[profile_found].mean(axis=0)
+        profile_norm = np.linalg.norm(user_profile)
+        if profile_norm == 0:
+            return result
+
+        candidate_vectors = vectors[len(interacted):]
+        norms = np.linalg.norm(candidate_vectors, axis=1) * profile_norm
+        known = found[len(interacted):] & (norms > 0)
+        result[known] = (candidate_vectors[known] @ user_profile) / norms[known]
+        return result
+
+
+class CollaborativeScorer(Scorer):
+    name = 'similarity_score'
+
+    def score(self, context, candidates):
+        return candidates.lookup(context.collaborative_scores)
+
+
+class PreferenceScorer(Scorer):
+    """The user's ``UserPreferenceVector`` score: preferred country, travel interests, rating and price"""
+
+    name = 'personalization_score'
+
+    def score(self, context, candidates):
+        columns = candidates.columns
+        count = len(candidates)
+        return UserPreferenceVector.score_columns(
+            [context.engine.preferences],
+            country_ids=columns.get('country', [None] * count),
+            categories=columns.get('category', [None] * count),
+            ratings=columns.get('rating', [0] * count),
+            metadata=columns.get('metadata'),
+            prices=columns.get('price')
+        )[0]
+
+
+class PopularityScorer(Scorer):
+    name = 'recent_popularity'
+
+    def score(self, context, candidates):
+        return candidates.lookup(context.popularity_scores)
+
+
+class InteractionBoostScorer(Scorer):
+    """Boost items the user has interacted with, decayed over time"""
+
+    name = 'interaction_boost'
+
+    def score(self, context, candidates):
+        interactions = context.engine.get_user_interactions(context.item_type)
+        if not len(interactions['object_id']):
+            return np.zeros(len(candidates))
+
+        boosts = {}
+        for item_id, weight in zip(interactions['object_id'], interactions['weight'].tolist()):
+            boosts[item_id] = boosts.get(item_id, 0.0) + weight
+        return candidates.lookup(boosts)
+
+
+class RatingScorer(Scorer):
+    name = 'rating'
+
+    def score(self, context, candidates):
+        return np.array([r or 0.0 for r in candidates.columns.get('rating', [])], dtype=np.float64) / 5.0
+
+
+class ProximityScorer(Scorer):
+    """Closeness to the context origin; zero when ranking without one"""
+
+    name = 'proximity'
+    SCALE_KM = 10.0  # Distance at which the score halves
+
+    def score(self, context, candidates):
+        distances = candidates.columns.get('distance')
+        if distances is None:
+            return np.zeros(len(candidates))
+        km = np.array([d.km if d is not None else np.inf for d in distances], dtype=np.float64)
+        return 1.0 / (1.0 + km / self.SCALE_KM)
+
+
+class Ranker:
+    """
+    Two-stage ranker: bounded candidate generation, then in-process scoring.
+
+    Every score component is computed as a NumPy vector over the candidates,
+    combined with configurable weights, and only the top-k rows are hydrated
+    from the database with a single ``in_bulk``.
+    """
+
+    DEFAULT_WEIGHTS = {
+        'ml_score': 0.3,
+        'similarity_score': 0.15,
+        'content_similarity': 0.15,
+        'personalization_score': 0.15,
+        'interaction_boost': 0.1,
+        'recent_popularity': 0.1,
+        'rating': 0.05,
+        'proximity': 0.15,
+    }
+
+    def __init__(self, generator=None, scorers=None, weights=None):
+        self.generator = generator or CandidateGenerator([
+            GeoCandidateSource(),
+            ModelCandidateSource(),
+            CollaborativeCandidateSource(),
+            PopularityCandidateSource(),
+            CatalogCandidateSource(),
+        ])
+        self.scorers = scorers or [
+            MatrixFactorizationScorer(),
+            CollaborativeScorer(),
+            ContentScorer(),
+            PreferenceScorer(),
+            InteractionBoostScorer(),
+            PopularityScorer(),
+            RatingScorer(),
+            ProximityScorer(),
+        ]
+        self.weights = weights or self.get_weights()
+
+    @classmethod
+    def get_weights(cls):
+        return {**cls.DEFAULT_WEIGHTS, **getattr(settings, 'RECOMMENDATION_SCORE_WEIGHTS', {})}
+
+    def rank(self, context, limit):
+        """
+        Rank catalog items for the context.
+
+        Returns:
+            list: Up to ``limit`` model instances, best first, each carrying its
+            score components as attributes
+        """
+        candidates = self.generator.generate(context)
+        if not len(candidates):
+            return []
+
+        components = {}
+        combined = np.zeros(len(candidates))
+        for scorer in self.scorers:
+            weight = self.weights.get(scorer.name, 0.0)
+            try:
+                values = scale(np.asarray(scorer.score(context, candidates), dtype=np.float64))
+            except Exception as e:
+                logger.error(f"Scorer {scorer.name} failed: {str(e)}", exc_info=True)
+                values = np.zeros(len(candidates))
+            components[scorer.name] = values
+            if weight:
+                combined += weight * values
+
+        top = top_k_indices(combined, limit)
+        top_ids = [candidates.ids[idx] for idx in top]
+        items = {str(pk): item for pk, item in context.queryset.in_bulk(top_ids).items()}
+
+        results = []
+        for idx, item_id in zip(top, top_ids):
+            item = items.get(item_id)
+            if item is None:
+                continue
+            for name, values in components.items():
+                setattr(item, name, float(values[idx]))
+            item.recommendation_score = float(combined[idx])
+            results.append(item)
+        return results
+
+
+def top_k_indices(scores, k):
+    """Indices of the ``k`` highest scores, best first, in O(n + k log k)"""
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.array([], dtype=np.int64)
+    if k < n:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(n)
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+def scale(values):
+    """Scale a non-negative score vector to 0-1 by its maximum"""
+    if not len(values):
+        return values
+    values = np.nan_to_num(values)
+    peak = np.abs(values).max()
+    return values / peak if peak > 0 else values
@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import uuid
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationCache:
+    """
+    Cache of ranked recommendation id lists per user.
+
+    Entries are keyed by user, item type, a hash of the request filters, the
+    model version and the user's generation counter. Ids are stored packed
+    as 16-byte UUIDs, so a 20 item list is 320 bytes.
+
+    Invalidation is event driven and never scans keys:
+
+    * a new model version changes the key of every entry;
+    * ``invalidate_user`` bumps the user's generation counter when they
+      record an interaction or change their travel preferences, orphaning
+      all their entries, which then expire on their own.
+    """
+
+    KEY_PATTERN = 'recs:results:{item_type}:{user_id}:{generation}:{version}:{filters}'
+    GENERATION_KEY = 'recs:generation:{user_id}'
+    STATS_KEY = 'recs:cache_stats:{item_type}:{outcome}'
+    TIMEOUT = 60 * 60 * 6  # 6 hours
+    ITEM_TYPES = ('place', 'experience')
+
+    def __init__(self, user_id, item_type, model_version=None):
+        self.user_id = str(user_id)
+        self.item_type = item_type
+        self.model_version = model_version or 'none'
+
+    def get(self, filters=None, limit=None, **options):
+        """
+        Return the cached id list for this request, or None on a miss.
+
+        Returns:
+            list | None: Item ids (str), best first
+        """
+        try:
+            data = cache.get(self._key(filters, limit, options))
+        except Exception as e:
+            logger.error(f"Error reading recommendation cache: {str(e)}")
+            data = None
+
+        self._count('hits' if data is not None else 'misses')
+        if data is None:
+            return None
+        return [str(uuid.UUID(bytes=data[i:i + 16])) for i in range(0, len(data), 16)]
+
+    def set(self, item_ids, filters=None, limit=None, **options):
+        """Cache a ranked id list for this request"""
+        try:
+            data = b''.join(uuid.UUID(str(item_id)).bytes for item_id in item_ids)
+            cache.set(self._key(filters, limit, options), data, timeout=self.TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error writing recommendation cache: {str(e)}")
+
+    @classmethod
+    def invalidate_user(cls, user_id):
+        """Drop every cached list for the user by bumping their generation"""
+        key = cls.GENERATION_KEY.format(user_id=user_id)
+        try:
+            # Seed with SET NX, then INCR: concurrent bumps never overwrite each other
+            cache.add(key, 0, timeout=None)
+            cache.incr(key)
+        except Exception as e:
+            logger.error(f"Error invalidating recommendations for user {user_id}: {str(e)}")
+
+    @classmethod
+    def stats(cls):
+        """Hit and miss counters per item type"""
+        keys = {
+            cls.STATS_KEY.format(item_type=item_type, outcome=outcome): (item_type, outcome)
+            for item_type in cls.ITEM_TYPES
+            for outcome in ('hits', 'misses')
+        }
+        counts = cache.get_many(list(keys))
+
+        stats = {}
+        for key, (item_type, outcome) in keys.items():
+            stats.setdefault(item_type, {})[outcome] = int(counts.get(key) or 0)
+        for item_stats in stats.values():
+            total = item_stats['hits'] + item_stats['misses']
+            item_stats['hit_rate'] = round(item_stats['hits'] / total, 4) if total else None
+        return stats
+
+    def _key(self, filters, limit, options):
+        generation = cache.get(self.GENERATION_KEY.format(user_id=self.user_id)) or 0
+        return self.KEY_PATTERN.format(
+            item_type=self.item_type,
+            user_id=self.user_id,
+            generation=generation,
+            version=self.model_version,
+            filters=self.filter_hash(filters, limit, options)
+        )
+
+    @staticmethod
+    def filter_hash(filters=None, limit=None, options=None):
+        """Stable short hash of the request parameters"""
+        parts = [f"limit={limit}"]
+        for name, value in sorted({**(filters or {}), **(options or {})}.items()):
+            if hasattr(value, '_meta') and hasattr(value, 'pk'):
+                value = f"{value._meta.label}:{value.pk}"
+            parts.append(f"{name}={value}")
+        return hashlib.sha1('&'.join(parts).encode()).hexdigest()[:16]
+
+    def _count(self, outcome):
+        key = self.STATS_KEY.format(item_type=self.item_type, outcome=outcome)
+        try:
+            # Seed with SET NX, then INCR, as for the generation counter
+            cache.add(key, 0, timeout=None)
+            cache.incr(key)
+        except Exception as e:
+            logger.error(f"Error counting recommendation cache {outcome} for {self.item_type}: {str(e)}")
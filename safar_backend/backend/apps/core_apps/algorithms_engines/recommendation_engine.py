@@ -1,19 +1,25 @@
 import numpy as np
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.decomposition import TruncatedSVD
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
+from scipy import sparse
 
 import logging
-from django.db import models
-from django.db.models import Q, Case, When, F, Value, FloatField, Count, Avg
-from django.db.models.functions import Coalesce
-from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q, Case, When, F, Value, FloatField, Count
+from django.utils import timezone
+from django.contrib.gis.geos import Point
+from django.contrib.gis.measure import D
 from apps.authentication.models import User, UserInteraction
 from apps.safar.models import Place, Experience, Flight
 from apps.geographic_data.models import City, Region, Country
-from datetime import datetime, timedelta
+from apps.core_apps.algorithms_engines.model_store import ModelStore
+from apps.core_apps.algorithms_engines.ranking import Ranker, RankingContext, top_k_indices
+from apps.core_apps.algorithms_engines.ann_index import IVFIndex
+from apps.core_apps.algorithms_engines.user_factors import UserFactorStore
+from apps.core_apps.algorithms_engines.recommendation_cache import RecommendationCache
+from apps.core_apps.algorithms_engines.popularity import PopularityCounter
+from apps.core_apps.algorithms_engines.item_clustering import ItemClusterer
+from apps.core_apps.algorithms_engines.fallback_lists import FallbackLists
+from apps.core_apps.algorithms_engines import interaction_features
+from apps.core_apps.algorithms_engines.interaction_features import InteractionColumns
+from apps.core_apps.algorithms_engines.user_preferences import UserPreferenceVector
 
 logger = logging.getLogger(__name__)
 
@@ -22,115 +28,94 @@ class RecommendationEngine:
     Enhanced recommendation engine using scikit-learn for machine learning capabilities
     """
     
-    INTERACTION_WEIGHTS = {
-        'booking_complete': 1.0,
-        'booking_start': 0.7,
-        'wishlist_add': 0.6,
-        'rating_given': 0.8,
-        'review_added': 0.5,
-        'view_place': 0.3,
-        'view_experience': 0.3,
-        'recommendation_click': 0.4
-    }
+    # Weighting and decay live in interaction_features, shared with training
+    INTERACTION_WEIGHTS = interaction_features.INTERACTION_WEIGHTS
+    TEMPORAL_DECAY_RATE = interaction_features.TEMPORAL_DECAY_RATE
     
-    TEMPORAL_DECAY_RATE = 0.1  # 10% reduction per month
+    MODEL_NAMESPACE = 'recommendations/{item_type}'
+    SHARD_NAMESPACE = 'recommendations/shards/{item_type}/country-{country_id}'
+    USER_INDEX = 'user_ann'
+    ITEM_INDEX = 'item_ann'
+    SIMILAR_USERS_LIMIT = 100
+    MAX_CO_OCCURRENCE_USERS = 500  # Cap on users scanned for "also liked"
+    BATCH_CHUNK_SIZE = 1000
+    MAX_CLUSTER_ITEMS = 1000  # Cap on items taken from each preferred cluster
+    ITEM_MODELS = {
+        'place': Place,
+        'experience': Experience,
+    }
     
-    def __init__(self, user):
+    def __init__(self, user, as_of=None):
+        """
+        Args:
+            user (User): The user to recommend for
+            as_of (datetime): Only consider interactions recorded before this
+                moment. Used by offline evaluation to replay a past state;
+                bypasses the online vectors and the result cache.
+        """
         if not isinstance(user, User):
             raise ValueError("Must provide a valid User instance")
         self.user = user
+        self.as_of = as_of
         self.profile = user.profile
-        self.user_item_matrix = None
+        self.model = None
+        self.user_factors = None
+        self.item_factors = None
         self.item_features = None
-        self.user_features = None
-        self.svd_model = None
-        self.kmeans_model = None
+        self._interactions = {}
+        self._preferences = None
         
-    def recommend_places(self, limit=5, filters=None, boost_user_preferences=True):
+    def recommend_places(self, limit=5, filters=None, boost_user_preferences=True, origin=None, radius_km=None):
         try:
-            filters = filters or {}
+            filters = self._with_radius(filters or {}, origin, radius_km)
             query = Place.objects.filter(
                 is_available=True,
                 is_deleted=False,
                 **filters
             ).select_related('category', 'country', 'city', 'region')
             
-            # Build feature matrices if not already built
-            self._build_feature_matrices('place')
-            
-            # Apply ML-based recommendations
-            if self.user_item_matrix is not None and self.svd_model is not None:
-                query = self._apply_matrix_factorization(query, 'place')
-            
-            if boost_user_preferences:
-                query = self._apply_preference_boosting(query)
-            
-            # Apply content-based filtering if we have item features
-            if self.item_features is not None:
-                query = self._apply_content_based_filtering(query, 'place')
-            
-            # Apply collaborative filtering
-            query = self._apply_collaborative_filtering(query, 'place')
-            
-            # Apply temporal popularity and user interaction boosts
-            query = self._apply_temporal_popularity(query)
-            query = self._boost_user_interactions(query, 'place')
+            # Load the trained model artifact, the country shard when confined to one
+            self._load_model('place', filters)
             
-            return query.order_by(
-                '-ml_score',
-                '-similarity_score',
-                '-personalization_score', 
-                '-interaction_boost',
-                '-recent_popularity',
-                '-rating'
-            ).distinct()[:limit]
+            places = self._cached_rank(
+                query, 'place', limit, filters, boost_user_preferences,
+                origin=origin, radius_km=radius_km
+            )
+            return places or self._fallback_recommendations(Place, filters, limit)
             
         except Exception as e:
             logger.error(f"Error recommending places: {str(e)}", exc_info=True)
             return self._fallback_recommendations(Place, filters, limit)
     
-    def recommend_experiences(self, limit=5, filters=None):
+    def recommend_experiences(self, limit=5, filters=None, origin=None, radius_km=None):
         try:
-            filters = filters or {}
+            filters = self._with_radius(filters or {}, origin, radius_km)
             query = Experience.objects.filter(
                 is_available=True,
                 is_deleted=False,
                 **filters
             ).select_related('category', 'place', 'owner')
             
-            # Build feature matrices if not already built
-            self._build_feature_matrices('experience')
-            
-            # Apply ML-based recommendations
-            if self.user_item_matrix is not None and self.svd_model is not None:
-                query = self._apply_matrix_factorization(query, 'experience')
-            
-            query = self._apply_preference_boosting(query)
-            
-            # Apply content-based filtering if we have item features
-            if self.item_features is not None:
-                query = self._apply_content_based_filtering(query, 'experience')
+            # Load the trained model artifact, the country shard when confined to one
+            self._load_model('experience', filters)
             
-            # Apply collaborative filtering
-            query = self._apply_collaborative_filtering(query, 'experience')
-            
-            # Apply temporal popularity and user interaction boosts
-            query = self._apply_temporal_popularity(query)
-            query = self._boost_user_interactions(query, 'experience')
-            
-            return query.order_by(
-                '-ml_score',
-                '-similarity_score',
-                '-personalization_score',
-                '-interaction_boost',
-                '-recent_popularity',
-                '-rating'
-            ).distinct()[:limit]
+            experiences = self._cached_rank(
+                query, 'experience', limit, filters,
+                origin=origin, radius_km=radius_km
+            )
+            return experiences or self._fallback_recommendations(Experience, filters, limit)
             
         except Exception as e:
             logger.error(f"Error recommending experiences: {str(e)}", exc_info=True)
             return self._fallback_recommendations(Experience, filters, limit)
     
+    @staticmethod
+    def _with_radius(filters, origin, radius_km):
+        """Restrict the catalog filters to ``radius_km`` around ``origin`` when both are given"""
+        if origin is None or not radius_km:
+            return filters
+        return {**filters, 'location__dwithin': (origin, D(km=radius_km))}
+    
     def recommend_flights(self, origin, destination, date_range, limit=5):
         try:
             start_date, end_date = date_range
@@ -202,16 +187,18 @@ class RecommendationEngine:
     
     def recommend_for_box(self, destination, duration_days, limit_per_category=3):
         try:
-            destination_filters = self._create_destination_filters(destination)
+            origin = self.resolve_origin(destination=destination)
             
             places = self.recommend_places(
                 limit=limit_per_category * 3,
-                filters=destination_filters
+                filters=self._create_destination_filters(destination),
+                origin=origin
             )
             
             experiences = self.recommend_experiences(
                 limit=limit_per_category * 2,
-                filters=destination_filters
+                filters=self._create_destination_filters(destination, prefix='place__'),
+                origin=origin
             )
             
             return {
@@ -223,357 +210,351 @@ class RecommendationEngine:
             logger.error(f"Error recommending for box: {str(e)}", exc_info=True)
             return {'places': Place.objects.none(), 'experiences': Experience.objects.none()}
     
-    def _build_feature_matrices(self, item_type):
-        """Build user-item interaction matrix and feature matrices for ML algorithms"""
-        try:
-            # Get content type for the item type
-            if item_type == 'place':
-                content_type = ContentType.objects.get_for_model(Place)
-            elif item_type == 'experience':
-                content_type = ContentType.objects.get_for_model(Experience)
-            else:
-                return
-            
-            # Get all interactions for this item type
-            interactions = UserInteraction.objects.filter(
-                content_type=content_type,
-                interaction_type__in=self.INTERACTION_WEIGHTS.keys()
-            ).values('user_id', 'object_id', 'interaction_type', 'created_at')
-            
-            if not interactions:
-                return
-            
-            # Convert to DataFrame
-            df = pd.DataFrame(list(interactions))
-            
-            # Apply weights to interactions
-            df['weight'] = df['interaction_type'].map(self.INTERACTION_WEIGHTS)
-            
-            # Apply temporal decay
-            now = datetime.now()
-            df['days_old'] = df['created_at'].apply(lambda x: (now - x).days)
-            df['time_decay'] = df['days_old'].apply(
-                lambda days: max(0.1, 1 - (days / 365) * self.TEMPORAL_DECAY_RATE)
-            )
-            df['final_weight'] = df['weight'] * df['time_decay']
-            
-            # Create user-item matrix
-            user_item_df = df.pivot_table(
-                index='user_id', 
-                columns='object_id', 
-                values='final_weight', 
-                aggfunc='sum',
-                fill_value=0
-            )
-            
-            self.user_item_matrix = user_item_df.values
-            self.user_ids = user_item_df.index.tolist()
-            self.item_ids = user_item_df.columns.tolist()
-            
-            # Train SVD model for matrix factorization
-            self.svd_model = TruncatedSVD(n_components=min(50, min(self.user_item_matrix.shape) - 1))
-            self.user_factors = self.svd_model.fit_transform(self.user_item_matrix)
-            self.item_factors = self.svd_model.components_.T
-            
-            # Build item features
-            if item_type == 'place':
-                items = Place.objects.filter(id__in=self.item_ids).values(
-                    'id', 'name', 'category__name', 'country__name', 'city__name', 
-                    'region__name', 'rating', 'metadata'
-                )
-            else:
-                items = Experience.objects.filter(id__in=self.item_ids).values(
-                    'id', 'name', 'category__name', 'place__name', 'rating', 'metadata'
-                )
-            
-            if not items:
-                return
-            
-            # Convert to DataFrame
-            items_df = pd.DataFrame(list(items))
-            
-            # Extract features
-            feature_columns = []
-            
-            # Process categorical features
-            categorical_features = ['category__name', 'country__name', 'city__name', 'region__name']
-            for feature in categorical_features:
-                if feature in items_df.columns:
-                    # One-hot encode
-                    dummies = pd.get_dummies(items_df[feature], prefix=feature.split('__')[0])
-                    items_df = pd.concat([items_df, dummies], axis=1)
-                    feature_columns.extend(dummies.columns)
-            
-            # Process numerical features
-            if 'rating' in items_df.columns:
-                items_df['rating_scaled'] = items_df['rating'] / 5.0  # Normalize to 0-1
-                feature_columns.append('rating_scaled')
-            
-            # Process metadata (tags)
-            if 'metadata' in items_df.columns:
-                # Extract tags from metadata
-                items_df['tags'] = items_df['metadata'].apply(
-                    lambda x: ' '.join(x.get('tags', [])) if isinstance(x, dict) else ''
-                )
-                
-                # Use TF-IDF for tags
-                tfidf = TfidfVectorizer(max_features=50)
-                if items_df['tags'].str.strip().any():  # Check if there are any non-empty tags
-                    tag_features = tfidf.fit_transform(items_df['tags'].fillna(''))
-                    tag_feature_df = pd.DataFrame(
-                        tag_features.toarray(),
-                        columns=[f'tag_{i}' for i in range(tag_features.shape[1])],
-                        index=items_df.index
-                    )
-                    items_df = pd.concat([items_df, tag_feature_df], axis=1)
-                    feature_columns.extend(tag_feature_df.columns)
-            
-            # Create final feature matrix
-            if feature_columns:
-                self.item_features = items_df[feature_columns].values
-                self.item_id_to_idx = {item_id: idx for idx, item_id in enumerate(items_df['id'])}
-                
-                # Cluster items
-                if self.item_features.shape[0] > 10:  # Only cluster if we have enough items
-                    n_clusters = min(10, self.item_features.shape[0] // 2)
-                    self.kmeans_model = KMeans(n_clusters=n_clusters, random_state=42)
-                    self.item_clusters = self.kmeans_model.fit_predict(self.item_features)
-                    
-                    # Create mapping from item_id to cluster
-                    self.item_id_to_cluster = {
-                        item_id: self.item_clusters[i] 
-                        for i, item_id in enumerate(items_df['id'])
-                    }
-            
-            # Build user features
-            users = User.objects.filter(id__in=self.user_ids).values(
-                'id', 'profile__preferred_countries', 'profile__travel_interests',
-                'profile__gender', 'membership_level'
-            )
-            
-            if users:
-                users_df = pd.DataFrame(list(users))
-                # Process user features here if needed
-                self.user_features = None  # Placeholder for future implementation
+    @classmethod
+    def recommend_batch(cls, user_ids, item_type, k=5, filters=None, exclude_seen=True, chunk_size=None):
+        """
+        Recommend items for many users at once.
+        
+        Users are scored in chunks with one matrix multiply against the item
+        factors per chunk. Catalog filters and already-seen items are applied
+        as masks over the score matrix, and the top-k of every row is taken
+        with ``argpartition``.
+        
+        Args:
+            user_ids (iterable): Users to recommend for
+            item_type (str): 'place' or 'experience'
+            k (int): Items per user
+            filters (dict): Extra catalog filters, as for ``recommend_places``
+            exclude_seen (bool): Leave out items the user already interacted with
+            chunk_size (int): Users scored per matrix multiply
+        
+        Returns:
+            dict: {user_id (str): [item_id (str), ...]}, best first. Empty
+            when there is no trained model.
+        """
+        model = cls.model_store(item_type).load()
+        if model is None or model.item_factors is None:
+            return {}
+        
+        item_factors = np.asarray(model.item_factors)
+        item_index = model.item_index
+        item_ids = model.item_ids
+        
+        # Catalog filters as a mask over the model's items
+        allowed = np.zeros(len(item_ids), dtype=bool)
+        catalog_ids = cls.ITEM_MODELS[item_type].objects.filter(
+            is_available=True,
+            is_deleted=False,
+            **(filters or {})
+        ).values_list('id', flat=True)
+        for item_id in catalog_ids.iterator():
+            idx = item_index.get(str(item_id))
+            if idx is not None:
+                allowed[idx] = True
+        if not allowed.any():
+            return {}
+        
+        factor_store = UserFactorStore(model)
+        mean_vector = np.mean(model.user_factors, axis=0)
+        interactions = model.interactions if exclude_seen else None
+        chunk_size = chunk_size or cls.BATCH_CHUNK_SIZE
+        k = min(k, int(allowed.sum()))
+        
+        results = {}
+        user_ids = [str(user_id) for user_id in user_ids]
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            online_vectors = factor_store.get_many(chunk)
+            rows = [model.user_index.get(user_id) for user_id in chunk]
+            
+            user_matrix = np.vstack([
+                online_vectors[user_id] if user_id in online_vectors
+                else model.user_factors[row] if row is not None
+                else mean_vector
+                for user_id, row in zip(chunk, rows)
+            ]).astype(np.float32)
+            
+            scores = user_matrix @ item_factors.T
+            scores[:, ~allowed] = -np.inf
+            
+            if interactions is not None:
+                # Mask items each trained user has already interacted with
+                known = [(position, row) for position, row in enumerate(rows) if row is not None]
+                if known:
+                    seen = interactions[[row for _, row in known]].tocoo()
+                    positions = np.array([position for position, _ in known])
+                    scores[positions[seen.row], seen.col] = -np.inf
+            
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            top = np.take_along_axis(top, np.argsort(-top_scores, axis=1), axis=1)
+            
+            for position, user_id in enumerate(chunk):
+                results[user_id] = [
+                    str(item_ids[idx]) for idx in top[position]
+                    if np.isfinite(scores[position, idx])
+                ]
         
+        return results
+    
+    @classmethod
+    def model_store(cls, item_type, country_id=None):
+        """Return the model store holding trained artifacts for an item type, or for one of its country shards"""
+        if country_id is not None:
+            return ModelStore(cls.SHARD_NAMESPACE.format(item_type=item_type, country_id=country_id))
+        return ModelStore(cls.MODEL_NAMESPACE.format(item_type=item_type))
+    
+    @staticmethod
+    def shard_country(filters):
+        """Return the id of the country catalog filters confine results to, if any"""
+        for name, value in (filters or {}).items():
+            field = name[len('place__'):] if name.startswith('place__') else name
+            if field == 'country':
+                return getattr(value, 'pk', value)
+            if field in ('city', 'region') and isinstance(value, (City, Region)):
+                return value.country_id
+        return None
+    
+    def _load_model(self, item_type, filters=None):
+        """
+        Load the current trained model for the item type.
+        
+        Training happens offline (see ``train_recommendation_models``); here we
+        only pick up the memory-mapped artifact, which is shared across requests.
+        When the filters confine results to a country with its own shard,
+        that smaller model is used instead of the global one.
+        """
+        try:
+            self.model = None
+            country_id = self.shard_country(filters)
+            if country_id is not None:
+                self.model = self.model_store(item_type, country_id).load()
+            if self.model is None:
+                self.model = self.model_store(item_type).load()
         except Exception as e:
-            logger.error(f"Error building feature matrices: {str(e)}", exc_info=True)
-            self.user_item_matrix = None
+            logger.error(f"Error loading recommendation model: {str(e)}", exc_info=True)
+            self.model = None
+        
+        if self.model is None:
+            self.user_factors = None
+            self.item_factors = None
             self.item_features = None
-            self.user_features = None
-            self.svd_model = None
+            return
+        
+        self.user_factors = self.model.user_factors
+        self.item_factors = self.model.item_factors
+        self.item_features = self.model.item_features
     
-    def _apply_matrix_factorization(self, queryset, item_type):
-        """Apply matrix factorization recommendations using SVD"""
-        try:
-            if self.user_item_matrix is None or self.svd_model is None:
-                return queryset.annotate(ml_score=Value(0, FloatField()))
-            
-            # Get user index
-            try:
-                user_idx = self.user_ids.index(self.user.id)
-            except ValueError:
-                # User not in the matrix, use average user vector
-                user_idx = None
-                user_vector = np.mean(self.user_factors, axis=0)
-            
-            if user_idx is not None:
-                user_vector = self.user_factors[user_idx]
-            
-            # Calculate predicted ratings for all items
-            predicted_ratings = np.dot(user_vector, self.svd_model.components_)
-            
-            # Map item IDs to their predicted ratings
-            item_ratings = {
-                self.item_ids[i]: float(predicted_ratings[i])
-                for i in range(len(self.item_ids))
-            }
-            
-            # Normalize ratings to 0-1 scale
-            if item_ratings:
-                min_rating = min(item_ratings.values())
-                max_rating = max(item_ratings.values())
-                rating_range = max_rating - min_rating
-                
-                if rating_range > 0:
-                    normalized_ratings = {
-                        item_id: (rating - min_rating) / rating_range
-                        for item_id, rating in item_ratings.items()
-                    }
-                else:
-                    normalized_ratings = {
-                        item_id: 0.5 for item_id in item_ratings
-                    }
-                
-                # Apply ratings to queryset
-                return queryset.annotate(
-                    ml_score=Case(
-                        *[
-                            When(id=item_id, then=Value(score, FloatField()))
-                            for item_id, score in normalized_ratings.items()
-                        ],
-                        default=Value(0, FloatField()),
-                        output_field=FloatField()
-                    )
-                )
-            
-            return queryset.annotate(ml_score=Value(0, FloatField()))
+    def _get_user_vector(self, item_type):
+        """Return the user's latent factor vector, or the average user's if unknown"""
+        user_vector = self._get_known_user_vector(item_type)
+        if user_vector is None:
+            # No usable history, use the average user vector
+            return np.mean(self.user_factors, axis=0)
+        return user_vector
+    
+    def _get_known_user_vector(self, item_type):
+        """
+        Return the user's latent factor vector, or None if they have no history.
         
-        except Exception as e:
-            logger.error(f"Error applying matrix factorization: {str(e)}", exc_info=True)
-            return queryset.annotate(ml_score=Value(0, FloatField()))
+        The online vector, updated as interactions arrive, takes precedence.
+        Otherwise users trained into the model use their learned row, and
+        users who joined or started interacting after the last training run
+        are folded in by projecting their sparse interaction row onto the
+        item factors, which is exactly how SVD maps a row into the latent space.
+        """
+        if item_type is not None and self.as_of is None:
+            online_vector = UserFactorStore(self.model).get(self.user.id)
+            if online_vector is not None:
+                return online_vector
+        
+        user_idx = self.model.user_index.get(str(self.user.id))
+        if user_idx is not None:
+            return self.user_factors[user_idx]
+        
+        if item_type is not None:
+            user_row = self._get_user_interaction_row(item_type)
+            if user_row.nnz:
+                return np.asarray(user_row @ self.item_factors).ravel()
+        
+        return None
     
-    def _apply_content_based_filtering(self, queryset, item_type):
-        """Apply content-based filtering using item features"""
-        try:
-            if self.item_features is None or not hasattr(self, 'item_id_to_idx'):
-                return queryset
-            
-            # Get user's past interactions
-            user_interactions = UserInteraction.objects.filter(
+    def _get_user_interaction_row(self, item_type):
+        """Build the user's weighted, time-decayed 1 x items interaction row (CSR)"""
+        item_index = self.model.item_index
+        interactions = self.get_user_interactions(item_type)
+        
+        cols, data = [], []
+        for object_id, weight in zip(interactions['object_id'], interactions['weight'].tolist()):
+            idx = item_index.get(object_id)
+            if idx is not None:
+                cols.append(idx)
+                data.append(weight)
+        
+        return sparse.csr_matrix(
+            (np.array(data, dtype=np.float32), (np.zeros(len(cols), dtype=np.int32), np.array(cols, dtype=np.int32))),
+            shape=(1, len(item_index))
+        )
+    
+    def _cached_rank(self, queryset, item_type, limit, filters, boost_user_preferences=True,
+                     origin=None, radius_km=None):
+        """
+        Serve the ranking from the per-user result cache, ranking and caching on a miss.
+        
+        Cached lists are invalidated when the user interacts or changes their
+        preferences, and whenever a new model version is published.
+        """
+        if self.as_of is not None:
+            return self._rank(queryset, item_type, limit, boost_user_preferences, origin, radius_km)
+        
+        results_cache = RecommendationCache(
+            self.user.id, item_type, self.model.version if self.model is not None else None
+        )
+        cache_options = {
+            'boost': boost_user_preferences,
+            # ~100m precision is plenty for a cache key
+            'origin': f"{origin.y:.3f},{origin.x:.3f}" if origin is not None else None,
+            'radius': radius_km,
+        }
+        cached_ids = results_cache.get(filters, limit, **cache_options)
+        if cached_ids is not None:
+            items = self._hydrate_items(queryset, cached_ids, limit)
+            # Items that left the catalog since caching force a fresh ranking
+            if len(items) == len(cached_ids):
+                return items
+        
+        items = self._rank(queryset, item_type, limit, boost_user_preferences, origin, radius_km)
+        if items:
+            results_cache.set([item.id for item in items], filters, limit, **cache_options)
+        return items
+    
+    def _rank(self, queryset, item_type, limit, boost_user_preferences=True, origin=None, radius_km=None):
+        """
+        Rank the catalog queryset in-process.
+        
+        A bounded candidate set is fetched from the database, every score
+        component is computed as a NumPy vector over it and only the top
+        ``limit`` rows are hydrated. With an ``origin`` the nearest items are
+        added to the candidates and proximity becomes part of the score.
+        """
+        weights = Ranker.get_weights()
+        if not boost_user_preferences:
+            weights['personalization_score'] = 0.0
+        
+        context = RankingContext(self, item_type, queryset, origin=origin, radius_km=radius_km)
+        return Ranker(weights=weights).rank(context, limit)
+    
+    def get_user_interactions(self, item_type):
+        """
+        Return the user's interactions with an item type as aligned columns.
+        
+        Returns:
+            dict: ``object_id`` (list of str) and ``weight`` (weighted,
+            time-decayed numpy array)
+        """
+        if item_type not in self._interactions:
+            columns = InteractionColumns.from_queryset(self._before_as_of(UserInteraction.objects.filter(
                 user=self.user,
-                interaction_type__in=self.INTERACTION_WEIGHTS.keys()
-            )
-            
-            if item_type == 'place':
-                user_interactions = user_interactions.filter(content_type__model='place')
-            elif item_type == 'experience':
-                user_interactions = user_interactions.filter(content_type__model='experience')
-            
-            if not user_interactions:
-                return queryset
-            
-            # Get item IDs the user has interacted with
-            interacted_item_ids = user_interactions.values_list('object_id', flat=True)
-            
-            # Get indices of items the user has interacted with
-            interacted_indices = [
-                self.item_id_to_idx[item_id] 
-                for item_id in interacted_item_ids 
-                if item_id in self.item_id_to_idx
-            ]
-            
-            if not interacted_indices:
-                return queryset
-            
-            # Get features of items the user has interacted with
-            interacted_features = self.item_features[interacted_indices]
-            
-            # Calculate user profile as the average of interacted item features
-            user_profile = np.mean(interacted_features, axis=0)
-            
-            # Calculate similarity between user profile and all items
-            similarities = cosine_similarity([user_profile], self.item_features)[0]
-            
-            # Map item IDs to their similarity scores
-            item_similarities = {
-                item_id: float(similarities[self.item_id_to_idx[item_id]])
-                for item_id in self.item_id_to_idx
-                if item_id in queryset.values_list('id', flat=True)
+                content_type__model=item_type
+            )))
+            self._interactions[item_type] = {
+                'object_id': columns.object_ids(),
+                'weight': columns.weights(self.as_of),
             }
-            
-            # Apply similarity scores to queryset
-            return queryset.annotate(
-                content_similarity=Case(
-                    *[
-                        When(id=item_id, then=Value(score, FloatField()))
-                        for item_id, score in item_similarities.items()
-                    ],
-                    default=Value(0, FloatField()),
-                    output_field=FloatField()
-                )
-            )
+        return self._interactions[item_type]
+    
+    def _before_as_of(self, interactions):
+        """Restrict an interaction queryset to the engine's ``as_of`` moment, if any"""
+        if self.as_of is None:
+            return interactions
+        return interactions.filter(created_at__lt=self.as_of)
+    
+    def predict_item_scores(self, item_type):
+        """
+        Predict 0-1 scaled matrix factorization scores for every item in the model.
         
-        except Exception as e:
-            logger.error(f"Error applying content-based filtering: {str(e)}", exc_info=True)
-            return queryset
+        Returns:
+            numpy.ndarray | None: Scores aligned with ``self.model.item_ids``
+        """
+        if self.model is None:
+            return None
+        
+        predicted_ratings = np.dot(self.item_factors, self._get_user_vector(item_type))
+        if not len(predicted_ratings):
+            return predicted_ratings
+        
+        # Normalize ratings to 0-1 scale
+        min_rating = predicted_ratings.min()
+        rating_range = predicted_ratings.max() - min_rating
+        if rating_range > 0:
+            return (predicted_ratings - min_rating) / rating_range
+        return np.full(len(predicted_ratings), 0.5)
     
-    def _apply_collaborative_filtering(self, queryset, item_type):
-        """Apply collaborative filtering using user-item interactions"""
-        try:
-            similar_users = self._find_similar_users()
-            
-            if not similar_users:
-                return queryset.annotate(similarity_score=Value(0, FloatField()))
-            
-            interactions = UserInteraction.objects.filter(
-                user__in=similar_users,
-                interaction_type__in=self.INTERACTION_WEIGHTS.keys()
-            )
-            
-            if item_type == 'place':
-                interactions = interactions.filter(content_type__model='place')
-            elif item_type == 'experience':
-                interactions = interactions.filter(content_type__model='experience')
-            
-            time_decay = Case(
-                *[
-                    When(
-                        created_at__gte=datetime.now() - timedelta(days=30*i),
-                        then=1 - (self.TEMPORAL_DECAY_RATE * i)
-                    ) for i in range(0, 12)
-                ],
-                default=0.1,
-                output_field=FloatField()
-            )
-            
-            weighted_interactions = interactions.annotate(
-                interaction_weight=Case(
-                    *[
-                        When(interaction_type=k, then=v) 
-                        for k, v in self.INTERACTION_WEIGHTS.items()
-                    ],
-                    default=0.1,
-                    output_field=FloatField()
-                ),
-                time_decay=time_decay,
-                total_weight=F('interaction_weight') * F('time_decay')
-            )
-            
-            item_scores = weighted_interactions.values('object_id').annotate(
-                similarity_score=Coalesce(
-                    Avg('total_weight'),
-                    Value(0, FloatField())
-                )
-            )
-            
-            if not item_scores:
-                return queryset.annotate(similarity_score=Value(0, FloatField()))
-            
-            score_mapping = {
-                score['object_id']: score['similarity_score']
-                for score in item_scores
-            }
-            
-            return queryset.annotate(
-                similarity_score=Case(
-                    *[
-                        When(id=item_id, then=score)
-                        for item_id, score in score_mapping.items()
-                    ],
-                    default=Value(0, FloatField()),
-                    output_field=FloatField()
-                )
-            )
+    def model_item_scores(self, item_type, items, filters=None):
+        """
+        Matrix factorization scores of given items for the user.
         
-        except Exception as e:
-            logger.error(f"Error applying collaborative filtering: {str(e)}", exc_info=True)
-            return queryset.annotate(similarity_score=Value(0, FloatField()))
+        Args:
+            item_type (str): 'place' or 'experience'
+            items (list): Items to score
+            filters (dict): Catalog filters, used to pick a country shard
+        
+        Returns:
+            numpy.ndarray | None: 0-1 scores aligned with ``items``, NaN for
+            items the model doesn't know; None without a trained model
+        """
+        self._load_model(item_type, filters)
+        scores = self.predict_item_scores(item_type)
+        if scores is None:
+            return None
+        
+        positions = np.fromiter(
+            (self.model.item_index.get(str(item.pk), -1) for item in items),
+            dtype=np.int64, count=len(items)
+        )
+        known = positions >= 0
+        result = np.full(len(items), np.nan)
+        result[known] = scores[positions[known]]
+        return result
     
-    def _find_similar_users(self):
+    def collaborative_item_scores(self, item_type):
+        """
+        Score items by the weighted, time-decayed interactions of similar users.
+        
+        Returns:
+            dict: {item_id: average interaction weight}
+        """
+        similar_users = self._find_similar_users(item_type)
+        similar_user_ids = list(similar_users.values_list('id', flat=True))
+        if not similar_user_ids:
+            return {}
+        
+        columns = InteractionColumns.from_queryset(self._before_as_of(UserInteraction.objects.filter(
+            user__in=similar_user_ids,
+            content_type__model=item_type
+        )))
+        if not len(columns):
+            return {}
+        
+        # Item codes index the column vocabulary, so aggregation is a bincount
+        totals = np.bincount(columns.item_codes, weights=columns.weights(self.as_of), minlength=len(columns.items))
+        counts = np.bincount(columns.item_codes, minlength=len(columns.items))
+        return dict(zip(columns.items.tolist(), (totals / counts).tolist()))
+    
+    def _find_similar_users(self, item_type=None):
         """Find users similar to the current user using multiple methods"""
         try:
-            # Use matrix factorization if available
-            if hasattr(self, 'user_factors') and self.user.id in self.user_ids:
-                user_idx = self.user_ids.index(self.user.id)
-                user_vector = self.user_factors[user_idx]
-                
-                # Calculate similarity between this user and all other users
-                user_similarities = cosine_similarity([user_vector], self.user_factors)[0]
-                
-                # Get top similar users (excluding self)
-                similar_indices = np.argsort(user_similarities)[::-1][1:101]  # Top 100 similar users
-                similar_user_ids = [self.user_ids[idx] for idx in similar_indices]
+            # Use the ANN index over the user factors if available
+            user_index = self._get_ann_index(self.model, self.USER_INDEX) if self.model is not None else None
+            user_vector = self._get_known_user_vector(item_type) if user_index is not None else None
+            if user_vector is not None:
+                own_idx = self.model.user_index.get(str(self.user.id))
+                neighbours, _ = user_index.search(
+                    user_vector,
+                    k=self.SIMILAR_USERS_LIMIT,
+                    exclude=None if own_idx is None else [own_idx]
+                )
+                similar_user_ids = [str(self.model.user_ids[idx]) for idx in neighbours]
                 
                 return User.objects.filter(id__in=similar_user_ids)
             
@@ -587,14 +568,145 @@ class RecommendationEngine:
             logger.error(f"Error finding similar users: {str(e)}", exc_info=True)
             return User.objects.none()
     
+    @staticmethod
+    def _get_ann_index(model, prefix):
+        """Return the ANN index published under ``prefix``, built once per loaded artifact"""
+        return model.memoize(prefix, lambda artifact: IVFIndex.from_artifact(artifact, prefix))
+    
+    @classmethod
+    def similar_items(cls, item_type, item_id, queryset, limit=5):
+        """
+        Find the items closest to ``item_id`` in the latent factor space.
+        
+        Args:
+            item_type (str): 'place' or 'experience'
+            item_id: Id of the reference item
+            queryset (QuerySet): Catalog queryset results must belong to
+            limit (int): Maximum number of items
+        
+        Returns:
+            list | None: Similar items, best first, or None if the model
+            does not know the item
+        """
+        model = cls.model_store(item_type).load()
+        if model is None:
+            return None
+        
+        item_idx = model.item_index.get(str(item_id))
+        item_index = cls._get_ann_index(model, cls.ITEM_INDEX)
+        if item_idx is None or item_index is None:
+            return None
+        
+        # Over-fetch so items filtered out by the queryset can be skipped
+        neighbours, _ = item_index.search(item_index.vectors[item_idx], k=limit * 3, exclude=[item_idx])
+        return cls._hydrate_items(queryset, [str(model.item_ids[idx]) for idx in neighbours], limit)
+    
+    @classmethod
+    def also_liked(cls, item_type, item_id, queryset, limit=5):
+        """
+        "People who liked this also liked": items co-occurring with ``item_id``
+        in the interactions of the same users, weighted by interaction strength.
+        
+        Falls back to latent-space neighbours when the item has no co-occurrences.
+        
+        Returns:
+            list | None: Items, best first, or None if the model does not know the item
+        """
+        model = cls.model_store(item_type).load()
+        if model is None:
+            return None
+        
+        item_idx = model.item_index.get(str(item_id))
+        if item_idx is None:
+            return None
+        
+        if model.is_sparse('item_users'):
+            item_users = model.sparse('item_users')[item_idx]
+            users = item_users.indices
+            if len(users) > cls.MAX_CO_OCCURRENCE_USERS:
+                users = users[top_k_indices(item_users.data, cls.MAX_CO_OCCURRENCE_USERS)]
+            
+            co_occurrence = np.asarray(model.interactions[users].sum(axis=0)).ravel()
+            co_occurrence[item_idx] = 0
+            
+            related = np.flatnonzero(co_occurrence)
+            if len(related):
+                top = related[top_k_indices(co_occurrence[related], limit * 3)]
+                items = cls._hydrate_items(queryset, [str(model.item_ids[idx]) for idx in top], limit)
+                if items:
+                    return items
+        
+        return cls.similar_items(item_type, item_id, queryset, limit)
+    
+    @classmethod
+    def same_cluster_items(cls, item_type, item_id, queryset, limit=5):
+        """
+        Items from the same content cluster as ``item_id``, best rated first.
+        
+        Works for items the trained model has not seen yet, since clusters
+        are built from the catalog's content embeddings.
+        
+        Returns:
+            list | None: Items, or None if the item is not clustered yet
+        """
+        clusters = ItemClusterer.load(item_type)
+        if clusters is None:
+            return None
+        item_ids = clusters.same_cluster(item_id, limit=cls.MAX_CLUSTER_ITEMS)
+        if not item_ids:
+            return None
+        return list(queryset.filter(id__in=item_ids).order_by('-rating')[:limit])
+    
+    @classmethod
+    def trending(cls, item_type, queryset, limit=10):
+        """
+        Most popular items by the rolling, decay-weighted interaction counters.
+        
+        Returns:
+            list: Items from the queryset, most popular first
+        """
+        # Over-fetch so items filtered out by the queryset can be skipped
+        item_ids = [item_id for item_id, _ in PopularityCounter(item_type).top(limit * 3)]
+        return cls._hydrate_items(queryset, item_ids, limit)
+    
+    @classmethod
+    def cold_start(cls, item_type, queryset, filters=None, limit=10):
+        """
+        Recommendations that need no user and no model, e.g. for anonymous visitors.
+        
+        Args:
+            item_type (str): 'place' or 'experience'
+            queryset (QuerySet): Catalog queryset results must belong to
+            filters (dict): At most one destination or category filter, as for
+                ``FallbackLists.ids_for_filters``
+            limit (int): Maximum number of items
+        
+        Returns:
+            list: Items from the nightly precomputed list, best first, or the
+            best rated items when no list is available
+        """
+        filters = filters or {}
+        item_ids = FallbackLists(item_type).ids_for_filters(filters)
+        if item_ids:
+            items = cls._hydrate_items(queryset.filter(**filters), item_ids[:limit * 3], limit)
+            if items:
+                return items
+        return list(queryset.filter(**filters).order_by('-rating', '-created_at')[:limit])
+    
+    @staticmethod
+    def _hydrate_items(queryset, item_ids, limit):
+        """Fetch ``item_ids`` from the queryset with one query, keeping their order"""
+        items = {str(pk): item for pk, item in queryset.in_bulk(item_ids).items()}
+        return [items[item_id] for item_id in item_ids if item_id in items][:limit]
+    
     def _find_similar_users_content_based(self):
         """Find users with similar preferences"""
         similar_users = User.objects.exclude(id=self.user.id)
         
-        if self.profile.preferred_countries.exists():
+        if self.preferences.country_ids:
             country_overlap = Count(
                 'profile__preferred_countries',
-                filter=Q(profile__preferred_countries__in=self.profile.preferred_countries.all())
+                filter=Q(profile__preferred_countries__in=list(self.preferences.country_ids))
             )
             similar_users = similar_users.annotate(
                 country_similarity=country_overlap
@@ -613,252 +725,113 @@ class RecommendationEngine:
     
     def _find_similar_users_behavior_based(self):
         """Find users with similar behavior patterns"""
-        user_interactions = self.user.interactions.filter(
+        user_interactions = self._before_as_of(self.user.interactions.filter(
             interaction_type__in=self.INTERACTION_WEIGHTS.keys()
-        ).values_list('content_type', 'object_id', 'interaction_type')
+        )).values_list('content_type', 'object_id', 'interaction_type')
         
         if not user_interactions:
             return User.objects.none()
         
-        similar_users = UserInteraction.objects.filter(
+        similar_users = self._before_as_of(UserInteraction.objects.filter(
             content_type__in=[x[0] for x in user_interactions],
             object_id__in=[x[1] for x in user_interactions],
             interaction_type__in=[x[2] for x in user_interactions]
-        ).exclude(user=self.user).values('user').annotate(
+        )).exclude(user=self.user).values('user').annotate(
             similarity=Count('id')
         ).order_by('-similarity').values_list('user', flat=True)[:100]
         
         return User.objects.filter(id__in=similar_users)
     
-    def _apply_preference_boosting(self, queryset):
-        """Apply boosting based on user preferences"""
-        queryset = queryset.annotate(
-            base_score=Case(
-                When(rating__gte=4.5, then=0.3),
-                When(rating__gte=4.0, then=0.2),
-                When(rating__gte=3.0, then=0.1),
-                default=0.0,
-                output_field=models.FloatField()
-            )
-        )
-        
-        if self.profile.preferred_countries.exists():
-            queryset = queryset.annotate(
-                country_score=Case(
-                    When(country__in=self.profile.preferred_countries.all(), then=0.3),
-                    default=0.0,
-                    output_field=models.FloatField()
-                )
-            )
-        
-        if self.profile.travel_interests:
-            category_boost = Case(
-                When(category__name__in=self.profile.travel_interests, then=0.2),
-                default=0.0,
-                output_field=models.FloatField()
-            )
-            
-            tag_boost = Case(
-                When(metadata__tags__overlap=self.profile.travel_interests, then=0.15),
-                default=0.0,
-                output_field=models.FloatField()
-            )
-            
-            queryset = queryset.annotate(
-                interest_score=category_boost + tag_boost
-            )
-        
-        score_components = ['base_score']
-        if 'country_score' in queryset.query.annotations:
-            score_components.append('country_score')
-        if 'interest_score' in queryset.query.annotations:
-            score_components.append('interest_score')
-        
-        queryset = queryset.annotate(
-            personalization_score=models.ExpressionWrapper(
-                models.F('+'.join(score_components)),
-                output_field=models.FloatField()
-            )
-        )
-        
-        return queryset
-    
-    def _apply_temporal_popularity(self, queryset):
-        """Apply boosting based on recent popularity"""
-        recent_interactions = UserInteraction.objects.filter(
-            created_at__gte=datetime.now() - timedelta(days=90)
-        )
-        
-        popularity = recent_interactions.values(
-            'content_type', 'object_id'
-        ).annotate(
-            popularity_score=Count('id') * Case(
-                When(created_at__gte=datetime.now() - timedelta(days=7), then=1.0),
-                When(created_at__gte=datetime.now() - timedelta(days=30), then=0.7),
-                default=0.3,
-                output_field=FloatField()
-            )
-        )
-        
-        if not popularity:
-            return queryset.annotate(recent_popularity=Value(0, FloatField()))
-        
-        model = queryset.model
-        content_type = ContentType.objects.get_for_model(model)
-        
-        popularity_scores = {
-            x['object_id']: x['popularity_score']
-            for x in popularity
-            if x['content_type'] == content_type.id
-        }
-        
-        return queryset.annotate(
-            recent_popularity=Case(
-                *[
-                    When(id=item_id, then=score)
-                    for item_id, score in popularity_scores.items()
-                ],
-                default=Value(0, FloatField()),
-                output_field=FloatField()
-            )
-        )
-    
-    def _boost_user_interactions(self, queryset, item_type):
-        """Boost items the user has interacted with"""
-        interactions = self.user.interactions.filter(
-            content_type__model=item_type,
-            interaction_type__in=self.INTERACTION_WEIGHTS.keys()
-        ).annotate(
-            weight=Case(
-                *[
-                    When(interaction_type=k, then=v)
-                    for k, v in self.INTERACTION_WEIGHTS.items()
-                ],
-                default=0.1,
-                output_field=FloatField()
-            )
-        )
-        
-        if not interactions:
-            return queryset.annotate(interaction_boost=Value(0, FloatField()))
-        
-        boost_mapping = {
-            i.object_id: i.weight * (
-                1 - (datetime.now() - i.created_at).days/365 * self.TEMPORAL_DECAY_RATE
-            )
-            for i in interactions
-        }
-        
-        return queryset.annotate(
-            interaction_boost=Case(
-                *[
-                    When(id=item_id, then=score)
-                    for item_id, score in boost_mapping.items()
-                ],
-                default=Value(0, FloatField()),
-                output_field=FloatField()
-            )
-        )
-    
     def _fallback_recommendations(self, model_class, filters, limit):
-        """Provide fallback recommendations when ML methods fail"""
+        """
+        Provide fallback recommendations when ML methods fail.
+        
+        Served from the nightly precomputed lists (see ``FallbackLists``)
+        whenever the filters map onto one; otherwise from the content
+        clusters the user interacted with, then the best rated items.
+        """
         try:
+            item_type = model_class.__name__.lower()
             queryset = model_class.objects.filter(
                 is_available=True,
                 is_deleted=False,
                 **filters
             )
             
-            # Try to use user preferences if available
-            if self.profile.preferred_countries.exists():
-                pref_country_query = queryset.filter(
-                    country__in=self.profile.preferred_countries.all()
-                ).order_by('-rating', '-created_at')[:limit]
+            preferred_countries = [] if filters else sorted(self.preferences.country_ids)
+            item_ids = FallbackLists(item_type).ids_for_filters(filters, preferred_countries)
+            if item_ids:
+                items = self._hydrate_items(queryset, item_ids[:limit * 3], limit)
+                if len(items) >= limit:
+                    return items
+            
+            # Recommend from the content clusters the user has interacted with most
+            clusters = ItemClusterer.load(item_type)
+            if clusters is not None:
+                user_interactions = self._before_as_of(self.user.interactions.filter(
+                    content_type__model=item_type
+                )).values_list('object_id', flat=True)
                 
-                if pref_country_query.count() >= limit:
-                    return pref_country_query
-            
-            # If we have item clusters, try to recommend from clusters the user has interacted with
-            if hasattr(self, 'item_id_to_cluster') and hasattr(self, 'kmeans_model'):
-                user_interactions = self.user.interactions.filter(
-                    content_type__model=model_class.__name__.lower()
-                ).values_list('object_id', flat=True)
+                preferred_items = []
+                for cluster in clusters.top_clusters(user_interactions, limit=3):
+                    preferred_items.extend(clusters.items_in(cluster, limit=self.MAX_CLUSTER_ITEMS))
                 
-                # Get clusters of items the user has interacted with
-                user_clusters = [
-                    self.item_id_to_cluster.get(item_id)
-                    for item_id in user_interactions
-                    if item_id in self.item_id_to_cluster
-                ]
-                
-                if user_clusters:
-                    # Count frequency of each cluster
-                    cluster_counts = {}
-                    for cluster in user_clusters:
-                        if cluster is not None:
-                            cluster_counts[cluster] = cluster_counts.get(cluster, 0) + 1
-                    
-                    # Get most frequent clusters
-                    preferred_clusters = sorted(
-                        cluster_counts.keys(),
-                        key=lambda c: cluster_counts[c],
-                        reverse=True
-                    )[:3]
-                    
-                    # Get items from preferred clusters
-                    preferred_items = [
-                        item_id for item_id, cluster in self.item_id_to_cluster.items()
-                        if cluster in preferred_clusters
-                    ]
-                    
-                    if preferred_items:
-                        cluster_query = queryset.filter(id__in=preferred_items).order_by('-rating')[:limit]
-                        if cluster_query.count() > 0:
-                            return cluster_query
-            
-            # Fall back to popular items
-            popular_query = queryset.order_by('-rating', '-created_at')[:limit]
-            if popular_query.exists():
-                return popular_query
+                if preferred_items:
+                    cluster_items = list(queryset.filter(id__in=preferred_items).order_by('-rating')[:limit])
+                    if cluster_items:
+                        return cluster_items
             
-            # Last resort: newest items
-            return queryset.order_by('-created_at')[:limit]
+            # Then to the best rated items
+            return queryset.order_by('-rating', '-created_at')[:limit]
             
         except Exception as e:
             logger.error(f"Fallback recommendation failed: {str(e)}")
             return model_class.objects.none()
     
-    def _create_destination_filters(self, destination):
-        """Create filters based on destination type"""
+    def _create_destination_filters(self, destination, prefix=''):
+        """
+        Create filters based on destination type.
+        
+        ``prefix`` reaches the destination through a relation, e.g. 'place__'
+        for experiences, which are located through their place.
+        """
         if isinstance(destination, City):
-            return {'city': destination}
+            return {f'{prefix}city': destination}
         elif isinstance(destination, Region):
-            return {'region': destination}
+            return {f'{prefix}region': destination}
         elif isinstance(destination, Country):
-            return {'country': destination}
+            return {f'{prefix}country': destination}
         else:
             raise ValueError("Invalid destination type")
     
-    def calculate_personalization_score(self, item):
-        """Calculate personalization score for a single item"""
-        score = 0.0
+    def resolve_origin(self, origin=None, destination=None):
+        """
+        Resolve the point to rank around.
         
-        if hasattr(item, 'country') and item.country and self.profile.preferred_countries.exists():
-            if item.country in self.profile.preferred_countries.all():
-                score += 0.3
+        Args:
+            origin: An explicit ``Point`` or ``(latitude, longitude)`` pair
+            destination: A City, Region or Country whose location is used
         
-        if hasattr(item, 'category') and self.profile.travel_interests:
-            if item.category.name in self.profile.travel_interests:
-                score += 0.2
-            elif any(tag in self.profile.travel_interests for tag in item.metadata.get('tags', [])):
-                score += 0.15
+        Returns:
+            Point | None: The explicit origin, else the destination's centre,
+            else the user's profile location
+        """
+        if isinstance(origin, Point):
+            return origin
+        if origin is not None:
+            latitude, longitude = origin
+            return Point(float(longitude), float(latitude), srid=4326)
         
-        if hasattr(item, 'rating'):
-            score += item.rating * 0.1
-        
-        if hasattr(item, 'price') and item.price and self.profile.metadata.get('price_preference'):
-            user_pref = self.profile.metadata['price_preference']
-            price_score = max(0, 1 - (item.price / user_pref['max']))
-            score += price_score * 0.1
+        if isinstance(destination, City):
+            return destination.geometry
+        if isinstance(destination, (Region, Country)) and destination.centroid:
+            return destination.centroid
         
-        return min(max(score, 0.0), 1.0)
\ No newline at end of file
+        return self.profile.location
+    
+    @property
+    def preferences(self):
+        """The user's preference vector, loaded on first use"""
+        if self._preferences is None:
+            self._preferences = UserPreferenceVector.from_profile(self.profile)
+        return self._preferences
\ No newline at end of file
@@ -0,0 +1,223 @@
+import hashlib
+import logging
+import time
+
+import numpy as np
+from django.core.cache import cache
+
+from apps.core_apps.algorithms_engines.geo_clustering import haversine_km, to_radians
+
+logger = logging.getLogger(__name__)
+
+
+def activity_key(activity):
+    """Stable key of a Place or Experience, unique across both tables"""
+    return f"{activity._meta.model_name}:{activity.pk}"
+
+
+class TravelMatrix:
+    """
+    Pairwise distances (km) and estimated travel times (minutes) between a
+    set of activities, indexed by ``activity_key``.
+
+    Pairs involving an activity without a location have zero distance and
+    time, so they never constrain a route.
+    """
+
+    def __init__(self, keys, distances, minutes):
+        self.keys = list(keys)
+        self.index = {key: position for position, key in enumerate(self.keys)}
+        self.distances = distances
+        self.minutes = minutes
+
+    def __len__(self):
+        return len(self.keys)
+
+    def positions(self, keys):
+        return np.array([self.index[key] for key in keys], dtype=np.int64)
+
+    def submatrix(self, keys):
+        """Travel minutes between ``keys``, in that order"""
+        positions = self.positions(keys)
+        return self.minutes[np.ix_(positions, positions)]
+
+    def minutes_between(self, origin, destination):
+        return float(self.minutes[self.index[origin], self.index[destination]])
+
+
+class TravelTimeService:
+    """
+    Estimate travel times between activities and sequence a day's route.
+
+    Distances are vectorised haversine distances stretched by
+    ``DETOUR_FACTOR`` to approximate the street network; times come from a
+    tiered speed model of ``(max km, km/h)`` pairs, so short hops are walked
+    and longer ones use transport plus a fixed transfer overhead. Matrices
+    are cached per destination and candidate set, so every day and every
+    user drawing from the same cluster reuses one computation.
+    """
+
+    KEY_PATTERN = 'box:travel:{scope}:{digest}'
+    TIMEOUT = 60 * 60 * 24  # 1 day
+
+    # (max distance km, speed km/h); the last tier has no upper bound
+    SPEED_MODEL = (
+        (1.5, 4.5),     # walking
+        (10.0, 20.0),   # city transport
+        (None, 40.0),   # car / intercity
+    )
+    DETOUR_FACTOR = 1.3
+    TRANSFER_MINUTES = 10  # Waiting/parking overhead for any hop that isn't walked
+
+    # Bounds on the route heuristic so box generation keeps its latency budget
+    MAX_TWO_OPT_PASSES = 20
+    ROUTE_DEADLINE_MS = 20
+
+    def __init__(self, speed_model=None, detour_factor=None):
+        self.speed_model = tuple(speed_model or self.SPEED_MODEL)
+        self.detour_factor = detour_factor or self.DETOUR_FACTOR
+
+    def _key(self, scope, keys):
+        digest = hashlib.sha1(
+            repr((sorted(keys), self.speed_model, self.detour_factor)).encode()
+        ).hexdigest()
+        return self.KEY_PATTERN.format(scope=scope or 'any', digest=digest)
+
+    def estimate_minutes(self, distances):
+        """Vectorised travel time in minutes for an array of road distances in km"""
+        distances = np.asarray(distances, dtype=np.float64)
+        speeds = np.full(distances.shape, self.speed_model[-1][1])
+        walked = np.zeros(distances.shape, dtype=bool)
+        # Assign tiers from the longest down so each distance ends in the first tier covering it
+        for position in range(len(self.speed_model) - 2, -1, -1):
+            limit, speed = self.speed_model[position]
+            within = distances <= limit
+            speeds[within] = speed
+            walked = np.where(within, position == 0, walked)
+        minutes = distances / speeds * 60
+        return np.where((distances > 0) & ~walked, minutes + self.TRANSFER_MINUTES, minutes)
+
+    def matrix(self, activities, scope=None):
+        """
+        Distance and travel-time matrix for a candidate set, from the cache
+        when this scope and set were seen before.
+
+        Args:
+            activities (list): Places and/or experiences
+            scope (str): Cache scope, e.g. the destination city
+
+        Returns:
+            TravelMatrix
+        """
+        activities = list({activity_key(activity): activity for activity in activities}.items())
+        activities.sort(key=lambda pair: pair[0])
+        keys = [key for key, _ in activities]
+        size = len(keys)
+        cache_key = self._key(scope, keys)
+
+        try:
+            data = cache.get(cache_key)
+        except Exception as e:
+            logger.error(f"Error reading travel matrix cache: {str(e)}")
+            data = None
+        if data is not None and len(data) == 2 * size * size * 4:
+            matrices = np.frombuffer(data, dtype=np.float32).reshape(2, size, size)
+            return TravelMatrix(keys, matrices[0], matrices[1])
+
+        distances = np.zeros((size, size), dtype=np.float32)
+        located = [
+            position for position, (_, activity) in enumerate(activities)
+            if getattr(activity, 'location', None)
+        ]
+        if len(located) > 1:
+            coordinates = to_radians([activities[position][1].location for position in located])
+            road_km = haversine_km(coordinates, coordinates) * self.detour_factor
+            distances[np.ix_(located, located)] = road_km
+        minutes = self.estimate_minutes(distances).astype(np.float32)
+
+        try:
+            cache.set(cache_key, np.stack([distances, minutes]).tobytes(), timeout=self.TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error writing travel matrix cache: {str(e)}")
+        return TravelMatrix(keys, distances, minutes)
+
+    def order_route(self, minutes, max_hop_minutes=None, deadline_ms=None):
+        """
+        Sequence stops for a one-way route starting at stop 0.
+
+        A nearest-neighbour tour is improved with 2-opt segment reversals
+        until no move helps, ``MAX_TWO_OPT_PASSES`` passes have run or the
+        deadline passes. Stops that can only be reached with a hop longer
+        than ``max_hop_minutes`` from the stop before them are then dropped.
+
+        Args:
+            minutes (ndarray): Square travel-time matrix
+            max_hop_minutes (float): Longest allowed hop, or None
+            deadline_ms (float): Wall-clock budget for the 2-opt phase
+
+        Returns:
+            tuple: (route as positions into ``minutes``, dropped positions)
+        """
+        size = len(minutes)
+        if size <= 2:
+            route = list(range(size))
+        else:
+            route = self._nearest_neighbour(minutes)
+            route = self._two_opt(minutes, route, deadline_ms or self.ROUTE_DEADLINE_MS)
+
+        if max_hop_minutes is None or not route:
+            return route, []
+
+        kept, dropped = [route[0]], []
+        for stop in route[1:]:
+            if minutes[kept[-1], stop] > max_hop_minutes:
+                dropped.append(stop)
+            else:
+                kept.append(stop)
+        return kept, dropped
+
+    @staticmethod
+    def _nearest_neighbour(minutes):
+        size = len(minutes)
+        visited = np.zeros(size, dtype=bool)
+        route = [0]
+        visited[0] = True
+        for _ in range(size - 1):
+            candidates = np.where(visited, np.inf, minutes[route[-1]])
+            stop = int(np.argmin(candidates))
+            route.append(stop)
+            visited[stop] = True
+        return route
+
+    def _two_opt(self, minutes, route, deadline_ms):
+        """
+        2-opt on an open path with a fixed start. Reversing ``route[i:j+1]``
+        only changes the edges entering i and leaving j, so each pass scores
+        every candidate reversal for one i in a single vectorised step.
+        """
+        deadline = time.perf_counter() + deadline_ms / 1000
+        route = np.array(route, dtype=np.int64)
+        size = len(route)
+
+        for _ in range(self.MAX_TWO_OPT_PASSES):
+            improved = False
+            for i in range(1, size - 1):
+                before, first = route[i - 1], route[i]
+                lasts = route[i + 1:]
+                afters = np.append(route[i + 2:], -1)
+                has_after = afters >= 0
+                safe_afters = np.where(has_after, afters, 0)
+
+                removed = minutes[before, first] + np.where(has_after, minutes[lasts, safe_afters], 0)
+                added = minutes[before, lasts] + np.where(has_after, minutes[first, safe_afters], 0)
+                gains = removed - added
+                best = int(np.argmax(gains))
+                if gains[best] > 1e-6:
+                    j = i + 1 + best
+                    route[i:j + 1] = route[i:j + 1][::-1]
+                    improved = True
+                if time.perf_counter() > deadline:
+                    return route.tolist()
+            if not improved:
+                break
+        return route.tolist()
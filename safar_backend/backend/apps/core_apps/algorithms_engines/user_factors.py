@@ -0,0 +1,170 @@
+import logging
+from contextlib import nullcontext
+
+import numpy as np
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class UserFactorStore:
+    """
+    Online store of per-user latent vectors between full retrains.
+
+    Vectors are kept in the cache as raw float32 bytes (k * 4 bytes each),
+    keyed by the model version. New interactions are folded in with the
+    frozen item factors: since SVD user factors are ``X @ item_factors``,
+    adding an interaction of weight ``w`` on item ``j`` moves the user by
+    exactly ``w * item_factors[j]``, an O(k) update.
+
+    Reconciliation with full retrains is implicit: a new model version
+    changes every key, so users start again from their freshly trained rows.
+    """
+
+    KEY_PATTERN = 'recs:user_factors:{namespace}:{version}:{user_id}'
+    TIMEOUT = 60 * 60 * 24 * 7  # 1 week; retrains normally happen far sooner
+    LOCK_TIMEOUT = 5
+
+    def __init__(self, model):
+        self.model = model
+
+    def _key(self, user_id):
+        return self.KEY_PATTERN.format(
+            namespace=self.model.namespace,
+            version=self.model.version,
+            user_id=user_id
+        )
+
+    def get(self, user_id):
+        """Return the user's online vector, or None if they have none for this model version"""
+        data = cache.get(self._key(user_id))
+        if data is None:
+            return None
+        vector = np.frombuffer(data, dtype=np.float32)
+        if len(vector) != self.model.item_factors.shape[1]:
+            return None
+        return vector
+
+    def get_many(self, user_ids):
+        """Return {user_id: vector} for the users that have an online vector, in one cache round trip"""
+        keys = {self._key(user_id): user_id for user_id in user_ids}
+        k = self.model.item_factors.shape[1]
+        vectors = {}
+        for key, data in cache.get_many(list(keys)).items():
+            vector = np.frombuffer(data, dtype=np.float32)
+            if len(vector) == k:
+                vectors[keys[key]] = vector
+        return vectors
+
+    def set(self, user_id, vector):
+        cache.set(self._key(user_id), np.asarray(vector, dtype=np.float32).tobytes(), timeout=self.TIMEOUT)
+
+    def fold_in(self, user_id, item_weights):
+        """
+        Fold new interactions into the user's vector.
+
+        Args:
+            user_id: The user
+            item_weights (dict): {item_id: weight} of the new interactions
+
+        Returns:
+            numpy.ndarray | None: The updated vector, or None if none of the
+            items are known to the model
+        """
+        delta = self._project(item_weights)
+        if delta is None:
+            return None
+
+        key = self._key(user_id)
+        lock = cache.lock(f"{key}:lock", timeout=self.LOCK_TIMEOUT) if hasattr(cache, 'lock') else nullcontext()
+        with lock:
+            vector = self.get(user_id)
+            if vector is None:
+                vector = self._trained_vector(user_id)
+            vector = vector + delta
+            self.set(user_id, vector)
+        return vector
+
+    def _project(self, item_weights):
+        """Project {item_id: weight} onto the item factors, in O(k * items touched)"""
+        item_index = self.model.item_index
+        pairs = [
+            (item_index[str(item_id)], weight)
+            for item_id, weight in item_weights.items()
+            if str(item_id) in item_index
+        ]
+        if not pairs:
+            return None
+        positions = [position for position, _ in pairs]
+        weights = np.array([weight for _, weight in pairs], dtype=np.float32)
+        return weights @ self.model.item_factors[positions]
+
+    def _trained_vector(self, user_id):
+        """The user's row from the last full training, or zeros for new users"""
+        user_idx = self.model.user_index.get(str(user_id))
+        if user_idx is None:
+            return np.zeros(self.model.item_factors.shape[1], dtype=np.float32)
+        return np.asarray(self.model.user_factors[user_idx], dtype=np.float32)
+
+    def seed(self, user_id, item_weights):
+        """
+        Start an online vector for a user unknown to the model from their
+        full interaction history.
+        """
+        vector = self._project(item_weights)
+        if vector is not None:
+            self.set(user_id, vector)
+        return vector
+
+    @classmethod
+    def record_interaction(cls, interaction):
+        """
+        Fold a newly saved ``UserInteraction`` into the user's online vectors:
+        the global model's and, when the item's country has one, its shard's.
+
+        Called from the interaction post_save flow, so it must stay cheap and
+        never raise.
+        """
+        from apps.core_apps.algorithms_engines.recommendation_engine import RecommendationEngine
+        from apps.core_apps.algorithms_engines.model_training import RecommendationModelTrainer
+
+        try:
+            weight = RecommendationEngine.INTERACTION_WEIGHTS.get(interaction.interaction_type)
+            item_type = interaction.content_type.model if interaction.content_type_id else None
+            if weight is None or item_type not in ('place', 'experience'):
+                return None
+
+            vector = cls._record(RecommendationEngine.model_store(item_type).load(), interaction, item_type, weight)
+
+            country_id = RecommendationEngine.ITEM_MODELS[item_type].objects.filter(
+                id=interaction.object_id
+            ).values_list(RecommendationModelTrainer.COUNTRY_FIELDS[item_type], flat=True).first()
+            if country_id is not None:
+                cls._record(RecommendationEngine.model_store(item_type, country_id).load(), interaction, item_type, weight)
+
+            return vector
+        except Exception as e:
+            logger.error(f"Error folding interaction into user factors: {str(e)}", exc_info=True)
+            return None
+
+    @classmethod
+    def _record(cls, model, interaction, item_type, weight):
+        """Fold one interaction into the user's vector for ``model``"""
+        from apps.core_apps.algorithms_engines.recommendation_engine import RecommendationEngine
+
+        if model is None or model.item_factors is None:
+            return None
+
+        store = cls(model)
+        user_id = interaction.user_id
+        if store.get(user_id) is None and str(user_id) not in model.user_index:
+            # First online update for a user who joined after training: the
+            # history already includes this interaction, so seed from it
+            engine = RecommendationEngine(interaction.user)
+            history = engine.get_user_interactions(item_type)
+            item_weights = {}
+            for item_id, item_weight in zip(history['object_id'], history['weight'].tolist()):
+                item_weights[item_id] = item_weights.get(item_id, 0.0) + item_weight
+            return store.seed(user_id, item_weights)
+
+        return store.fold_in(user_id, {interaction.object_id: weight})
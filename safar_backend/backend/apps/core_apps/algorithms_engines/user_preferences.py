@@ -0,0 +1,191 @@
+import logging
+from collections import defaultdict
+
+import numpy as np
+
+from apps.authentication.models import UserProfile
+from apps.safar.models import Category
+
+logger = logging.getLogger(__name__)
+
+
+class UserPreferenceVector:
+    """
+    The parts of a user's profile that personalization scoring reads,
+    loaded once.
+
+    Loaded once per engine (``RecommendationEngine.preferences``), it holds
+    the preferred countries, travel interests and price ceiling in memory
+    and is the single place personalization weights live: the ranking
+    pipeline, box generation and batch generation all score through it,
+    one vectorised pass per pool, or many users' pools at once with
+    ``score_matrix``.
+    """
+
+    COUNTRY_WEIGHT = 0.3
+    CATEGORY_WEIGHT = 0.2
+    TAG_WEIGHT = 0.15
+    RATING_WEIGHT = 0.1
+    PRICE_WEIGHT = 0.1
+
+    def __init__(self, country_ids=(), interests=(), max_price=None):
+        self.country_ids = frozenset(country_ids)
+        self.interests = frozenset(interests)
+        self.max_price = float(max_price) if max_price else None
+
+    @classmethod
+    def from_profile(cls, profile):
+        """Load a profile's preferences with a single query"""
+        return cls(
+            country_ids=profile.preferred_countries.values_list('id', flat=True),
+            interests=profile.travel_interests or [],
+            max_price=cls._max_price(profile)
+        )
+
+    @classmethod
+    def for_profiles(cls, profiles):
+        """Load many profiles' preferences with a single query, aligned with ``profiles``"""
+        through = UserProfile.preferred_countries.through
+        country_ids = defaultdict(list)
+        rows = through.objects.filter(userprofile_id__in=[profile.pk for profile in profiles])
+        for profile_id, country_id in rows.values_list('userprofile_id', 'country_id'):
+            country_ids[profile_id].append(country_id)
+        return [
+            cls(
+                country_ids=country_ids[profile.pk],
+                interests=profile.travel_interests or [],
+                max_price=cls._max_price(profile)
+            )
+            for profile in profiles
+        ]
+
+    @staticmethod
+    def _max_price(profile):
+        price_preference = (profile.metadata or {}).get('price_preference') or {}
+        return price_preference.get('max') if isinstance(price_preference, dict) else None
+
+    def score(self, item):
+        """Personalization score of one item, in [0, 1]"""
+        return float(self.score_many([item])[0])
+
+    def score_many(self, items):
+        """
+        Personalization scores of a list of places and/or experiences.
+
+        Only foreign key ids are read from the items; category names come from
+        one query for the whole pool.
+
+        Returns:
+            numpy.ndarray: float64 scores aligned with ``items``, each in [0, 1]
+        """
+        return self.score_matrix([self], items)[0]
+
+    @classmethod
+    def score_matrix(cls, vectors, items):
+        """
+        Personalization scores of many users against one pool of items.
+
+        Returns:
+            numpy.ndarray: float64 scores of shape (len(vectors), len(items)), each in [0, 1]
+        """
+        category_names = cls._category_names(items) if any(vector.interests for vector in vectors) else {}
+        return cls.score_columns(
+            vectors,
+            # Only places carry a country; experiences are reached through theirs
+            country_ids=[getattr(item, 'country_id', None) for item in items],
+            categories=[category_names.get(getattr(item, 'category_id', None)) for item in items],
+            ratings=[getattr(item, 'rating', 0) for item in items],
+            metadata=[getattr(item, 'metadata', None) for item in items],
+            # Experiences are priced per person and are not scored on price, as before
+            prices=[getattr(item, 'price', 0) for item in items]
+        )
+
+    @classmethod
+    def score_columns(cls, vectors, country_ids, categories, ratings, metadata=None, prices=None):
+        """
+        ``score_matrix`` over item attributes already fetched as aligned
+        columns, e.g. by the ranking pipeline.
+
+        Countries and interests are encoded as columns of per-user indicator
+        matrices, so every user is scored by indexing and one matrix product
+        instead of a loop over users.
+
+        Args:
+            vectors (list): UserPreferenceVector per user
+            country_ids (list): Each item's country id, or None
+            categories (list): Each item's category name, or None
+            ratings (list): Each item's rating
+            metadata (list): Each item's metadata dict, for its tags
+            prices (list): Each item's price, or None when it is not scored on price
+
+        Returns:
+            numpy.ndarray: float64 scores of shape (len(vectors), items), each in [0, 1]
+        """
+        users, count = len(vectors), len(country_ids)
+        if not users or not count:
+            return np.zeros((users, count), dtype=np.float64)
+
+        # Column indexes; the last column of each matrix is "no match"
+        countries = {}
+        interests = {}
+        for vector in vectors:
+            for country_id in vector.country_ids:
+                countries.setdefault(country_id, len(countries))
+            for interest in vector.interests:
+                interests.setdefault(interest, len(interests))
+
+        preferred = np.zeros((users, len(countries) + 1), dtype=bool)
+        interested = np.zeros((users, len(interests) + 1), dtype=bool)
+        for row, vector in enumerate(vectors):
+            preferred[row, [countries[country_id] for country_id in vector.country_ids]] = True
+            interested[row, [interests[interest] for interest in vector.interests]] = True
+
+        item_countries = np.fromiter(
+            (countries.get(country_id, len(countries)) for country_id in country_ids),
+            dtype=np.int64, count=count
+        )
+        item_categories = np.fromiter(
+            (interests.get(category, len(interests)) for category in categories),
+            dtype=np.int64, count=count
+        )
+        tagged = np.zeros((count, len(interests) + 1), dtype=np.float32)
+        for row, item_metadata in enumerate(metadata or ()):
+            for tag in cls._tags(item_metadata):
+                if tag in interests:
+                    tagged[row, interests[tag]] = 1
+        tag_match = interested.astype(np.float32) @ tagged.T > 0
+        ratings = np.fromiter(
+            (float(rating or 0) for rating in ratings),
+            dtype=np.float64, count=count
+        )
+
+        scores = cls.COUNTRY_WEIGHT * preferred[:, item_countries]
+        scores += np.where(
+            interested[:, item_categories], cls.CATEGORY_WEIGHT, np.where(tag_match, cls.TAG_WEIGHT, 0.0)
+        )
+        scores += cls.RATING_WEIGHT * ratings
+
+        max_prices = np.array([vector.max_price or 0.0 for vector in vectors], dtype=np.float64)
+        if prices is not None and max_prices.any():
+            prices = np.fromiter(
+                (float(price or 0) for price in prices),
+                dtype=np.float64, count=count
+            )
+            limits = np.where(max_prices > 0, max_prices, 1.0)[:, None]
+            scores += cls.PRICE_WEIGHT * np.where(
+                (prices > 0) & (max_prices[:, None] > 0), np.maximum(0, 1 - prices / limits), 0.0
+            )
+
+        return np.clip(scores, 0.0, 1.0)
+
+    @staticmethod
+    def _tags(metadata):
+        tags = metadata.get('tags', []) if isinstance(metadata, dict) else []
+        return tags if isinstance(tags, list) else []
+
+    @staticmethod
+    def _category_names(items):
+        category_ids = {getattr(item, 'category_id', None) for item in items} - {None}
+        if not category_ids:
+            return {}
+        return dict(Category.objects.filter(id__in=category_ids).values_list('id', 'name'))
@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core_apps.algorithms_engines.ann_index import IVFIndex
+from apps.core_apps.algorithms_engines.recommendation_engine import RecommendationEngine
+
+
+class Command(BaseCommand):
+    help = 'Measures recall@k and latency of the ANN indexes against brute-force search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--item-type', default='place', choices=['place', 'experience'],
+                            help='Model whose published indexes are benchmarked')
+        parser.add_argument('--k', type=int, default=10, help='Number of neighbours')
+        parser.add_argument('--queries', type=int, default=200, help='Number of sampled queries')
+        parser.add_argument('--nprobe', type=int, nargs='*', help='Cells to scan, several values to compare')
+        parser.add_argument('--synthetic', type=int,
+                            help='Benchmark a freshly built index over this many random vectors instead')
+        parser.add_argument('--dimensions', type=int, default=50, help='Vector size for --synthetic')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+
+        if options['synthetic']:
+            indexes = {'synthetic': self.build_synthetic(rng, options['synthetic'], options['dimensions'])}
+        else:
+            model = RecommendationEngine.model_store(options['item_type']).load()
+            if model is None:
+                raise CommandError(f"No trained {options['item_type']} model; run train_recommendation_models first")
+            self.stdout.write(f"Model {model.namespace}@{model.version}")
+            indexes = {
+                'users': RecommendationEngine._get_ann_index(model, RecommendationEngine.USER_INDEX),
+                'items': RecommendationEngine._get_ann_index(model, RecommendationEngine.ITEM_INDEX),
+            }
+
+        for name, index in indexes.items():
+            if index is None:
+                self.stdout.write(self.style.WARNING(f"{name}: no index in this model version"))
+                continue
+            for nprobe in options['nprobe'] or [index.nprobe]:
+                self.benchmark(name, index, rng, options['k'], options['queries'], nprobe)
+
+    def build_synthetic(self, rng, n, dimensions):
+        """Clustered random vectors, roughly shaped like SVD factors"""
+        centers = rng.normal(size=(max(1, n // 400), dimensions))
+        vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.normal(size=(n, dimensions))
+        started = time.perf_counter()
+        index = IVFIndex.build(vectors)
+        self.stdout.write(f"Built index over {n} vectors in {time.perf_counter() - started:.2f}s")
+        return index
+
+    def benchmark(self, name, index, rng, k, queries, nprobe):
+        queries = rng.choice(len(index), size=min(queries, len(index)), replace=False)
+        recalls, ann_times, exact_times = [], [], []
+
+        for query_idx in queries:
+            query = index.vectors[query_idx]
+
+            started = time.perf_counter()
+            approx, _ = index.search(query, k=k, nprobe=nprobe, exclude=[query_idx])
+            ann_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            exact, _ = index.brute_force(query, k=k, exclude=[query_idx])
+            exact_times.append(time.perf_counter() - started)
+
+            if len(exact):
+                recalls.append(len(set(approx.tolist()) & set(exact.tolist())) / len(exact))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{name}: n={len(index)} lists={len(index.centroids)} nprobe={nprobe} "
+            f"recall@{k}={np.mean(recalls):.3f} "
+            f"ann p50={np.percentile(ann_times, 50) * 1e6:.0f}us p99={np.percentile(ann_times, 99) * 1e6:.0f}us "
+            f"brute p50={np.percentile(exact_times, 50) * 1e6:.0f}us"
+        ))
@@ -0,0 +1,280 @@
+import json
+import math
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+import numpy as np
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+
+from apps.authentication.models import User, UserInteraction
+from apps.core_apps.algorithms_engines.model_training import RecommendationModelTrainer
+from apps.core_apps.algorithms_engines.recommendation_engine import RecommendationEngine
+
+
+class Command(BaseCommand):
+    help = (
+        'Evaluates recommendation quality (precision/recall/NDCG@k, coverage) on a temporal '
+        'train/test split and measures latency and memory of the public engine methods. '
+        'Models are trained into a temporary directory, so published models are left untouched.'
+    )
+
+    METHODS = ('recommend', 'recommend_batch', 'similar_items', 'also_liked', 'trending')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--item-types', nargs='*', default=['place', 'experience'],
+                            choices=['place', 'experience'], help='Item types to evaluate')
+        parser.add_argument('--k', type=int, default=10, help='Recommendation list length')
+        parser.add_argument('--test-fraction', type=float, default=0.2,
+                            help='Most recent fraction of interactions held out as the test period')
+        parser.add_argument('--sample-users', type=int, default=200,
+                            help='Test users evaluated per item type')
+        parser.add_argument('--sample-items', type=int, default=100,
+                            help='Items used to time the item-to-item methods')
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Users per recommend_batch call')
+        parser.add_argument('--generate', action='store_true',
+                            help='Generate a fresh fake dataset with generate_fake_data first')
+        parser.add_argument('--users', type=int, default=200, help='Users to generate')
+        parser.add_argument('--places', type=int, default=100, help='Places to generate')
+        parser.add_argument('--experiences', type=int, default=60, help='Experiences to generate')
+        parser.add_argument('--spread-days', type=int, default=180,
+                            help='Spread generated interactions uniformly over this many past days')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--json', dest='json_path', help='Also write the report as JSON to this path')
+        parser.add_argument('--min-ndcg', type=float, help='Fail if NDCG@k of any item type is below this')
+        parser.add_argument('--max-p95-ms', type=float, help='Fail if the p95 latency of any method exceeds this')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        if options['generate']:
+            self.generate(options, rng)
+
+        cutoff = self.split_cutoff(options['test_fraction'])
+        if cutoff is None:
+            raise CommandError("Not enough interactions to split; run with --generate")
+        self.stdout.write(f"Temporal split at {cutoff.isoformat()}")
+
+        report = {'cutoff': cutoff.isoformat(), 'k': options['k'], 'item_types': {}}
+        with tempfile.TemporaryDirectory() as model_dir, override_settings(RECOMMENDATION_MODEL_DIR=model_dir):
+            for item_type in options['item_types']:
+                version = RecommendationModelTrainer(item_type, until=cutoff).train()
+                if version is None:
+                    self.stdout.write(self.style.WARNING(f"{item_type}: nothing to train on before the cutoff"))
+                    continue
+                report['item_types'][item_type] = self.evaluate(item_type, cutoff, options, rng)
+
+        report['peak_rss_mb'] = round(self.peak_rss_mb(), 1)
+        self.print_report(report)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        failures = self.check_gates(report, options)
+        if failures:
+            raise CommandError('Evaluation gates failed:\n' + '\n'.join(failures))
+
+    def generate(self, options, rng):
+        """Generate a dataset and spread its interactions in time so a temporal split is meaningful"""
+        generated_at = timezone.now()
+        call_command(
+            'generate_fake_data',
+            users=options['users'],
+            places=options['places'],
+            experiences=options['experiences'],
+            seed=options['seed'],
+            stdout=self.stdout,
+        )
+
+        # generate_fake_data stamps every interaction with "now"
+        interactions = list(UserInteraction.objects.filter(created_at__gte=generated_at))
+        now = timezone.now()
+        for interaction in interactions:
+            interaction.created_at = now - timedelta(seconds=rng.uniform(0, options['spread_days'] * 86400))
+        UserInteraction.objects.bulk_update(interactions, ['created_at'], batch_size=1000)
+        self.stdout.write(f"Spread {len(interactions)} interactions over {options['spread_days']} days")
+
+    def split_cutoff(self, test_fraction):
+        """The created_at quantile that leaves ``test_fraction`` of the interactions after it"""
+        interactions = UserInteraction.objects.filter(
+            interaction_type__in=RecommendationEngine.INTERACTION_WEIGHTS.keys()
+        )
+        total = interactions.count()
+        if total < 10:
+            return None
+        position = min(total - 1, int(total * (1 - test_fraction)))
+        return interactions.order_by('created_at').values_list('created_at', flat=True)[position]
+
+    def evaluate(self, item_type, cutoff, options, rng):
+        k = options['k']
+        model_class = RecommendationEngine.ITEM_MODELS[item_type]
+        catalog = model_class.objects.filter(is_available=True, is_deleted=False)
+
+        # Ground truth: what each user interacted with during the test period
+        relevant = {}
+        test_rows = UserInteraction.objects.filter(
+            content_type__model=item_type,
+            interaction_type__in=RecommendationEngine.INTERACTION_WEIGHTS.keys(),
+            created_at__gte=cutoff
+        ).values_list('user_id', 'object_id')
+        for user_id, object_id in test_rows.iterator():
+            relevant.setdefault(str(user_id), set()).add(str(object_id))
+
+        user_ids = sorted(relevant)
+        user_ids = rng.sample(user_ids, min(options['sample_users'], len(user_ids)))
+        users = User.objects.select_related('profile').in_bulk(user_ids)
+        users = [users[user_id] for user_id in user_ids if user_id in users]
+
+        timings = {method: [] for method in self.METHODS}
+        peaks = {}
+        recommended = {}
+        recommend = 'recommend_places' if item_type == 'place' else 'recommend_experiences'
+
+        for user in users:
+            engine = RecommendationEngine(user, as_of=cutoff)
+            items, elapsed = self.timed(lambda: list(getattr(engine, recommend)(limit=k)))
+            timings['recommend'].append(elapsed)
+            recommended[str(user.id)] = [str(item.id) for item in items]
+        peaks['recommend'] = self.peak_memory(
+            lambda: list(getattr(RecommendationEngine(users[0], as_of=cutoff), recommend)(limit=k))
+        ) if users else 0
+
+        batch_recommended = {}
+        for start in range(0, len(user_ids), options['batch_size']):
+            chunk = user_ids[start:start + options['batch_size']]
+            results, elapsed = self.timed(
+                lambda: RecommendationEngine.recommend_batch(chunk, item_type, k=k, exclude_seen=False)
+            )
+            timings['recommend_batch'].append(elapsed)
+            batch_recommended.update(results)
+        peaks['recommend_batch'] = self.peak_memory(
+            lambda: RecommendationEngine.recommend_batch(user_ids[:options['batch_size']], item_type, k=k)
+        ) if user_ids else 0
+
+        item_ids = sorted({item_id for items in relevant.values() for item_id in items})
+        item_ids = rng.sample(item_ids, min(options['sample_items'], len(item_ids)))
+        for method in ('similar_items', 'also_liked'):
+            call = getattr(RecommendationEngine, method)
+            for item_id in item_ids:
+                _, elapsed = self.timed(lambda: list(call(item_type, item_id, catalog, limit=k)))
+                timings[method].append(elapsed)
+            peaks[method] = self.peak_memory(
+                lambda: list(call(item_type, item_ids[0], catalog, limit=k))
+            ) if item_ids else 0
+        for _ in range(max(1, len(item_ids))):
+            _, elapsed = self.timed(lambda: list(RecommendationEngine.trending(item_type, catalog, limit=k)))
+            timings['trending'].append(elapsed)
+        peaks['trending'] = self.peak_memory(lambda: list(RecommendationEngine.trending(item_type, catalog, limit=k)))
+
+        catalog_size = catalog.count()
+        return {
+            'users': len(users),
+            'quality': {
+                'recommend': self.quality(recommended, relevant, k, catalog_size),
+                'recommend_batch': self.quality(batch_recommended, relevant, k, catalog_size),
+            },
+            'latency_ms': {
+                method: self.percentiles(times) for method, times in timings.items() if times
+            },
+            'peak_alloc_kb': {method: round(peak / 1024, 1) for method, peak in peaks.items()},
+        }
+
+    @staticmethod
+    def timed(call):
+        started = time.perf_counter()
+        result = call()
+        return result, time.perf_counter() - started
+
+    @staticmethod
+    def peak_memory(call):
+        """Peak Python/NumPy allocation of one call, in bytes; traced separately so timings stay clean"""
+        tracemalloc.start()
+        try:
+            call()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    @staticmethod
+    def peak_rss_mb():
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    @staticmethod
+    def percentiles(times):
+        times_ms = np.array(times) * 1000
+        return {
+            'calls': len(times),
+            'p50': round(float(np.percentile(times_ms, 50)), 2),
+            'p95': round(float(np.percentile(times_ms, 95)), 2),
+            'p99': round(float(np.percentile(times_ms, 99)), 2),
+        }
+
+    @staticmethod
+    def quality(recommended, relevant, k, catalog_size):
+        """Mean precision@k, recall@k and NDCG@k over users, plus catalog coverage"""
+        precisions, recalls, ndcgs = [], [], []
+        seen_items = set()
+        for user_id, items in recommended.items():
+            items = items[:k]
+            truth = relevant.get(user_id)
+            if not truth:
+                continue
+            seen_items.update(items)
+            hits = [1.0 if item_id in truth else 0.0 for item_id in items]
+            precisions.append(sum(hits) / k)
+            recalls.append(sum(hits) / len(truth))
+            dcg = sum(hit / math.log2(rank + 2) for rank, hit in enumerate(hits))
+            ideal = sum(1 / math.log2(rank + 2) for rank in range(min(k, len(truth))))
+            ndcgs.append(dcg / ideal)
+
+        return {
+            f'precision@{k}': round(float(np.mean(precisions)), 4) if precisions else 0.0,
+            f'recall@{k}': round(float(np.mean(recalls)), 4) if recalls else 0.0,
+            f'ndcg@{k}': round(float(np.mean(ndcgs)), 4) if ndcgs else 0.0,
+            'coverage': round(len(seen_items) / catalog_size, 4) if catalog_size else 0.0,
+        }
+
+    def print_report(self, report):
+        k = report['k']
+        for item_type, result in report['item_types'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{item_type} ({result['users']} test users)"))
+            for method, quality in result['quality'].items():
+                self.stdout.write(
+                    f"  {method:<16} P@{k}={quality[f'precision@{k}']:.4f} R@{k}={quality[f'recall@{k}']:.4f} "
+                    f"NDCG@{k}={quality[f'ndcg@{k}']:.4f} coverage={quality['coverage']:.2%}"
+                )
+            for method, latency in result['latency_ms'].items():
+                self.stdout.write(
+                    f"  {method:<16} n={latency['calls']:<5} p50={latency['p50']:.1f}ms "
+                    f"p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms "
+                    f"peak={result['peak_alloc_kb'].get(method, 0):.0f}KiB"
+                )
+        self.stdout.write(f"Peak RSS {report['peak_rss_mb']:.1f}MB")
+        self.stdout.write(self.style.WARNING(
+            "Note: trending and the fallback read the live popularity counters, which include the test period"
+        ))
+
+    @staticmethod
+    def check_gates(report, options):
+        failures = []
+        k = report['k']
+        for item_type, result in report['item_types'].items():
+            ndcg = result['quality']['recommend'][f'ndcg@{k}']
+            if options['min_ndcg'] is not None and ndcg < options['min_ndcg']:
+                failures.append(f"{item_type}: NDCG@{k} {ndcg:.4f} < {options['min_ndcg']}")
+            if options['max_p95_ms'] is not None:
+                for method, latency in result['latency_ms'].items():
+                    if latency['p95'] > options['max_p95_ms']:
+                        failures.append(
+                            f"{item_type}.{method}: p95 {latency['p95']:.1f}ms > {options['max_p95_ms']}ms"
+                        )
+        return failures
@@ -263,3 +263,258 @@ def notify_expiring_discounts():
     except Exception as e:
         logger.error(f"Failed to notify about expiring discounts: {str(e)}", exc_info=True)
         return 0
+
+@shared_task
+def train_recommendation_models(item_types=None, country_shards=None):
+    """
+    Periodically retrain the recommendation models and publish new artifacts.
+    Request handlers only load the published versions, never train.
+    
+    Every item type, and with ``RECOMMENDATION_COUNTRY_SHARDS`` every busy
+    country of it, is trained by its own ``train_recommendation_model``
+    subtask, so the work spreads over all available workers. The interaction
+    cache is refreshed once here; the subtasks only read it, so they don't
+    race to rewrite the same files.
+    """
+    from celery import group
+    from apps.core_apps.algorithms_engines.model_training import RecommendationModelTrainer
+    
+    if country_shards is None:
+        country_shards = getattr(settings, 'RECOMMENDATION_COUNTRY_SHARDS', False)
+    
+    jobs = []
+    for item_type in item_types or RecommendationModelTrainer.ITEM_MODELS.keys():
+        country_ids = []
+        try:
+            if country_shards:
+                # Also refreshes the interaction cache
+                country_ids = RecommendationModelTrainer.shard_countries(item_type)
+            else:
+                RecommendationModelTrainer.interaction_cache(item_type).refresh()
+        except Exception as e:
+            logger.error(f"Failed to prepare {item_type} recommendation training: {str(e)}", exc_info=True)
+        
+        jobs.append(train_recommendation_model.s(item_type, refresh_interactions=False))
+        for country_id in country_ids:
+            jobs.append(train_recommendation_model.s(item_type, country_id, refresh_interactions=False))
+    
+    group(jobs).apply_async()
+    logger.info(f"Dispatched {len(jobs)} recommendation training jobs")
+    return len(jobs)
+
+@shared_task
+def train_recommendation_model(item_type, country_id=None, refresh_interactions=True):
+    """
+    Train and publish one recommendation model, or one country shard of it.
+    ``refresh_interactions=False`` reads the interaction cache as it is, for
+    subtasks of ``train_recommendation_models``, which refreshed it already.
+    """
+    from apps.core_apps.algorithms_engines.model_training import RecommendationModelTrainer
+    
+    try:
+        version = RecommendationModelTrainer(
+            item_type, country_id=country_id, refresh_interactions=refresh_interactions
+        ).train()
+    except Exception as e:
+        logger.error(f"Failed to train {item_type} recommendation model (country {country_id}): {str(e)}", exc_info=True)
+        return None
+    logger.info(f"Trained {item_type} recommendation model (country {country_id}): {version}")
+    return version
+
+@shared_task
+def backfill_popularity_counters(days=90):
+    """
+    Rebuild the rolling popularity day buckets from the interaction table.
+    Only needed once after deploying, or to repair counters; day to day the
+    counters are maintained as interactions are saved.
+    """
+    from django.db.models import Count
+    from django.db.models.functions import TruncDate
+    from apps.authentication.models import UserInteraction
+    from apps.core_apps.algorithms_engines.popularity import PopularityCounter
+    
+    since = timezone.now() - timedelta(days=days)
+    rows = UserInteraction.objects.filter(
+        created_at__gte=since,
+        content_type__isnull=False,
+        object_id__isnull=False
+    ).annotate(
+        day=TruncDate('created_at')
+    ).values(
+        'content_type__model', 'day', 'object_id'
+    ).annotate(
+        count=Count('id')
+    ).order_by('content_type__model', 'day')
+    
+    buckets = {}
+    for row in rows.iterator():
+        key = (row['content_type__model'], row['day'])
+        buckets.setdefault(key, {})[row['object_id']] = row['count']
+    
+    for (item_type, day), counts in buckets.items():
+        PopularityCounter(item_type).load_day(day, counts)
+    
+    for item_type in {item_type for item_type, _ in buckets}:
+        PopularityCounter(item_type).rebuild_rollup()
+    
+    logger.info(f"Backfilled {len(buckets)} popularity day buckets")
+    return len(buckets)
+
+@shared_task
+def refresh_item_embeddings(item_type, item_ids):
+    """
+    Re-encode the content embeddings of saved catalog items. Experiences
+    carry their place's name and location, so a place change re-encodes
+    its experiences too.
+    """
+    from apps.safar.models import Experience
+    from apps.core_apps.algorithms_engines.item_embeddings import ItemEmbeddingStore
+    
+    stored = ItemEmbeddingStore(item_type).refresh(item_ids)
+    if item_type == 'place':
+        experience_ids = Experience.objects.filter(place_id__in=item_ids).values_list('id', flat=True)
+        stored += ItemEmbeddingStore('experience').refresh(list(experience_ids))
+    return stored
+
+@shared_task
+def rebuild_item_embeddings(item_types=None):
+    """
+    Nightly full rebuild of the item content embeddings, followed by a fresh
+    fit of the item clusters over them.
+    """
+    from apps.core_apps.algorithms_engines.item_embeddings import ItemEmbeddingStore
+    from apps.core_apps.algorithms_engines.item_clustering import ItemClusterer
+    
+    results = {}
+    for item_type in item_types or ItemEmbeddingStore.ITEM_MODELS.keys():
+        try:
+            results[item_type] = ItemEmbeddingStore(item_type).rebuild()
+            ItemClusterer.fit(item_type)
+        except Exception as e:
+            logger.error(f"Failed to rebuild {item_type} embeddings: {str(e)}", exc_info=True)
+            results[item_type] = None
+    return results
+
+@shared_task
+def update_item_clusters(item_types=None):
+    """Fold new and changed items into the current item clusters"""
+    from apps.core_apps.algorithms_engines.item_clustering import ItemClusterer
+    from apps.core_apps.algorithms_engines.item_embeddings import ItemEmbeddingStore
+    
+    results = {}
+    for item_type in item_types or ItemEmbeddingStore.ITEM_MODELS.keys():
+        try:
+            results[item_type] = ItemClusterer.update(item_type)
+        except Exception as e:
+            logger.error(f"Failed to update {item_type} clusters: {str(e)}", exc_info=True)
+            results[item_type] = None
+    return results
+
+@shared_task
+def rebuild_fallback_lists(item_types=None):
+    """Nightly rebuild of the precomputed cold-start and fallback lists"""
+    from apps.core_apps.algorithms_engines.fallback_lists import FallbackLists
+    
+    results = {}
+    for item_type in item_types or FallbackLists.ITEM_MODELS.keys():
+        try:
+            results[item_type] = FallbackLists(item_type).rebuild()
+        except Exception as e:
+            logger.error(f"Failed to rebuild {item_type} fallback lists: {str(e)}", exc_info=True)
+            results[item_type] = None
+    return results
+
+@shared_task(bind=True)
+def generate_box(self, job_id):
+    """
+    Run a queued ``BoxGenerationJob``, reporting each stage to the user's
+    WebSocket connections and recording the box or the error on the job.
+    """
+    from datetime import date
+    from apps.core_apps.algorithms_engines.box_jobs import BoxGenerationJob
+    from apps.core_apps.algorithms_engines.generation_box_algorithm import BoxGenerator
+    
+    job = BoxGenerationJob.get(job_id)
+    if job is None:
+        logger.error(f"Box generation job {job_id} not found")
+        return None
+    
+    params = job.params
+    try:
+        job.report('starting', 5)
+        user = User.objects.get(id=job.user_id)
+        destination = BoxGenerator.get_destination(params['destination_type'], params['destination_id'])
+        constraints = {'planner': params['planner']} if params.get('planner') else None
+        box = BoxGenerator(user, constraints=constraints).generate_box(
+            destination=destination,
+            duration_days=params['duration_days'],
+            budget=params.get('budget'),
+            start_date=date.fromisoformat(params['start_date']) if params.get('start_date') else None,
+            theme=params.get('theme'),
+            progress=job.report
+        )
+    except ValueError as e:
+        job.fail(str(e))
+        return None
+    except Exception as e:
+        logger.error(f"Box generation job {job_id} failed: {str(e)}", exc_info=True)
+        job.fail('Could not generate box')
+        return None
+    
+    job.complete(box.id)
+    return str(box.id)
+
+@shared_task(bind=True)
+def generate_boxes_for_users(self, user_ids, destination_type, destination_id, duration_days,
+                             budget=None, start_date=None, theme=None, planner=None):
+    """
+    Generate one personalised box per user for the same destination, e.g.
+    for marketing campaigns, reporting per-user progress as task state.
+    
+    Returns:
+        dict: {'boxes': {user_id: box_id}, 'failures': {user_id: error}}
+    """
+    from datetime import date
+    from apps.core_apps.algorithms_engines.generation_box_algorithm import BoxGenerator
+    
+    user_ids = [str(user_id) for user_id in user_ids]
+    users = list(
+        User.objects.filter(id__in=user_ids, profile__isnull=False).select_related('profile')
+    )
+    found = {str(user.id) for user in users}
+    failures = {user_id: 'User or profile not found' for user_id in user_ids if user_id not in found}
+    processed = [len(failures)]
+    
+    def progress(user, box=None, error=None):
+        processed[0] += 1
+        if error:
+            logger.warning(f"Batch box generation failed for user {user.id}: {error}")
+        self.update_state(state='PROGRESS', meta={
+            'processed': processed[0],
+            'total': len(user_ids),
+            'user_id': str(user.id),
+            'box_id': str(box.id) if box is not None else None,
+            'error': error
+        })
+    
+    try:
+        destination = BoxGenerator.get_destination(destination_type, destination_id)
+        results = BoxGenerator.generate_boxes_for_users(
+            users,
+            destination=destination,
+            duration_days=duration_days,
+            budget=budget,
+            start_date=date.fromisoformat(start_date) if start_date else None,
+            theme=theme,
+            constraints={'planner': planner} if planner else None,
+            progress=progress
+        )
+    except ValueError as e:
+        logger.error(f"Batch box generation rejected: {str(e)}")
+        return {'boxes': {}, 'failures': {user_id: str(e) for user_id in user_ids}}
+    except Exception as e:
+        logger.error(f"Batch box generation failed: {str(e)}", exc_info=True)
+        return {'boxes': {}, 'failures': {user_id: 'Could not generate box' for user_id in user_ids}}
+    
+    results['failures'].update(failures)
+    return results
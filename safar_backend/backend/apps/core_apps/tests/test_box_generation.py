@@ -0,0 +1,164 @@
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.gis.geos import Point
+from django.test import TestCase, override_settings
+
+from apps.authentication.models import User
+from apps.core_apps.algorithms_engines.generation_box_algorithm import BoxGenerator
+from apps.core_apps.algorithms_engines.itinerary_skeleton import ItinerarySkeleton
+from apps.geographic_data.models import Country, Region, City
+from apps.safar.models import Category, Place, Experience, Box, BoxItineraryItem
+
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BoxGenerationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='traveller@example.com', password='secret')
+        owner = User.objects.create_user(email='owner@example.com', password='secret')
+
+        cls.country = Country.objects.create(name='Egypt', iso_code='EG')
+        cls.region = Region.objects.create(country=cls.country, name='Cairo Governorate')
+        cls.city = City.objects.create(
+            country=cls.country, region=cls.region, name='Cairo', geometry=Point(31.2357, 30.0444, srid=4326)
+        )
+        category = Category.objects.create(name='Museums')
+
+        for i in range(6):
+            place = Place.objects.create(
+                category=category,
+                owner=owner,
+                name=f'Place {i}',
+                location=Point(31.23 + i * 0.005, 30.04 + i * 0.003, srid=4326),
+                country=cls.country,
+                region=cls.region,
+                city=cls.city,
+                rating=4.0 + i / 10,
+                price=Decimal('20.00')
+            )
+        Experience.objects.create(
+            category=category,
+            place=place,
+            owner=owner,
+            title='Nile cruise',
+            location=Point(31.22, 30.05, srid=4326),
+            price_per_person=Decimal('35.00'),
+            duration=90,
+            capacity=10
+        )
+
+    def test_generates_and_saves_box(self):
+        box = BoxGenerator(self.user).generate_box(
+            destination=self.city,
+            duration_days=2,
+            start_date=date(2030, 5, 1)
+        )
+
+        box = Box.objects.get(pk=box.pk)
+        self.assertEqual(box.category.name, BoxGenerator.BOX_CATEGORY)
+        self.assertEqual(box.city, self.city)
+        self.assertEqual(box.country, self.country)
+        self.assertEqual(box.end_date, date(2030, 5, 2))
+        self.assertEqual(box.metadata['owner_id'], str(self.user.pk))
+        self.assertEqual(box.metadata['region_id'], str(self.region.pk))
+        self.assertTrue(box.itinerary_days.exists())
+        self.assertTrue(BoxItineraryItem.objects.filter(itinerary_day__box=box).exists())
+
+    def test_generates_box_for_region(self):
+        box = BoxGenerator(self.user).generate_box(destination=self.region, duration_days=1)
+
+        box = Box.objects.get(pk=box.pk)
+        self.assertIsNone(box.city)
+        self.assertEqual(box.country, self.country)
+        self.assertEqual(box.metadata['region_id'], str(self.region.pk))
+        self.assertTrue(BoxItineraryItem.objects.filter(itinerary_day__box=box).exists())
+
+    def test_generates_box_for_country(self):
+        box = BoxGenerator(self.user).generate_box(destination=self.country, duration_days=1)
+
+        box = Box.objects.get(pk=box.pk)
+        self.assertIsNone(box.city)
+        self.assertEqual(box.country, self.country)
+        self.assertNotIn('region_id', box.metadata)
+        self.assertTrue(BoxItineraryItem.objects.filter(itinerary_day__box=box).exists())
+
+    def test_float_budget_against_decimal_prices(self):
+        box = BoxGenerator(self.user).generate_box(destination=self.city, duration_days=1, budget=60.0)
+
+        items = BoxItineraryItem.objects.filter(itinerary_day__box=box)
+        self.assertTrue(items.exists())
+        self.assertLessEqual(sum(item.estimated_cost for item in items), Decimal('60.00'))
+
+    def test_travel_scope_of_each_destination_type(self):
+        generator = BoxGenerator(self.user)
+
+        for destination, scope in (
+            (self.city, f"city-{self.city.pk}"),
+            (self.region, f"region-{self.region.pk}"),
+            (self.country, f"country-{self.country.pk}"),
+        ):
+            with self.subTest(destination=destination):
+                box = generator._create_base_box(destination, 1, None, None)
+                self.assertEqual(generator._travel_scope(box), scope)
+
+    def test_skeleton_pool_is_topped_up_from_the_catalog(self):
+        with mock.patch(
+            'apps.core_apps.algorithms_engines.generation_box_algorithm.RecommendationEngine.cold_start',
+            side_effect=lambda item_type, queryset, filters=None, limit=10: list(queryset.filter(**filters)[:2])
+        ):
+            places = BoxGenerator._skeleton_candidates('place', Place.objects.all(), {'city': self.city}, 5)
+
+        self.assertEqual(len(places), 5)
+        self.assertEqual(len({place.pk for place in places}), 5)
+
+    def test_skeletons_are_keyed_by_daily_item_limit(self):
+        self.assertNotEqual(
+            ItinerarySkeleton._key(self.city, 2, None, 6),
+            ItinerarySkeleton._key(self.city, 2, None, 8)
+        )
+
+    def test_clone_drops_days_past_a_shorter_duration(self):
+        box = BoxGenerator(self.user).generate_box(destination=self.city, duration_days=2, start_date=date(2030, 5, 1))
+
+        clone = BoxGenerator.clone_box_for_users(box, [self.user], {'duration_days': 1})[0]
+
+        self.assertEqual(list(clone.itinerary_days.values_list('day_number', flat=True)), [1])
+        self.assertEqual(clone.end_date, date(2030, 5, 1))
+        self.assertEqual(
+            BoxItineraryItem.objects.filter(itinerary_day__box=clone).count(),
+            BoxItineraryItem.objects.filter(itinerary_day__box=box, itinerary_day__day_number=1).count()
+        )
+
+    def test_clone_skips_items_of_deleted_days_and_fills_a_longer_duration(self):
+        box = BoxGenerator(self.user).generate_box(destination=self.city, duration_days=2, start_date=date(2030, 5, 1))
+        box.itinerary_days.filter(day_number=2).update(is_deleted=True)
+
+        clone = BoxGenerator.clone_box_for_users(box, [self.user], {'duration_days': 3})[0]
+
+        self.assertEqual(list(clone.itinerary_days.values_list('day_number', flat=True)), [1, 2, 3])
+        self.assertEqual(clone.end_date, date(2030, 5, 3))
+        self.assertFalse(BoxItineraryItem.objects.filter(itinerary_day__box=clone, itinerary_day__day_number__gt=1).exists())
+
+    def test_batch_failure_of_one_user_spares_the_others(self):
+        other = User.objects.create_user(email='second@example.com', password='secret')
+        create_base_box = BoxGenerator._create_base_box
+
+        def create_base_box_failing_for_other(generator, *args, **kwargs):
+            if generator.user.pk == other.pk:
+                raise RuntimeError("Could not build box")
+            return create_base_box(generator, *args, **kwargs)
+
+        users = list(User.objects.filter(pk__in=[self.user.pk, other.pk]).select_related('profile'))
+        with mock.patch.object(BoxGenerator, '_create_base_box', create_base_box_failing_for_other):
+            results = BoxGenerator.generate_boxes_for_users(users, destination=self.city, duration_days=1)
+
+        self.assertEqual(set(results['boxes']), {str(self.user.pk)})
+        self.assertEqual(set(results['failures']), {str(other.pk)})
+        box = Box.objects.get(pk=results['boxes'][str(self.user.pk)])
+        self.assertEqual(box.category.name, BoxGenerator.BOX_CATEGORY)
+        self.assertEqual(box.metadata['owner_id'], str(self.user.pk))
+        self.assertTrue(BoxItineraryItem.objects.filter(itinerary_day__box=box).exists())
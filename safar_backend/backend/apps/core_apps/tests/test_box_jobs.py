@@ -0,0 +1,51 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from apps.core_apps.algorithms_engines.box_jobs import BoxGenerationJob
+
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+@mock.patch.object(BoxGenerationJob, '_publish')
+@mock.patch('apps.core_apps.tasks.generate_box.apply_async')
+class BoxGenerationJobTests(SimpleTestCase):
+    params = {'destination_id': 'city-1', 'duration_days': 3}
+
+    def setUp(self):
+        cache.clear()
+
+    def test_identical_submissions_coalesce(self, apply_async, publish):
+        job, created = BoxGenerationJob.submit('user-1', self.params)
+        again, created_again = BoxGenerationJob.submit('user-1', self.params)
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.job_id, job.job_id)
+        self.assertEqual(apply_async.call_count, 1)
+
+    def test_resubmissions_after_a_finished_job_coalesce(self, apply_async, publish):
+        finished, _ = BoxGenerationJob.submit('user-1', self.params)
+        # Finished, but its coalescing key was not released, e.g. it expired with the worker
+        finished.state['status'] = BoxGenerationJob.COMPLETED
+        finished._save()
+
+        first, created = BoxGenerationJob.submit('user-1', self.params)
+        second, created_again = BoxGenerationJob.submit('user-1', self.params)
+
+        self.assertTrue(created)
+        self.assertNotEqual(first.job_id, finished.job_id)
+        self.assertFalse(created_again)
+        self.assertEqual(second.job_id, first.job_id)
+        self.assertEqual(apply_async.call_count, 2)
+
+    def test_release_keeps_a_newer_jobs_key(self, apply_async, publish):
+        old, _ = BoxGenerationJob.submit('user-1', self.params)
+        active_key = old.state['active_key']
+        cache.set(active_key, 'newer-job')
+
+        old.complete('box-1')
+
+        self.assertEqual(cache.get(active_key), 'newer-job')
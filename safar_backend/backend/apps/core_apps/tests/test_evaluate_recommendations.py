@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from apps.authentication.models import User, UserInteraction
+from apps.core_apps.management.commands.evaluate_recommendations import Command
+from apps.safar.models import Place
+
+
+class QualityMetricsTests(SimpleTestCase):
+    def test_metrics_on_fixed_interactions(self):
+        recommended = {
+            'u1': ['a', 'b', 'c'],
+            'u2': ['d', 'e', 'f'],
+            'u3': ['x'],  # No test-period interactions, so not scored
+        }
+        relevant = {'u1': {'a', 'c'}, 'u2': {'z'}}
+
+        quality = Command.quality(recommended, relevant, k=3, catalog_size=12)
+
+        # u1 hits ranks 1 and 3 of 2 relevant items, u2 hits nothing
+        self.assertAlmostEqual(quality['precision@3'], round((2 / 3 + 0) / 2, 4))
+        self.assertAlmostEqual(quality['recall@3'], 0.5)
+        ndcg_u1 = (1 + 1 / 2) / (1 + 1 / 1.584962500721156)
+        self.assertAlmostEqual(quality['ndcg@3'], round(ndcg_u1 / 2, 4))
+        self.assertAlmostEqual(quality['coverage'], 0.5)
+
+    def test_recommendations_beyond_k_are_ignored(self):
+        quality = Command.quality({'u1': ['a', 'b', 'c']}, {'u1': {'c'}}, k=2, catalog_size=3)
+
+        self.assertEqual(quality['recall@2'], 0.0)
+        self.assertEqual(quality['ndcg@2'], 0.0)
+        self.assertAlmostEqual(quality['coverage'], round(2 / 3, 4))
+
+    def test_no_scored_users(self):
+        quality = Command.quality({'u1': ['a']}, {}, k=5, catalog_size=0)
+
+        self.assertEqual(quality, {'precision@5': 0.0, 'recall@5': 0.0, 'ndcg@5': 0.0, 'coverage': 0.0})
+
+    def test_gates(self):
+        report = {'k': 10, 'item_types': {'place': {
+            'quality': {'recommend': {'ndcg@10': 0.05}},
+            'latency_ms': {'recommend': {'p95': 40.0}, 'trending': {'p95': 5.0}},
+        }}}
+
+        self.assertEqual(Command.check_gates(report, {'min_ndcg': None, 'max_p95_ms': None}), [])
+        failures = Command.check_gates(report, {'min_ndcg': 0.1, 'max_p95_ms': 20})
+        self.assertEqual(len(failures), 2)
+
+
+class SplitCutoffTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='evaluator@example.com', password='secret')
+        cls.content_type = ContentType.objects.get_for_model(Place)
+
+    def create_interactions(self, count, interaction_type='view_place'):
+        interactions = UserInteraction.objects.bulk_create([
+            UserInteraction(
+                user=self.user,
+                content_type=self.content_type,
+                object_id=position + 1,
+                interaction_type=interaction_type
+            )
+            for position in range(count)
+        ])
+        # created_at is set on insert; spread the rows one day apart
+        start = timezone.now() - timedelta(days=count)
+        for position, interaction in enumerate(interactions):
+            UserInteraction.objects.filter(pk=interaction.pk).update(created_at=start + timedelta(days=position))
+        return start
+
+    def test_cutoff_holds_out_the_most_recent_fraction(self):
+        start = self.create_interactions(10)
+
+        cutoff = Command().split_cutoff(test_fraction=0.2)
+
+        self.assertEqual(cutoff, start + timedelta(days=8))
+        self.assertEqual(UserInteraction.objects.filter(created_at__lt=cutoff).count(), 8)
+        self.assertEqual(UserInteraction.objects.filter(created_at__gte=cutoff).count(), 2)
+
+    def test_unweighted_interactions_are_not_split(self):
+        self.create_interactions(10)
+        self.create_interactions(20, interaction_type='search')
+
+        cutoff = Command().split_cutoff(test_fraction=0.5)
+
+        weighted = UserInteraction.objects.filter(interaction_type='view_place')
+        self.assertEqual(weighted.filter(created_at__gte=cutoff).count(), 5)
+
+    def test_too_few_interactions(self):
+        self.create_interactions(9)
+
+        self.assertIsNone(Command().split_cutoff(test_fraction=0.2))
@@ -0,0 +1,67 @@
+import uuid
+
+from django.test import SimpleTestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apps.core_apps.algorithms_engines.fallback_lists import FallbackLists
+from apps.safar.views import parse_limit, parse_near_me_params, parse_scope_filters
+
+
+def make_request(**params):
+    return Request(APIRequestFactory().get('/', params))
+
+
+class ScopeFilterTests(SimpleTestCase):
+    def test_valid_id_is_normalised(self):
+        city_id = uuid.uuid4()
+        filters = parse_scope_filters(make_request(city=str(city_id).upper()), prefix='place__')
+        self.assertEqual(filters, {'place__city': str(city_id)})
+
+    def test_category_is_never_prefixed(self):
+        category_id = str(uuid.uuid4())
+        self.assertEqual(parse_scope_filters(make_request(category=category_id), prefix='place__'), {'category': category_id})
+
+    def test_invalid_id_raises(self):
+        with self.assertRaises(ValueError):
+            parse_scope_filters(make_request(city='abc'))
+
+    def test_no_scope(self):
+        self.assertEqual(parse_scope_filters(make_request()), {})
+
+
+class LimitTests(SimpleTestCase):
+    def test_default(self):
+        self.assertEqual(parse_limit(make_request()), 10)
+
+    def test_invalid_falls_back_to_default(self):
+        self.assertEqual(parse_limit(make_request(limit='lots')), 10)
+
+    def test_clamped(self):
+        self.assertEqual(parse_limit(make_request(limit='100000')), FallbackLists.LIST_SIZE)
+        self.assertEqual(parse_limit(make_request(limit='-5')), 1)
+
+
+class NearMeParamsTests(SimpleTestCase):
+    def test_valid(self):
+        self.assertEqual(parse_near_me_params(make_request(lat='30.04', lng='31.23', radius='10')), ((30.04, 31.23), 10.0))
+
+    def test_origin_is_optional(self):
+        self.assertEqual(parse_near_me_params(make_request()), (None, 25.0))
+
+    def test_radius_is_clamped(self):
+        _, radius_km = parse_near_me_params(make_request(radius='100000'))
+        self.assertEqual(radius_km, 500)
+
+    def test_invalid_values_raise(self):
+        for params in (
+            {'lat': 'nan', 'lng': '31'},
+            {'lat': '91', 'lng': '31'},
+            {'lat': '30', 'lng': '-181'},
+            {'lat': 'inf', 'lng': '31'},
+            {'radius': '0'},
+            {'radius': 'nan'},
+            {'radius': 'far'},
+        ):
+            with self.subTest(params=params), self.assertRaises(ValueError):
+                parse_near_me_params(make_request(**params))
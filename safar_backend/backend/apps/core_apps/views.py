@@ -1,4 +1,14 @@
 from django.http import JsonResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from apps.core_apps.algorithms_engines.recommendation_cache import RecommendationCache
 
 def health_check(request):
     return JsonResponse({"status": "ok"})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def recommendation_cache_stats(request):
+    """Hit and miss counters of the per-user recommendation cache"""
+    return Response(RecommendationCache.stats())
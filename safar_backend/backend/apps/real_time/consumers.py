@@ -403,6 +403,17 @@ class SafariConsumer(AsyncJsonWebsocketConsumer):
             except Exception as e:
                 logger.error(f"Error sending new notification: {str(e)}")
 
+    async def box_generation_progress(self, event: Dict):
+        """Handle box generation job progress events"""
+        if self._connected:
+            try:
+                await self.send_json({
+                    "type": "box_generation_progress",
+                    "payload": event.get("data", {})
+                })
+            except Exception as e:
+                logger.error(f"Error sending box generation progress: {str(e)}")
+
     async def send_json(self, content, **kwargs):
         """Override send_json to include connection check"""
         if not self._connected:
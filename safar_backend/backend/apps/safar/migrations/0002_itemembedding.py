@@ -0,0 +1,29 @@
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('safar', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemEmbedding',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(db_index=True, default=False)),
+                ('item_type', models.CharField(choices=[('place', 'Place'), ('experience', 'Experience')], max_length=20, verbose_name='Item Type')),
+                ('item_id', models.UUIDField(verbose_name='Item ID')),
+                ('vector', models.BinaryField(verbose_name='Vector')),
+            ],
+            options={
+                'verbose_name': 'Item Embedding',
+                'verbose_name_plural': 'Item Embeddings',
+                'constraints': [models.UniqueConstraint(fields=('item_type', 'item_id'), name='unique_item_embedding')],
+            },
+        ),
+    ]
@@ -481,4 +481,26 @@ class Notification(BaseModel):
 
     class Meta:
         verbose_name = "Notification"
-        verbose_name_plural = "Notifications"
\ No newline at end of file
+        verbose_name_plural = "Notifications"
+
+# Content feature vector of a place or experience, kept up to date by
+# apps.core_apps.algorithms_engines.item_embeddings
+class ItemEmbedding(BaseModel):
+    ITEM_TYPES = (
+        ('place', 'Place'),
+        ('experience', 'Experience'),
+    )
+
+    item_type = models.CharField(max_length=20, choices=ITEM_TYPES, verbose_name="Item Type")
+    item_id = models.UUIDField(verbose_name="Item ID")
+    vector = models.BinaryField(verbose_name="Vector")  # float32 bytes
+
+    def __str__(self):
+        return f"{self.item_type} {self.item_id}"
+
+    class Meta:
+        verbose_name = "Item Embedding"
+        verbose_name_plural = "Item Embeddings"
+        constraints = [
+            models.UniqueConstraint(fields=["item_type", "item_id"], name="unique_item_embedding"),
+        ]
@@ -3,15 +3,17 @@ from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
-from apps.safar.models import Booking, Message, Notification, Payment, Review, Discount
+from django.db import transaction
+from apps.safar.models import Booking, Message, Notification, Payment, Review, Discount, Place, Experience
 from apps.safar.serializers import (
     BookingSerializer, 
     MessageSerializer, 
     NotificationSerializer
 )
-from apps.core_apps.tasks import process_notification, send_email_task
+from apps.core_apps.tasks import process_notification, send_email_task, refresh_item_embeddings
 from apps.authentication.models import User
 from apps.core_apps.services import NotificationService
+from apps.core_apps.algorithms_engines.itinerary_skeleton import ItinerarySkeleton
 from django.db.models import Avg
 from datetime import datetime
 import json
@@ -293,6 +295,29 @@ def _notify_about_review(review, owner, entity_type, entity_id):
         }
     )
 
+@receiver(post_save, sender=Place)
+@receiver(post_save, sender=Experience)
+def handle_catalog_item_change(sender, instance, **kwargs):
+    """Re-encode the item's content embedding and drop its destinations' itinerary skeletons once committed"""
+    try:
+        item_type = 'place' if sender is Place else 'experience'
+        item_id = str(instance.id)
+        scopes = ItinerarySkeleton.scopes_for(instance)
+        transaction.on_commit(lambda: _refresh_catalog_item(item_type, item_id, scopes))
+    except Exception as e:
+        logger.error(f"Catalog item signal error for {instance.id}: {str(e)}", exc_info=True)
+
+def _refresh_catalog_item(item_type, item_id, scopes):
+    """Runs after the commit, so failures are logged rather than raised into the saving request"""
+    try:
+        refresh_item_embeddings.delay(item_type, [item_id])
+    except Exception as e:
+        logger.error(f"Error queueing embedding refresh for {item_type} {item_id}: {str(e)}", exc_info=True)
+    try:
+        ItinerarySkeleton.invalidate(scopes)
+    except Exception as e:
+        logger.error(f"Error invalidating itinerary skeletons for {item_type} {item_id}: {str(e)}", exc_info=True)
+
 @receiver(post_save, sender=Discount)
 def handle_discount_changes(sender, instance, created, **kwargs):
     """Process discount lifecycle events"""
@@ -3,14 +3,19 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.db.models import Q
 from django.utils import timezone
+from datetime import date
 from apps.safar.models import (
     Category, Discount, Place, Experience,
     Flight, Box, Booking, Wishlist, Review, Payment, Message, Notification
 )
 from apps.core_apps.algorithms_engines.recommendation_engine import RecommendationEngine
 from apps.core_apps.algorithms_engines.generation_box_algorithm import BoxGenerator
+from apps.core_apps.algorithms_engines.box_jobs import BoxGenerationJob
+from apps.core_apps.algorithms_engines.fallback_lists import FallbackLists
 from apps.core_apps.general import BaseViewSet
 import logging
+import math
+import uuid
 from apps.safar.serializers import (
     CategorySerializer,
     DiscountSerializer, PlaceSerializer, ExperienceSerializer, FlightSerializer,
@@ -21,6 +26,59 @@ from apps.safar.serializers import (
 logger = logging.getLogger(__name__)
 
 
+def parse_near_me_params(request, default_radius=25, max_radius=500):
+    """
+    Read the optional ``lat``/``lng``/``radius`` (km) query parameters.
+    The radius is clamped to ``max_radius``.
+    
+    Returns:
+        tuple: ((latitude, longitude) or None, radius_km)
+    
+    Raises:
+        ValueError: If a value is not a number, the coordinates are out of
+            range or the radius is not positive
+    """
+    lat = request.query_params.get('lat')
+    lng = request.query_params.get('lng')
+    radius_km = float(request.query_params.get('radius', default_radius))
+    if not math.isfinite(radius_km) or radius_km <= 0:
+        raise ValueError(f"Invalid radius: {radius_km}")
+    radius_km = min(radius_km, max_radius)
+    
+    origin = None
+    if lat is not None and lng is not None:
+        origin = (float(lat), float(lng))
+        # Comparisons are False for NaN, so it is rejected too
+        if not (-90 <= origin[0] <= 90 and -180 <= origin[1] <= 180):
+            raise ValueError(f"Coordinates out of range: {origin}")
+    return origin, radius_km
+
+
+def parse_scope_filters(request, prefix=''):
+    """
+    Read one optional ``country``/``region``/``city``/``category`` id query
+    parameter as a catalog filter, e.g. for the precomputed popular lists.
+    
+    Raises:
+        ValueError: If the id is not a UUID
+    """
+    for scope in ('city', 'region', 'country', 'category'):
+        value = request.query_params.get(scope)
+        if value:
+            field = scope if scope == 'category' else f'{prefix}{scope}'
+            return {field: str(uuid.UUID(value))}
+    return {}
+
+
+def parse_limit(request, default=10, maximum=FallbackLists.LIST_SIZE):
+    """Read the ``limit`` query parameter, falling back to ``default`` and clamped to 1..``maximum``"""
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
 class CategoryViewSet(BaseViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -228,15 +286,92 @@ class PlaceViewSet(BaseViewSet):
         serializer = self.get_serializer(places, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], url_path='near-me')
+    def near_me(self, request):
+        """Get personalized places around a point (lat/lng) or the user's location"""
+        if not request.user.is_authenticated:
+            return Response(
+                {'error': 'Authentication required for recommendations'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        
+        try:
+            origin, radius_km = parse_near_me_params(request)
+        except ValueError:
+            return Response({'error': 'Invalid lat, lng or radius'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        recommendation_engine = RecommendationEngine(request.user)
+        origin = recommendation_engine.resolve_origin(origin=origin)
+        if origin is None:
+            return Response(
+                {'error': 'Provide lat and lng or set a location on your profile'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        limit = int(request.query_params.get('limit', 10))
+        places = recommendation_engine.recommend_places(limit=limit, origin=origin, radius_km=radius_km)
+        
+        serializer = self.get_serializer(places, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Get the most popular places over the last 90 days"""
+        limit = int(request.query_params.get('limit', 10))
+        places = RecommendationEngine.trending(
+            'place', self.get_queryset().filter(is_available=True), limit=limit
+        )
+        serializer = self.get_serializer(places, many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    def popular(self, request):
+        """Best places overall or in a country, region, city or category; open to anonymous users"""
+        try:
+            filters = parse_scope_filters(request)
+        except ValueError:
+            return Response({'error': 'Invalid country, region, city or category id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        places = RecommendationEngine.cold_start(
+            'place', self.get_queryset().filter(is_available=True),
+            filters=filters, limit=parse_limit(request)
+        )
+        serializer = self.get_serializer(places, many=True)
+        return Response(serializer.data)
+    
     @action(detail=True, methods=['get'])
     def similar(self, request, pk=None):
         """Get similar places"""
         place = self.get_object()
-        similar_places = self.get_queryset().filter(
-            category=place.category
-        ).exclude(id=place.id)[:5]
+        limit = int(request.query_params.get('limit', 5))
+        
+        similar_places = RecommendationEngine.similar_items(
+            'place', place.id, self.get_queryset().filter(is_available=True), limit=limit
+        )
+        if not similar_places:
+            # Places the model has not seen yet fall back to their content cluster
+            similar_places = RecommendationEngine.same_cluster_items(
+                'place', place.id, self.get_queryset().filter(is_available=True), limit=limit
+            )
+        if not similar_places:
+            # ...and then to the same category
+            similar_places = self.get_queryset().filter(
+                category=place.category
+            ).exclude(id=place.id)[:limit]
         serializer = self.get_serializer(similar_places, many=True)
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'], url_path='also-liked')
+    def also_liked(self, request, pk=None):
+        """Get places liked by people who liked this place"""
+        place = self.get_object()
+        limit = int(request.query_params.get('limit', 5))
+        
+        places = RecommendationEngine.also_liked(
+            'place', place.id, self.get_queryset().filter(is_available=True), limit=limit
+        ) or []
+        serializer = self.get_serializer(places, many=True)
+        return Response(serializer.data)
 
 class ExperienceViewSet(BaseViewSet):
     queryset = Experience.objects.select_related(
@@ -267,6 +402,71 @@ class ExperienceViewSet(BaseViewSet):
         serializer = self.get_serializer(experiences, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='near-me')
+    def near_me(self, request):
+        """Get personalized experiences around a point (lat/lng) or the user's location"""
+        if not request.user.is_authenticated:
+            return Response(
+                {'error': 'Authentication required for recommendations'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        
+        try:
+            origin, radius_km = parse_near_me_params(request)
+        except ValueError:
+            return Response({'error': 'Invalid lat, lng or radius'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        recommendation_engine = RecommendationEngine(request.user)
+        origin = recommendation_engine.resolve_origin(origin=origin)
+        if origin is None:
+            return Response(
+                {'error': 'Provide lat and lng or set a location on your profile'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        limit = int(request.query_params.get('limit', 10))
+        experiences = recommendation_engine.recommend_experiences(limit=limit, origin=origin, radius_km=radius_km)
+        
+        serializer = self.get_serializer(experiences, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Get the most popular experiences over the last 90 days"""
+        limit = int(request.query_params.get('limit', 10))
+        experiences = RecommendationEngine.trending(
+            'experience', self.get_queryset().filter(is_available=True), limit=limit
+        )
+        serializer = self.get_serializer(experiences, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny])
+    def popular(self, request):
+        """Best experiences overall or in a country, region, city or category; open to anonymous users"""
+        try:
+            filters = parse_scope_filters(request, prefix='place__')
+        except ValueError:
+            return Response({'error': 'Invalid country, region, city or category id'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        experiences = RecommendationEngine.cold_start(
+            'experience', self.get_queryset().filter(is_available=True),
+            filters=filters, limit=parse_limit(request)
+        )
+        serializer = self.get_serializer(experiences, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'], url_path='also-liked')
+    def also_liked(self, request, pk=None):
+        """Get experiences liked by people who liked this experience"""
+        experience = self.get_object()
+        limit = int(request.query_params.get('limit', 5))
+        
+        experiences = RecommendationEngine.also_liked(
+            'experience', experience.id, self.get_queryset().filter(is_available=True), limit=limit
+        ) or []
+        serializer = self.get_serializer(experiences, many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['get'])
     def availability(self, request, pk=None):
         """Check availability for specific dates"""
@@ -315,31 +515,21 @@ class BoxViewSet(BaseViewSet):
     @action(detail=False, methods=['post'])
     def generate(self, request):
         """
-        Generate a custom box based on user preferences
+        Queue generation of a custom box based on user preferences.
+        
+        Returns a job to poll at ``generate/<job_id>/``; progress is also
+        pushed over the WebSocket as ``box_generation_progress`` events.
+        Identical submissions while a job is in flight join that job.
         """
         try:
-            user = request.user
-            destination_id = request.data.get('destination_id')
-            destination_type = request.data.get('destination_type')
-            duration_days = int(request.data.get('duration_days', 3))
-            budget = request.data.get('budget')
-            theme = request.data.get('theme')
-            start_date = request.data.get('start_date')
-            
-            destination = self._get_destination(destination_id, destination_type)
-            
-            generator = BoxGenerator(user)
-            box = generator.generate_box(
-                destination=destination,
-                duration_days=duration_days,
-                budget=budget,
-                start_date=start_date,
-                theme=theme
-            )
+            params = self._generation_params(request.data)
+            # Fail fast on unknown destinations instead of in the worker
+            BoxGenerator.get_destination(params['destination_type'], params['destination_id'])
             
+            job, created = BoxGenerationJob.submit(request.user.id, params)
             return Response(
-                BoxSerializer(box).data,
-                status=status.HTTP_201_CREATED
+                job.public_state(),
+                status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
             )
             
         except ValueError as e:
@@ -354,24 +544,41 @@ class BoxViewSet(BaseViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def _get_destination(self, destination_id, destination_type):
-        """Get destination model instance"""
-        from apps.geographic_data.models import City, Region, Country
-        
-        model_map = {
-            'city': City,
-            'region': Region,
-            'country': Country
-        }
+    @action(detail=False, methods=['get'], url_path=r'generate/(?P<job_id>[^/.]+)')
+    def generation_status(self, request, job_id=None):
+        """Poll a box generation job; includes the box once it is completed"""
+        job = BoxGenerationJob.get(job_id)
+        if job is None or job.user_id != str(request.user.id):
+            return Response(
+                {'error': 'Generation job not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        if destination_type not in model_map:
-            raise ValueError("Invalid destination type")
-            
-        model = model_map[destination_type]
+        data = job.public_state()
+        if job.state.get('status') == BoxGenerationJob.COMPLETED:
+            box = self.get_queryset().filter(id=job.state['box_id']).first()
+            data['box'] = BoxSerializer(box).data if box else None
+        return Response(data)
+    
+    def _generation_params(self, data):
+        """Normalise generation parameters into the JSON-serialisable job form"""
+        budget = data.get('budget')
+        start_date = data.get('start_date')
+        planner = data.get('planner') or 'greedy'
+        if planner not in ('greedy', 'optimizer'):
+            raise ValueError("Planner must be 'greedy' or 'optimizer'")
         try:
-            return model.objects.get(id=destination_id, is_deleted=False)
-        except model.DoesNotExist:
-            raise ValueError(f"{destination_type.capitalize()} not found")
+            return {
+                'destination_id': str(data.get('destination_id')),
+                'destination_type': data.get('destination_type'),
+                'duration_days': int(data.get('duration_days', 3)),
+                'budget': float(budget) if budget not in (None, '') else None,
+                'theme': data.get('theme'),
+                'start_date': date.fromisoformat(start_date).isoformat() if start_date else None,
+                'planner': planner,
+            }
+        except (TypeError, ValueError):
+            raise ValueError("Invalid generation parameters")
         
 class BookingViewSet(BaseViewSet):
     queryset = Booking.objects.select_related(
@@ -26,4 +26,20 @@ app.conf.beat_schedule = CELERYBEAT_SCHEDULE = {
         'task': 'apps.marketing.tasks.process_campaign_analytics',
         'schedule': crontab(hour='*/3', minute=0),  # Run every 3 hours
     },
+    'train-recommendation-models': {
+        'task': 'apps.core_apps.tasks.train_recommendation_models',
+        'schedule': crontab(hour='*/6', minute=15),  # Run every 6 hours
+    },
+    'rebuild-item-embeddings': {
+        'task': 'apps.core_apps.tasks.rebuild_item_embeddings',
+        'schedule': crontab(hour=2, minute=30),  # Run nightly at 2:30 AM
+    },
+    'update-item-clusters': {
+        'task': 'apps.core_apps.tasks.update_item_clusters',
+        'schedule': crontab(minute='*/15'),  # Run every 15 minutes
+    },
+    'rebuild-fallback-lists': {
+        'task': 'apps.core_apps.tasks.rebuild_fallback_lists',
+        'schedule': crontab(hour=3, minute=0),  # Run nightly at 3 AM
+    },
 }
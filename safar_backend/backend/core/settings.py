@@ -464,6 +464,18 @@ ENABLE_SMS_RATE_LIMITING = True
 SITE_NAME = env("SITE_NAME", default="Safer")
 SITE_URL = env("SITE_URL", default="http://localhost:3000")
 
+# Recommendation engine settings
+# Trained model artifacts must live on storage shared by the web and Celery workers
+RECOMMENDATION_MODEL_DIR = env(
+    "RECOMMENDATION_MODEL_DIR",
+    default=str(Path(__file__).resolve().parent.parent / "ml_models")
+)
+# Overrides for the re-ranking weights, e.g. {"ml_score": 0.4, "recent_popularity": 0.0}
+RECOMMENDATION_SCORE_WEIGHTS = {}
+# Also train a sub-model per country with enough interactions; recommendations
+# confined to a country (e.g. for a box) are then served from its shard
+RECOMMENDATION_COUNTRY_SHARDS = env.bool("RECOMMENDATION_COUNTRY_SHARDS", default=False)
+
 # Firebase settings
 FIREBASE_CREDENTIALS_PATH = env("FIREBASE_CREDENTIALS_PATH", default="/app/safar_firebase_credentials.json")
 
@@ -6,7 +6,7 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from django.http import HttpResponse
-from apps.core_apps.views import health_check
+from apps.core_apps.views import health_check, recommendation_cache_stats
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -28,6 +28,7 @@ rest_api_urlpatterns = [
     path('api/', include('apps.geographic_data.urls')),
     path('api/', include('apps.marketing.urls')),
     path('health/', health_check, name='health_check'),
+    path('api/metrics/recommendation-cache/', recommendation_cache_stats, name='recommendation_cache_stats'),
 ]
 
 urlpatterns = [